@@ -0,0 +1,140 @@
+#!/usr/bin/env python3
+"""Many canned questions through /api/search one stream each vs one /api/search/batch request.
+
+Starts the OpenAI stand-in (fixed latency per call) and the app, with the
+answer cache and the query-embedding cache off, so every run retrieves and
+embeds every question. The same workload as
+benchmarks/load_test.py (seeded-random active user per question) is then run
+three ways:
+- one /api/search stream per question at --concurrency;
+- /api/search/batch, retrieval only;
+- /api/search/batch with answers, at most --concurrency generated at once.
+For each run it reports wall time and the calls the stand-in served
+(classification, embedding and answer requests, and embedding inputs). It also
+checks that the batch classified every question like /api/search and cited the
+same chunks.
+
+    uv run python -m benchmarks.batch_search --queries 200 --latency-ms 40
+"""
+import argparse
+import asyncio
+import json
+import os
+import random
+import threading
+import time
+from benchmarks.concurrent_streams import free_port
+from benchmarks.load_test import load_workload, active_users, start_app
+
+
+def citation_keys(citations: list[dict]) -> list[tuple]:
+    return [(c.get("source_file"), c.get("page"), c.get("start"), c.get("relevance")) for c in citations]
+
+
+async def stream_one(client, url: str, item: dict) -> dict:
+    result = {"intent": None, "citations": []}
+    async with client.stream("POST", url, json={"user_id": item["user_id"], "query": item["query"]}) as resp:
+        event_type = ""
+        async for line in resp.aiter_lines():
+            if line.startswith("event:"):
+                event_type = line.split(":", 1)[1].strip()
+            elif line.startswith("data:") and event_type == "intent":
+                result["intent"] = json.loads(line[5:])["intent"]
+            elif line.startswith("data:") and event_type == "citations":
+                result["citations"] = citation_keys(json.loads(line[5:])["citations"])
+    return result
+
+
+async def run_streams(base_url: str, items: list[dict], concurrency: int) -> list[dict]:
+    import httpx
+    limit = asyncio.Semaphore(concurrency)
+    async with httpx.AsyncClient(timeout=300) as client:
+        async def one(item):
+            async with limit:
+                return await stream_one(client, f"{base_url}/api/search", item)
+        return await asyncio.gather(*(one(item) for item in items))
+
+
+async def run_batch(base_url: str, items: list[dict], answers: bool, concurrency: int) -> tuple[list[dict], dict, float]:
+    import httpx
+    body = {"queries": [{**item, "id": str(i)} for i, item in enumerate(items)], "answers": answers,
+            "concurrency": concurrency}
+    results, summary, first = [None] * len(items), {}, None
+    started = time.perf_counter()
+    async with httpx.AsyncClient(timeout=600) as client:
+        async with client.stream("POST", f"{base_url}/api/search/batch", json=body) as resp:
+            resp.raise_for_status()
+            async for line in resp.aiter_lines():
+                if not line.strip():
+                    continue
+                first = first or time.perf_counter() - started
+                row = json.loads(line)
+                if row.get("done"):
+                    summary = row
+                else:
+                    results[int(row["id"])] = {"intent": row.get("intent"), "error": row.get("error"),
+                                               "citations": citation_keys(row.get("citations") or [])}
+    return results, summary, first
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--concurrency", type=int, default=4, help="streams at once, and answers at once in the batch")
+    parser.add_argument("--latency-ms", type=float, default=40.0, help="stand-in latency per OpenAI call")
+    parser.add_argument("--answer-tokens", type=int, default=40, help="stand-in answer length in tokens")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    os.environ.setdefault("OPENAI_API_KEY", "unused")
+    rng = random.Random(args.seed)
+    workload = load_workload(None)
+    users = active_users()
+    items = [{"query": rng.choice(workload)["query"], "user_id": rng.choice(users)} for _ in range(args.queries)]
+
+    from benchmarks.fake_openai import serve
+    fake_port = free_port()
+    fake = serve(port=fake_port, latency_ms=args.latency_ms, answer_tokens=args.answer_tokens)
+    threading.Thread(target=fake.serve_forever, daemon=True).start()
+    app_port = free_port()
+    proc = start_app(app_port, {**os.environ, "OPENAI_BASE_URL": f"http://127.0.0.1:{fake_port}/v1",
+                                "OPENAI_API_KEY": "local", "ANSWER_CACHE_SIZE": "0", "QUERY_EMBEDDING_CACHE_SIZE": "0",
+                                "BATCH_ANSWER_CONCURRENCY": str(args.concurrency)})
+    base_url = f"http://127.0.0.1:{app_port}"
+    stats = fake.RequestHandlerClass.stats
+
+    def measured(run):
+        before = dict(stats)
+        started = time.perf_counter()
+        out = asyncio.run(run)
+        return out, time.perf_counter() - started, {k: stats[k] - before[k] for k in stats}
+
+    try:
+        streamed, stream_s, stream_calls = measured(run_streams(base_url, items, args.concurrency))
+        (batched, summary, first_s), batch_s, batch_calls = measured(run_batch(base_url, items, False, args.concurrency))
+        (answered, _, answer_first_s), answer_s, answer_calls = measured(run_batch(base_url, items, True, args.concurrency))
+    finally:
+        proc.terminate()
+        proc.wait()
+
+    print(f"{args.queries} questions from {len(users)} users, stand-in {args.latency_ms:.0f}ms per call, "
+          f"concurrency {args.concurrency}\n")
+    print(f"{'run':<28} {'wall s':>8} {'first s':>8} {'OpenAI calls':>13} {'embed inputs':>13}")
+    print(f"{'/api/search streams':<28} {stream_s:>8.2f} {'-':>8} {stream_calls['requests']:>13} {stream_calls['inputs']:>13}")
+    print(f"{'batch, retrieval only':<28} {batch_s:>8.2f} {first_s:>8.2f} {batch_calls['requests']:>13} {batch_calls['inputs']:>13}")
+    print(f"{'batch with answers':<28} {answer_s:>8.2f} {answer_first_s:>8.2f} {answer_calls['requests']:>13} "
+          f"{answer_calls['inputs']:>13}")
+    print(f"\nbatch: {summary['vector_calls']} vector calls for {summary['embedded']} embedded queries, "
+          f"classifier {summary['classifier']}, stages {summary['timing']['stages']}")
+
+    for name, rows in (("retrieval only", batched), ("with answers", answered)):
+        errors = sum(bool(r["error"]) for r in rows)
+        same_intent = sum(a["intent"] == b["intent"] for a, b in zip(streamed, rows))
+        same_citations = sum(a["citations"] == b["citations"] for a, b in zip(streamed, rows))
+        print(f"batch {name}: {errors} errors, intent agrees {same_intent}/{len(rows)}, "
+              f"citations agree {same_citations}/{len(rows)}")
+        assert not errors and same_intent == len(rows) and same_citations == len(rows), f"batch {name} differs"
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,96 @@
+#!/usr/bin/env python3
+"""Query latency vs. accessible-set size: global `$in` filter vs. access-group partitions.
+
+Builds a throwaway Chroma store with synthetic vectors and compares:
+
+- global:      one collection for every company, filtered by company_id and
+               `asset_id $in [accessible ids]` (the pre-partitioning layout)
+- partitioned: one collection per company, filtered by `access_group $in` over
+               the user's few access groups (one group per play here)
+
+    uv run python -m benchmarks.bench_filter_latency --assets 4000 --queries 50
+"""
+import argparse
+import statistics
+import tempfile
+import time
+import chromadb
+import numpy as np
+from services.vector_store import access_group_id, access_group_filter
+
+
+def build(chroma, companies: int, assets: int, chunks_per_asset: int, assets_per_play: int, dim: int, rng):
+    global_col = chroma.create_collection("global", metadata={"hnsw:space": "cosine"})
+    partitions = {}
+    for c in range(companies):
+        company_id = f"comp-{c}"
+        part = chroma.create_collection(f"knowledge_{company_id}", metadata={"hnsw:space": "cosine"})
+        partitions[company_id] = part
+        ids, vectors, metas, tagged = [], [], [], []
+        for a in range(assets):
+            asset_id = f"{company_id}-ast-{a}"
+            play_id = f"{company_id}-play-{a // assets_per_play}"
+            for k in range(chunks_per_asset):
+                ids.append(f"{asset_id}_chunk_{k}")
+                vectors.append(rng.standard_normal(dim).astype(np.float32).tolist())
+                metas.append({"asset_id": asset_id, "company_id": company_id})
+                tagged.append({"asset_id": asset_id, "company_id": company_id,
+                               "access_group": access_group_id([play_id])})
+        for start in range(0, len(ids), 5000):
+            end = start + 5000
+            global_col.add(ids=ids[start:end], embeddings=vectors[start:end], metadatas=metas[start:end])
+            part.add(ids=ids[start:end], embeddings=vectors[start:end], metadatas=tagged[start:end])
+    return global_col, partitions
+
+
+def timed(fn, queries) -> list[float]:
+    samples = []
+    for q in queries:
+        started = time.perf_counter()
+        fn(q)
+        samples.append((time.perf_counter() - started) * 1000)
+    return samples
+
+
+def pct(samples: list[float], p: float) -> float:
+    return statistics.quantiles(samples, n=100)[int(p) - 1] if len(samples) > 1 else samples[0]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--companies", type=int, default=2)
+    parser.add_argument("--assets", type=int, default=2000, help="assets per company")
+    parser.add_argument("--chunks-per-asset", type=int, default=4)
+    parser.add_argument("--assets-per-play", type=int, default=20)
+    parser.add_argument("--dim", type=int, default=256)
+    parser.add_argument("--queries", type=int, default=30)
+    parser.add_argument("--top-k", type=int, default=8)
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(7)
+    chroma = chromadb.PersistentClient(path=tempfile.mkdtemp(prefix="bench_filter_"))
+    print(f"Building {args.companies} x {args.assets} assets x {args.chunks_per_asset} chunks (dim={args.dim})...")
+    global_col, partitions = build(chroma, args.companies, args.assets, args.chunks_per_asset,
+                                   args.assets_per_play, args.dim, rng)
+    queries = [rng.standard_normal(args.dim).astype(np.float32).tolist() for _ in range(args.queries)]
+
+    company_id = "comp-0"
+    part = partitions[company_id]
+    print(f"\n{'accessible':>10} {'groups':>6} | {'global p50':>10} {'p95':>8} | {'partitioned p50':>15} {'p95':>8}")
+    sizes = [s for s in (10, 50, 200, 1000, 5000, 20000) if s <= args.assets] or [args.assets]
+    for size in sizes:
+        asset_ids = [f"{company_id}-ast-{a}" for a in range(size)]
+        play_ids = sorted({f"{company_id}-play-{a // args.assets_per_play}" for a in range(size)})
+        global_where = {"$and": [{"company_id": {"$eq": company_id}}, {"asset_id": {"$in": asset_ids}}]}
+        part_where = access_group_filter(access_group_id([p]) for p in play_ids)
+
+        g = timed(lambda q: global_col.query(query_embeddings=[q], where=global_where,
+                                             n_results=args.top_k, include=["metadatas"]), queries)
+        p = timed(lambda q: part.query(query_embeddings=[q], where=part_where,
+                                       n_results=args.top_k, include=["metadatas"]), queries)
+        print(f"{size:>10} {len(play_ids):>6} | {pct(g, 50):>8.1f}ms {pct(g, 95):>6.1f}ms | "
+              f"{pct(p, 50):>13.1f}ms {pct(p, 95):>6.1f}ms")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,118 @@
+#!/usr/bin/env python3
+"""Rows/sec of the bulk CSV loader on a synthetic million-row dataset.
+
+Copies the source files to a temp directory, replaces the submission and
+feedback CSVs with `--rows` generated rows each (referencing the real users,
+reps and assets), and runs `init_db.load_all` into a temp database. With
+`--legacy-sample N`, the same first N submission/feedback rows are also loaded
+the old way (iterrows + ORM `session.add` per row) for a rows/sec comparison.
+
+    uv run python -m benchmarks.bulk_load --rows 1000000
+"""
+import argparse
+import os
+import random
+import shutil
+import tempfile
+import time
+from pathlib import Path
+
+
+def generate(data_dir: Path, rows: int, seed: int = 7):
+    import pandas as pd
+    from database.init_db import TABLE_SOURCES
+    from database.models import User, Rep, Submission, Feedback
+    files = {model: data_dir / name for model, name in TABLE_SOURCES}
+    users, reps = pd.read_csv(files[User]), pd.read_csv(files[Rep])
+    rng = random.Random(seed)
+
+    user_ids, user_companies = users["id"].tolist(), users["company_id"].tolist()
+    rep_ids = reps["id"].tolist()
+    picks = [rng.randrange(len(user_ids)) for _ in range(rows)]
+    companies = [user_companies[i] for i in picks]
+    submission_ids = [f"sub-syn-{i:07d}" for i in range(rows)]
+    pd.DataFrame({
+        "id": submission_ids,
+        "user_id": [user_ids[i] for i in picks],
+        "rep_id": [rep_ids[rng.randrange(len(rep_ids))] for _ in range(rows)],
+        "submitted_at": [f"2024-{1 + i % 12:02d}-{1 + i % 28:02d}T09:00:00Z" for i in range(rows)],
+        "submission_type": [("audio", "video", "text")[i % 3] for i in range(rows)],
+        "asset_id": [f"ast-syn-{i:07d}" for i in range(rows)],
+        "company_id": companies,
+    }).to_csv(files[Submission], index=False)
+    pd.DataFrame({
+        "id": [f"fb-syn-{i:07d}" for i in range(rows)],
+        "submission_id": submission_ids,
+        "company_id": companies,
+        "score": [rng.randint(1, 10) for _ in range(rows)],
+        "text": [f"Synthetic feedback {i}: clear delivery, tighten the close." for i in range(rows)],
+        "created_at": [f"2024-{1 + i % 12:02d}-{1 + i % 28:02d}T10:00:00Z" for i in range(rows)],
+    }).to_csv(files[Feedback], index=False)
+
+
+def legacy_load(data_dir: Path, engine, sample: int) -> tuple[int, float]:
+    """The loader this replaced: iterrows into ORM objects, one session.add per row."""
+    import pandas as pd
+    from sqlalchemy.orm import Session
+    from database.init_db import TABLE_SOURCES
+    from database.models import Base, Submission, Feedback
+    Base.metadata.create_all(engine, tables=[Submission.__table__, Feedback.__table__])
+    started, count = time.perf_counter(), 0
+    with Session(engine) as session:
+        for model, name in TABLE_SOURCES:
+            if model not in (Submission, Feedback):
+                continue
+            columns = [c.name for c in model.__table__.columns]
+            for _, r in pd.read_csv(data_dir / name, nrows=sample).iterrows():
+                session.add(model(**{c: r[c] if c != "score" else int(r[c]) for c in columns}))
+                count += 1
+            session.flush()
+        session.commit()
+    return count, time.perf_counter() - started
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--rows", type=int, default=1_000_000, help="synthetic submissions (and feedback) rows")
+    parser.add_argument("--legacy-sample", type=int, default=20_000, help="rows per table for the old loader; 0 skips it")
+    parser.add_argument("--chunksize", type=int, default=None)
+    parser.add_argument("--workers", type=int, default=None)
+    args = parser.parse_args()
+
+    os.environ.setdefault("OPENAI_API_KEY", "unused")
+    from sqlalchemy import create_engine, event
+    from config import DATABASE_DIR, LOAD_CHUNK_ROWS, LOAD_WORKERS
+    from database.init_db import load_all
+    from database.models import configure_sqlite
+
+    workdir = Path(tempfile.mkdtemp(prefix="bulk_load_"))
+    data_dir = workdir / "data"
+    shutil.copytree(DATABASE_DIR, data_dir)
+    started = time.perf_counter()
+    generate(data_dir, args.rows)
+    print(f"generated {args.rows:,} submissions + {args.rows:,} feedback rows in {time.perf_counter() - started:.1f}s\n")
+
+    def temp_engine(name: str):
+        engine = create_engine(f"sqlite:///{workdir / name}")
+        event.listen(engine, "connect", configure_sqlite)
+        return engine
+
+    engine = temp_engine("bulk.db")
+    stats = load_all(data_dir, engine, chunksize=args.chunksize or LOAD_CHUNK_ROWS, workers=args.workers or LOAD_WORKERS)
+    engine.dispose()
+    total = sum(t["rows"] for name, t in stats.items() if not name.startswith("_"))
+    bulk_rate = total / stats["_elapsed_s"]
+
+    if args.legacy_sample:
+        engine = temp_engine("legacy.db")
+        count, elapsed = legacy_load(data_dir, engine, args.legacy_sample)
+        engine.dispose()
+        legacy_rate = count / elapsed
+        print(f"\nlegacy loader: {count:,} rows in {elapsed:.2f}s ({legacy_rate:,.0f} rows/s)")
+        print(f"bulk loader:   {total:,} rows in {stats['_elapsed_s']:.2f}s ({bulk_rate:,.0f} rows/s), "
+              f"{bulk_rate / legacy_rate:.1f}x")
+    shutil.rmtree(workdir, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
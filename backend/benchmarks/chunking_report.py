@@ -0,0 +1,120 @@
+#!/usr/bin/env python3
+"""Index size and embedding token spend of the token-budgeted chunker vs the previous one.
+
+Chunks every asset in the database with the previous chunker (whole pages,
+whole tables, a full-transcript chunk plus every segment, with input cut at
+8000 characters by the embeddings call) and with the current one, then
+reports chunk counts, estimated embedding tokens, the largest chunk, chunks
+the embeddings call would truncate, and the on-disk size of a Chroma + FTS5
+index built from each set (random vectors of the real dimension, so no API
+calls are made). Needs a loaded database (`make ingest`).
+
+    uv run python -m benchmarks.chunking_report
+"""
+import argparse
+import json
+import os
+import random
+import shutil
+import tempfile
+from pathlib import Path
+
+LEGACY_MAX_INPUT_CHARS = 8000
+
+
+def legacy_chunks(asset_type: str, data, is_submission: bool) -> list[str]:
+    """Chunk texts as the previous chunker produced them (CHUNKER_VERSION 1)."""
+    from ingestion.chunker import format_table
+    if asset_type == "pdf" and not is_submission:
+        texts = []
+        for page in data:
+            if page.get("text"):
+                texts.append(page["text"])
+            texts += [format_table(table) for table in page.get("tables", [])]
+        return texts
+    if asset_type == "image" and not is_submission:
+        parts = [data.get("alt_text", ""), data.get("ocr_text", "")]
+        parts += [f"{e.get('label', '')}: {e.get('description', '')}" for e in data.get("visual_elements", [])]
+        text = "\n".join(p for p in parts if p)
+        return [text] if text.strip() else []
+    texts = [data["full_transcript"]] if data.get("full_transcript") else []
+    return texts + [seg["text"] for seg in data.get("segments", [])]
+
+
+def corpus():
+    from config import ASSETS_DIR
+    from database.models import SessionLocal, Asset, Submission
+    session = SessionLocal()
+    try:
+        owners = {s.asset_id: s for s in session.query(Submission).all()}
+        for asset in session.query(Asset).all():
+            path = ASSETS_DIR / asset.file_name
+            if path.exists():
+                with open(path) as f:
+                    yield asset, owners.get(asset.id), json.load(f)
+    finally:
+        session.close()
+
+
+def index_size(texts: list[str], dim: int, workdir: Path) -> tuple[int, int]:
+    """Bytes on disk of a Chroma collection and an FTS5 index holding `texts`."""
+    import chromadb
+    from services.lexical_index import LexicalIndex
+    rng = random.Random(0)
+    chroma_dir, fts_path = workdir / "chroma", workdir / "lexical.db"
+    client = chromadb.PersistentClient(path=str(chroma_dir))
+    collection = client.get_or_create_collection("chunks", metadata={"hnsw:space": "cosine"})
+    ids = [f"c{i}" for i in range(len(texts))]
+    for start in range(0, len(texts), 1000):
+        part = texts[start:start + 1000]
+        vectors = [[rng.gauss(0, 1) for _ in range(dim)] for _ in part]
+        collection.add(ids=ids[start:start + len(part)], embeddings=vectors, documents=part)
+    client.clear_system_cache()
+    lexical = LexicalIndex(str(fts_path))
+    lexical.write([{"id": i, "text": t, "collection": "chunks", "metadata": {}} for i, t in zip(ids, texts)])
+    lexical.close()
+    chroma_bytes = sum(p.stat().st_size for p in chroma_dir.rglob("*") if p.is_file())
+    fts_bytes = sum(p.stat().st_size for p in workdir.glob("lexical.db*"))
+    return chroma_bytes, fts_bytes
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--dim", type=int, default=1536, help="embedding dimension for the size estimate")
+    args = parser.parse_args()
+
+    os.environ.setdefault("OPENAI_API_KEY", "unused")
+    from config import CHUNK_MAX_TOKENS, CHUNK_OVERLAP_TOKENS
+    from ingestion.chunker import chunk_asset, estimate_tokens
+
+    before, after = [], []
+    for asset, submission, data in corpus():
+        before += legacy_chunks(asset.type, data, submission is not None)
+        after += [c["text"] for c in chunk_asset(
+            asset.type, data, asset.id, asset.company_id, asset.file_name,
+            user_id=submission.user_id if submission else "", submission_id=submission.id if submission else "",
+        ) if c["text"].strip()]
+
+    print(f"chunker budget: {CHUNK_MAX_TOKENS} tokens per chunk, {CHUNK_OVERLAP_TOKENS} overlap\n")
+    print(f"{'':<10} {'chunks':>7} {'embed tokens':>13} {'max tokens':>11} {'truncated':>10} {'chroma':>10} {'fts5':>9}")
+    rows = {}
+    for name, texts in (("before", before), ("after", after)):
+        embedded = [t[:LEGACY_MAX_INPUT_CHARS] for t in texts]
+        tokens = sum(estimate_tokens(t) for t in embedded)
+        truncated = sum(len(t) > LEGACY_MAX_INPUT_CHARS for t in texts)
+        workdir = Path(tempfile.mkdtemp(prefix=f"chunking_{name}_"))
+        try:
+            chroma_bytes, fts_bytes = index_size(texts, args.dim, workdir)
+        finally:
+            shutil.rmtree(workdir, ignore_errors=True)
+        rows[name] = (len(texts), tokens, chroma_bytes + fts_bytes)
+        print(f"{name:<10} {len(texts):>7} {tokens:>13,} {max(estimate_tokens(t) for t in texts):>11} {truncated:>10} "
+              f"{chroma_bytes / 1e6:>8.2f}MB {fts_bytes / 1e6:>7.2f}MB")
+
+    (n0, t0, b0), (n1, t1, b1) = rows["before"], rows["after"]
+    print(f"\nchunks {n1 - n0:+,} ({n1 / n0 - 1:+.0%}), embedding tokens {t1 - t0:+,} ({t1 / t0 - 1:+.0%}), "
+          f"index size {(b1 - b0) / 1e6:+.2f}MB ({b1 / b0 - 1:+.0%})")
+
+
+if __name__ == "__main__":
+    main()
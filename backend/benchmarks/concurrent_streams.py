@@ -0,0 +1,90 @@
+#!/usr/bin/env python3
+"""Check that simultaneous /api/search SSE streams interleave instead of serializing.
+
+Starts the local OpenAI stand-in (with a per-token delay so each answer takes
+a while to stream) and the FastAPI app in-process, runs one stream alone for a
+baseline, then N at once. If the request path blocked the event loop, N
+streams would take ~N x the baseline and their answer chunks would arrive in
+contiguous runs; exits non-zero in that case. Needs an ingested index.
+
+    uv run python -m benchmarks.concurrent_streams --streams 8
+"""
+import argparse
+import asyncio
+import os
+import socket
+import sys
+import threading
+import time
+
+
+def free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+async def run_stream(client, url: str, user_id: str, query: str, stream_id: int, events: list):
+    async with client.stream("POST", url, json={"user_id": user_id, "query": query}) as resp:
+        resp.raise_for_status()
+        event_type = ""
+        async for line in resp.aiter_lines():
+            if line.startswith("event:"):
+                event_type = line.split(":", 1)[1].strip()
+            elif line.startswith("data:") and event_type == "answer_chunk":
+                events.append((time.perf_counter(), stream_id))
+
+
+async def run_batch(url: str, user_id: str, query: str, n: int, tag: str) -> tuple[float, list]:
+    import httpx
+    events = []
+    async with httpx.AsyncClient(timeout=120) as client:
+        started = time.perf_counter()
+        # Distinct text per stream so the answer cache cannot replay one stream's answer for another
+        await asyncio.gather(*(run_stream(client, url, user_id, f"{query} ({tag} {i})", i, events) for i in range(n)))
+        return time.perf_counter() - started, sorted(events)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--streams", type=int, default=8)
+    parser.add_argument("--token-delay-ms", type=float, default=40.0)
+    parser.add_argument("--user-id", default="a1b2-401")
+    parser.add_argument("--query", default="What is the eradication rate for Streptococcus pneumoniae?")
+    args = parser.parse_args()
+
+    from benchmarks.fake_openai import serve
+    fake_port = free_port()
+    fake = serve(port=fake_port, latency_ms=20, token_delay_ms=args.token_delay_ms)
+    threading.Thread(target=fake.serve_forever, daemon=True).start()
+
+    # Config is read at import time, so point the app at the stand-in before importing it
+    os.environ["OPENAI_BASE_URL"] = f"http://127.0.0.1:{fake_port}/v1"
+    os.environ["OPENAI_API_KEY"] = "local"
+    import uvicorn
+    from main import app
+
+    app_port = free_port()
+    server = uvicorn.Server(uvicorn.Config(app, host="127.0.0.1", port=app_port, log_level="warning"))
+    threading.Thread(target=server.run, daemon=True).start()
+    while not server.started:
+        time.sleep(0.05)
+
+    url = f"http://127.0.0.1:{app_port}/api/search"
+    baseline, _ = asyncio.run(run_batch(url, args.user_id, args.query, 1, "baseline"))
+    elapsed, events = asyncio.run(run_batch(url, args.user_id, args.query, args.streams, "stream"))
+    server.should_exit = True
+
+    switches = sum(1 for (_, a), (_, b) in zip(events, events[1:]) if a != b)
+    serialized = args.streams * baseline
+    print(f"1 stream:  {baseline:.2f}s")
+    print(f"{args.streams} streams: {elapsed:.2f}s (serialized would be ~{serialized:.2f}s)")
+    print(f"answer chunks: {len(events)}, stream switches between consecutive chunks: {switches}")
+
+    interleaved = elapsed < 0.5 * serialized and switches >= args.streams
+    print("PASS: streams interleave" if interleaved else "FAIL: streams serialized")
+    sys.exit(0 if interleaved else 1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,145 @@
+#!/usr/bin/env python3
+"""Answer-context tokens with the context packer vs the verbatim top-K chunks.
+
+Calls `search_knowledge` / `search_history` directly (no server, no answer
+generation) against the local OpenAI stand-in and prints, per query, how many
+retrieved chunks were packed, dropped as repeats, trimmed or left out by the
+budget, and the estimated prompt tokens before and after. Also checks that
+every `[Source N]` / `[Submission N]` label in the context has the citation
+with index N, in order. Then packs what the previous chunker put side by side
+in the index (each transcript asset's full transcript plus all of its segments)
+to show the repeat removal on overlapping chunks, and checks that windows of
+one table split small still each carry its title and header row after
+packing. Needs an ingested index.
+
+    uv run python -m benchmarks.context_packing --budget 2400
+"""
+import argparse
+import asyncio
+import os
+import re
+import threading
+from benchmarks.concurrent_streams import free_port
+
+QUERIES = [
+    ("knowledge", "a1b2-401", "What is the eradication rate for Streptococcus pneumoniae?"),
+    ("knowledge", "a1b2-401", "What is the dosage for Lydrenex?"),
+    ("knowledge", "a1b2-401", "How does Amproxin work?"),
+    ("knowledge", "a1b2-401", "How should I handle objections about price?"),
+    ("knowledge", "f2g3-580", "Show me the GridMaster PUE efficiency table"),
+    ("knowledge", "f2g3-580", "What are the benefits of liquid cooling?"),
+    ("history", "f2g3-580", "When did I mention cooling energy costs?"),
+    ("history", "f2g3-580", "What feedback did I get on my pitch?"),
+]
+
+
+def legacy_transcripts():
+    """Per transcript asset: its full-transcript chunk followed by its segment chunks, as items for the packer."""
+    from benchmarks.chunking_report import corpus
+    for asset, _, data in corpus():
+        if asset.type == "pdf" or not data.get("segments") or not data.get("full_transcript"):
+            continue
+        items = [{"text": data["full_transcript"], "meta": {"asset_id": asset.id}}]
+        items += [{"text": seg["text"], "meta": {"asset_id": asset.id, "start": seg.get("start", ""),
+                                                 "end": seg.get("end", "")}} for seg in data["segments"]]
+        yield asset, [{**item, "title": asset.file_name, "citation": {}} for item in items]
+
+
+def table_splits():
+    """Per corpus table with more than one row, split into windows of about one row each:
+    (title line, header line, items for the packer)."""
+    from benchmarks.chunking_report import corpus
+    from ingestion.chunker import table_windows, format_table, estimate_tokens
+    for asset, _, data in corpus():
+        if asset.type != "pdf":
+            continue
+        for page in data:
+            for table in page.get("tables", []):
+                if len(table.get("rows", [])) < 2 or not table.get("headers"):
+                    continue
+                row_tokens = max(estimate_tokens(" | ".join(map(str, row)) + "\n") for row in table["rows"])
+                windows = table_windows(table, estimate_tokens(format_table(table, rows=[])) + row_tokens)
+                meta = {"asset_id": asset.id, "page": page.get("page", 0), "chunk_type": "table"}
+                yield f"Table: {table.get('title', '')}", " | ".join(table["headers"]), [
+                    {"text": text, "meta": meta, "title": asset.file_name, "citation": {}} for text in windows]
+
+
+LABEL_RE = re.compile(r"^\[(?:Source|Submission) (\d+):", re.MULTILINE)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--budget", type=int, default=None, help="CONTEXT_MAX_TOKENS override")
+    args = parser.parse_args()
+
+    if args.budget is not None:
+        os.environ["CONTEXT_MAX_TOKENS"] = str(args.budget)
+    from benchmarks.fake_openai import serve
+    fake_port = free_port()
+    fake = serve(port=fake_port, latency_ms=0)
+    threading.Thread(target=fake.serve_forever, daemon=True).start()
+    os.environ["OPENAI_BASE_URL"] = f"http://127.0.0.1:{fake_port}/v1"
+    os.environ["OPENAI_API_KEY"] = "local"
+
+    from config import CONTEXT_MAX_TOKENS
+    from database.models import async_engine
+    from services.access_index import access_index
+    from services.auth import get_user
+    from search.knowledge import search_knowledge
+    from search.history import search_history
+    access_index.refresh(force=True)
+
+    async def run_all():
+        # One event loop for every query: pooled async SQLite connections are bound to it
+        results = []
+        for intent, user_id, query in QUERIES:
+            user = await get_user(user_id)
+            search = search_knowledge if intent == "knowledge" else search_history
+            results.append(await search(query, user_id, user["company_id"]))
+        await async_engine.dispose()
+        return results
+
+    results = asyncio.run(run_all())
+    print(f"context budget: {CONTEXT_MAX_TOKENS} tokens\n")
+    print(f"{'chunks':>6} {'packed':>6} {'dups':>5} {'trimmed':>7} {'budget':>6} {'before':>7} {'after':>6} {'saved':>6}  query")
+    before = after = 0
+    for (intent, _, query), result in zip(QUERIES, results):
+        if result["no_results"]:
+            print(f"{'':>55}  {query} (no results)")
+            continue
+        stats = result["context_stats"]
+        labels = [int(n) for n in LABEL_RE.findall(result["context"])]
+        indices = [c["index"] for c in result["citations"]]
+        assert labels == indices == list(range(1, len(indices) + 1)), (query, labels, indices)
+        before += stats["tokens_before"]
+        after += stats["tokens"]
+        print(f"{stats['chunks']:>6} {stats['packed']:>6} {stats['duplicates']:>5} {stats['trimmed']:>7} "
+              f"{stats['over_budget'] + stats['cut']:>6} {stats['tokens_before']:>7} {stats['tokens']:>6} "
+              f"{stats['tokens_saved']:>6}  [{intent}] {query}")
+    print(f"\ncontext tokens {before:,} -> {after:,} ({after / before - 1:+.0%}); citation numbering matches labels")
+
+    from search.context_packer import pack_context, SEPARATOR
+    before = after = chunks = dropped = 0
+    for asset, items in legacy_transcripts():
+        _, _, stats = pack_context(items, max_tokens=10**9)
+        before += stats["tokens_before"]
+        after += stats["tokens"]
+        chunks += stats["chunks"]
+        dropped += stats["duplicates"]
+    print(f"previous chunker's transcript chunks (no budget): {chunks} chunks, {dropped} dropped as repeats, "
+          f"tokens {before:,} -> {after:,} ({after / before - 1:+.0%})")
+
+    tables = windows = 0
+    for title, header, items in table_splits():
+        context, _, stats = pack_context(items, max_tokens=10**9)
+        blocks = context.split(SEPARATOR)
+        assert stats["packed"] == len(items), (title, stats)
+        assert all(title in block and header in block for block in blocks), title
+        tables += 1
+        windows += len(items)
+    print(f"tables split into windows: {tables} tables, {windows} windows packed, "
+          f"each with its title and header row")
+
+
+if __name__ == "__main__":
+    main()
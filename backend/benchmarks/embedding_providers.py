@@ -0,0 +1,149 @@
+#!/usr/bin/env python3
+"""Ingestion and query embedding cost: OpenAI provider (via the local stand-in) vs the in-process provider.
+
+For each provider, ingests the real corpus into a temp dir with
+`EMBEDDING_PROVIDER` set (the OpenAI provider talks to benchmarks/fake_openai.py
+with a fixed latency per request, standing in for the network round trip),
+then a subprocess in the same environment times query embeddings and full
+`search_knowledge` calls with the query-embedding cache cleared, measures
+self-retrieval recall@5 (a query made of words from a sampled chunk should
+return that chunk), and checks that opening the index with the other provider
+is refused. The stand-in's vectors are hashed words too, so recall compares two
+lexical models; it says nothing about the real OpenAI model's quality.
+
+    uv run python -m benchmarks.embedding_providers --latency-ms 40
+"""
+import argparse
+import asyncio
+import json
+import os
+import random
+import re
+import shutil
+import statistics
+import sys
+import tempfile
+import threading
+import time
+from pathlib import Path
+from benchmarks.concurrent_streams import free_port
+from benchmarks.hybrid_retrieval import QUERIES
+from benchmarks.scale_benchmark import state_env, run_child
+
+PROVIDERS = ("openai", "local")
+
+
+def query_worker(args):
+    """Runs inside one provider's environment; prints one JSON line of measurements."""
+    from database.models import async_engine
+    from services.access_index import access_index
+    from services.auth import get_user
+    from services.embedding_providers import provider, make_provider, IndexMismatchError
+    from services.embeddings import embedding_service, aembed_query
+    from services.lexical_index import lexical_index
+    from services.vector_store import vector_store, VectorStore
+    from search.knowledge import search_knowledge
+    counts = vector_store.warm_up()
+    access_index.refresh(force=True)
+
+    rng = random.Random(args.seed)
+    rows = lexical_index._conn().execute(
+        "SELECT id, collection, text FROM chunks WHERE collection LIKE 'knowledge%' ORDER BY id").fetchall()
+    samples = rng.sample(rows, min(args.samples, len(rows)))
+
+    async def measure():
+        embed_ms, search_ms = [], []
+        for _ in range(args.repeat):
+            for user_id, query in QUERIES:
+                embedding_service.lru.clear()
+                started = time.perf_counter()
+                await aembed_query(query)
+                embed_ms.append((time.perf_counter() - started) * 1000)
+                embedding_service.lru.clear()
+                user = await get_user(user_id)
+                started = time.perf_counter()
+                await search_knowledge(query, user_id, user["company_id"])
+                search_ms.append((time.perf_counter() - started) * 1000)
+        hits = 0
+        for chunk_id, collection_name, text in samples:
+            words = re.findall(r"[A-Za-z]{4,}", text)
+            start = rng.randrange(max(1, len(words) - args.query_words))
+            vector = await aembed_query(" ".join(words[start:start + args.query_words]))
+            result = vector_store.collection(collection_name).query(query_embeddings=[vector], n_results=5, include=[])
+            hits += chunk_id in result["ids"][0]
+        await async_engine.dispose()
+        return embed_ms, search_ms, hits
+
+    embed_ms, search_ms, hits = asyncio.run(measure())
+    other = make_provider("local" if provider.name == "openai" else "openai")
+    refused = 0
+    for name in counts:
+        try:
+            VectorStore(embedder=other).collection(name)
+        except IndexMismatchError:
+            refused += 1
+    print(json.dumps({
+        "provider": f"{provider.name}/{provider.model}", "dim": provider.dim, "collections": len(counts),
+        "embed_p50": statistics.median(embed_ms), "embed_p95": statistics.quantiles(embed_ms, n=20)[-1],
+        "search_p50": statistics.median(search_ms), "search_p95": statistics.quantiles(search_ms, n=20)[-1],
+        "recall": hits / len(samples) if samples else 0.0, "samples": len(samples), "refused": refused,
+    }))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--latency-ms", type=float, default=40.0, help="stand-in latency per embeddings request")
+    parser.add_argument("--repeat", type=int, default=5, help="passes over the query set")
+    parser.add_argument("--samples", type=int, default=200, help="chunks sampled for self-retrieval recall")
+    parser.add_argument("--query-words", type=int, default=6)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--query-worker", action="store_true", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+    if args.query_worker:
+        return query_worker(args)
+
+    from config import DATABASE_DIR, ASSETS_DIR
+    from benchmarks.fake_openai import serve
+    fake_port = free_port()
+    fake = serve(port=fake_port, latency_ms=args.latency_ms)
+    threading.Thread(target=fake.serve_forever, daemon=True).start()
+
+    rows = []
+    for name in PROVIDERS:
+        root = Path(tempfile.mkdtemp(prefix=f"embed_{name}_"))
+        try:
+            env = {**os.environ, **state_env(root), "DATABASE_DIR": str(DATABASE_DIR), "ASSETS_DIR": str(ASSETS_DIR),
+                   "EMBEDDING_PROVIDER": name, "OPENAI_BASE_URL": f"http://127.0.0.1:{fake_port}/v1",
+                   "OPENAI_API_KEY": "local", "ANONYMIZED_TELEMETRY": "False"}
+            env.pop("EMBEDDING_MODEL", None)
+            seconds, _, status = run_child(["run_ingestion.py"], env, root / "ingest.log")
+            log = (root / "ingest.log").read_text()
+            if status:
+                sys.exit(f"{name} ingestion failed:\n{log[-2000:]}")
+            chunks = int(re.search(r"Ingested (\d+) chunks", log).group(1))
+            _, _, status = run_child(
+                ["-m", "benchmarks.embedding_providers", "--query-worker", "--repeat", str(args.repeat),
+                 "--samples", str(args.samples), "--query-words", str(args.query_words), "--seed", str(args.seed)],
+                env, root / "query.log",
+            )
+            query_log = (root / "query.log").read_text()
+            if status:
+                sys.exit(f"{name} query worker failed:\n{query_log[-2000:]}")
+            rows.append({"chunks": chunks, "ingest_s": seconds, **json.loads(query_log.strip().splitlines()[-1])})
+        finally:
+            shutil.rmtree(root, ignore_errors=True)
+
+    print(f"stand-in latency {args.latency_ms:.0f}ms per embeddings request; {len(QUERIES)} queries x {args.repeat}, "
+          f"query embedding cache cleared before each call\n")
+    print(f"{'provider':<36} {'dim':>5} {'chunks':>7} {'ingest s':>9} {'embed p50':>10} {'embed p95':>10} "
+          f"{'search p50':>11} {'search p95':>11} {'recall@5':>9} {'refused':>8}")
+    for r in rows:
+        print(f"{r['provider']:<36} {r['dim']:>5} {r['chunks']:>7} {r['ingest_s']:>9.1f} {r['embed_p50']:>10.2f} "
+              f"{r['embed_p95']:>10.2f} {r['search_p50']:>11.1f} {r['search_p95']:>11.1f} {r['recall']:>9.0%} "
+              f"{r['refused']:>4}/{r['collections']}")
+    assert all(r["refused"] == r["collections"] for r in rows), "an index was opened with a different provider"
+    print("\nevery collection refused queries from the other provider")
+
+
+if __name__ == "__main__":
+    main()
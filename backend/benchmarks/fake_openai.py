@@ -0,0 +1,180 @@
+#!/usr/bin/env python3
+"""Local stand-in for the OpenAI embeddings and chat completions APIs.
+
+Serves deterministic feature-hashed vectors and canned (optionally streamed)
+chat completions so ingestion and the search path can be exercised and timed
+without network access:
+
+    uv run python -m benchmarks.fake_openai --port 8100 --latency-ms 40
+    OPENAI_BASE_URL=http://127.0.0.1:8100/v1 OPENAI_API_KEY=local uv run python run_ingestion.py
+"""
+import argparse
+import hashlib
+import json
+import math
+import re
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+TOKEN_RE = re.compile(r"[a-z0-9]+")
+
+
+def fake_embedding(text: str, dim: int) -> list[float]:
+    vec = [0.0] * dim
+    for token in TOKEN_RE.findall(text.lower()):
+        h = int.from_bytes(hashlib.blake2b(token.encode(), digest_size=8).digest(), "little")
+        vec[h % dim] += 1.0 if (h >> 32) & 1 else -1.0
+    norm = math.sqrt(sum(v * v for v in vec)) or 1.0
+    return [v / norm for v in vec]
+
+
+def shorten(vector: list[float], dimensions: int | None) -> list[float]:
+    """What the API does for `dimensions`: keep the leading components and renormalize."""
+    if not dimensions or dimensions >= len(vector):
+        return vector
+    head = vector[:dimensions]
+    norm = math.sqrt(sum(v * v for v in head)) or 1.0
+    return [v / norm for v in head]
+
+
+def fake_intent(query: str) -> str:
+    q = f" {query.lower()} "
+    if any(s in q for s in (" my ", " i ", " did i ", " me ")):
+        return "HISTORY_SEARCH"
+    if any(s in q for s in ("joke", "weather", "cake", "super bowl")):
+        return "OUT_OF_SCOPE"
+    return "KNOWLEDGE_SEARCH"
+
+
+ANSWER_TEXT = (
+    "Based on your assigned materials [Source 1], the requested figure is stated in the "
+    "source table. The supporting detail appears in [Source 2] with the exact values."
+)
+
+
+def answer_text(tokens: int = 0) -> str:
+    """The canned answer, repeated or cut to `tokens` streamed tokens (0 keeps it as is)."""
+    if not tokens:
+        return ANSWER_TEXT
+    words = re.findall(r"\S+\s*", ANSWER_TEXT)
+    return "".join(words[i % len(words)] for i in range(tokens)).rstrip()
+
+
+class FakeOpenAIHandler(BaseHTTPRequestHandler):
+    latency = 0.0
+    per_input_latency = 0.0
+    token_delay = 0.0
+    answer_tokens = 0
+    dim = 1536
+    stats = {"requests": 0, "inputs": 0}
+
+    def log_message(self, format, *args):
+        pass
+
+    def _send_json(self, status: int, payload: dict):
+        body = json.dumps(payload).encode()
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_POST(self):
+        length = int(self.headers.get("Content-Length", 0))
+        payload = json.loads(self.rfile.read(length) or b"{}")
+        if self.path.rstrip("/").endswith("/embeddings"):
+            inputs = payload.get("input", [])
+            if isinstance(inputs, str):
+                inputs = [inputs]
+            self.stats["requests"] += 1
+            self.stats["inputs"] += len(inputs)
+            time.sleep(self.latency + self.per_input_latency * len(inputs))
+            self._send_json(200, {
+                "object": "list",
+                "model": payload.get("model", ""),
+                "data": [
+                    {"object": "embedding", "index": i,
+                     "embedding": shorten(fake_embedding(t, self.dim), payload.get("dimensions"))}
+                    for i, t in enumerate(inputs)
+                ],
+                "usage": {"prompt_tokens": sum(len(t) // 4 + 1 for t in inputs),
+                          "total_tokens": sum(len(t) // 4 + 1 for t in inputs)},
+            })
+            return
+        if self.path.rstrip("/").endswith("/chat/completions"):
+            self.stats["requests"] += 1
+            time.sleep(self.latency)
+            self._chat(payload)
+            return
+        self._send_json(404, {"error": {"message": f"Unsupported path {self.path}"}})
+
+    def _chat(self, payload: dict):
+        messages = payload.get("messages", [])
+        query = messages[-1]["content"] if messages else ""
+        created = int(time.time())
+        if payload.get("response_format", {}).get("type") == "json_object" and query.startswith('{"queries"'):
+            content = json.dumps({"results": [
+                {"index": item["index"], "intent": fake_intent(item["query"]), "reasoning": "Local stand-in classifier."}
+                for item in json.loads(query)["queries"]
+            ]})
+        elif payload.get("response_format", {}).get("type") == "json_object":
+            content = json.dumps({"intent": fake_intent(query), "reasoning": "Local stand-in classifier."})
+        else:
+            content = answer_text(self.answer_tokens)
+
+        if not payload.get("stream"):
+            self._send_json(200, {
+                "id": "chatcmpl-local", "object": "chat.completion", "created": created,
+                "model": payload.get("model", ""),
+                "choices": [{"index": 0, "message": {"role": "assistant", "content": content},
+                             "finish_reason": "stop"}],
+                "usage": {"prompt_tokens": 0, "completion_tokens": 0, "total_tokens": 0},
+            })
+            return
+
+        # No Content-Length: the body is delimited by closing the connection (HTTP/1.0)
+        self.send_response(200)
+        self.send_header("Content-Type", "text/event-stream")
+        self.end_headers()
+        for token in re.findall(r"\S+\s*", content):
+            time.sleep(self.token_delay)
+            chunk = {
+                "id": "chatcmpl-local", "object": "chat.completion.chunk", "created": created,
+                "model": payload.get("model", ""),
+                "choices": [{"index": 0, "delta": {"content": token}, "finish_reason": None}],
+            }
+            self.wfile.write(f"data: {json.dumps(chunk)}\n\n".encode())
+            self.wfile.flush()
+        self.wfile.write(b"data: [DONE]\n\n")
+        self.wfile.flush()
+
+
+def serve(host: str = "127.0.0.1", port: int = 8100, latency_ms: float = 0.0,
+          per_input_ms: float = 0.0, token_delay_ms: float = 0.0, dim: int = 1536,
+          answer_tokens: int = 0) -> ThreadingHTTPServer:
+    handler = type("Handler", (FakeOpenAIHandler,), {
+        "latency": latency_ms / 1000, "per_input_latency": per_input_ms / 1000,
+        "token_delay": token_delay_ms / 1000, "answer_tokens": answer_tokens, "dim": dim,
+        "stats": {"requests": 0, "inputs": 0},
+    })
+    return ThreadingHTTPServer((host, port), handler)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8100)
+    parser.add_argument("--latency-ms", type=float, default=0.0, help="fixed latency per request")
+    parser.add_argument("--per-input-ms", type=float, default=0.0, help="extra latency per input")
+    parser.add_argument("--token-delay-ms", type=float, default=0.0, help="delay between streamed tokens")
+    parser.add_argument("--tokens-per-second", type=float, default=0.0, help="streaming rate (overrides --token-delay-ms)")
+    parser.add_argument("--answer-tokens", type=int, default=0, help="streamed answer length (0: the short canned answer)")
+    parser.add_argument("--dim", type=int, default=1536)
+    args = parser.parse_args()
+    token_delay_ms = 1000 / args.tokens_per_second if args.tokens_per_second else args.token_delay_ms
+    server = serve(args.host, args.port, args.latency_ms, args.per_input_ms, token_delay_ms, args.dim, args.answer_tokens)
+    print(f"Fake OpenAI API listening on http://{args.host}:{args.port}/v1")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
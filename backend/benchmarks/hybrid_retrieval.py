@@ -0,0 +1,108 @@
+#!/usr/bin/env python3
+"""Knowledge retrieval latency and embedding calls: vector-only vs hybrid vs lexical fast path.
+
+Calls `search_knowledge` directly (no server, no answer generation) for a set
+of identifier-style and natural-language queries against the local OpenAI
+stand-in, whose fixed latency plays the embedding round trip. For each mode it
+prints p50 latency, embedding API calls and which path served each query, plus
+how many of the vector-only top-K citations the other modes keep. Needs an
+ingested index (including the FTS5 lexical index).
+
+    uv run python -m benchmarks.hybrid_retrieval --latency-ms 100
+"""
+import argparse
+import asyncio
+import os
+import statistics
+import threading
+import time
+from collections import Counter
+from benchmarks.concurrent_streams import free_port
+
+QUERIES = [
+    ("a1b2-401", "Lydrenex dosage"),
+    ("a1b2-401", "Amproxin eradication rate"),
+    ("a1b2-401", "What is the eradication rate for Streptococcus pneumoniae?"),
+    ("a1b2-401", "How does Amproxin work?"),
+    ("a1b2-401", "How should I handle objections about price?"),
+    ("f2g3-580", "GridMaster PUE table"),
+    ("f2g3-580", "Show me the GridMaster PUE efficiency table"),
+    ("f2g3-580", "What are the benefits of liquid cooling?"),
+    ("f2g3-580", "How do I explain energy savings to a CFO?"),
+]
+
+MODES = {
+    "vector": {"HYBRID_RETRIEVAL": False, "LEXICAL_FAST_PATH": False},
+    "hybrid": {"HYBRID_RETRIEVAL": True, "LEXICAL_FAST_PATH": False},
+    "hybrid+fast": {"HYBRID_RETRIEVAL": True, "LEXICAL_FAST_PATH": True},
+}
+
+
+async def run_mode(rounds: int) -> tuple[list[float], list[str], list[list[str]]]:
+    from services.auth import get_user
+    from services.embeddings import embedding_service
+    from search.knowledge import search_knowledge
+    latencies, paths, cited = [], [], []
+    for _ in range(rounds):
+        # Every round pays for its embeddings, as a first-time query would
+        embedding_service.lru.clear()
+        for user_id, query in QUERIES:
+            user = await get_user(user_id)
+            started = time.perf_counter()
+            result = await search_knowledge(query, user_id, user["company_id"])
+            latencies.append((time.perf_counter() - started) * 1000)
+            paths.append(result.get("retrieval", {}).get("path", "vector"))
+            cited.append([(c["source_file"], c.get("page"), c.get("table_title")) for c in result["citations"]])
+    return latencies, paths, cited
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--latency-ms", type=float, default=100.0, help="stand-in latency per embedding call")
+    parser.add_argument("--rounds", type=int, default=3)
+    args = parser.parse_args()
+
+    from benchmarks.fake_openai import serve
+    fake_port = free_port()
+    fake = serve(port=fake_port, latency_ms=args.latency_ms)
+    threading.Thread(target=fake.serve_forever, daemon=True).start()
+    os.environ["OPENAI_BASE_URL"] = f"http://127.0.0.1:{fake_port}/v1"
+    os.environ["OPENAI_API_KEY"] = "local"
+
+    import search.hybrid
+    import search.knowledge
+    from database.models import async_engine
+    from services.access_index import access_index
+    from services.embeddings import embedding_service
+    access_index.refresh(force=True)
+
+    async def run_all():
+        # One event loop for every mode: pooled async SQLite connections are bound to it
+        results = {}
+        for mode, flags in MODES.items():
+            search.knowledge.HYBRID_RETRIEVAL = flags["HYBRID_RETRIEVAL"]
+            search.hybrid.LEXICAL_FAST_PATH = flags["LEXICAL_FAST_PATH"]
+            calls_before = embedding_service.stats["api_calls"]
+            latencies, paths, cited = await run_mode(args.rounds)
+            results[mode] = (latencies, paths, cited, embedding_service.stats["api_calls"] - calls_before)
+        await async_engine.dispose()
+        return results
+
+    results = asyncio.run(run_all())
+    n = len(QUERIES) * args.rounds
+    print(f"stand-in latency per embedding call: {args.latency_ms:.0f}ms, {n} searches per mode\n")
+    print(f"{'mode':<12} {'p50 ms':>8} {'embed calls':>12} {'top-K kept':>11}  paths")
+    vector_cited = results["vector"][2]
+    for mode, (latencies, paths, cited, calls) in results.items():
+        kept = [len(set(a) & set(b)) / len(b) for a, b in zip(cited, vector_cited) if b]
+        print(f"{mode:<12} {statistics.median(latencies):>8.1f} {calls:>12} {statistics.mean(kept):>10.0%}  "
+              f"{dict(Counter(paths))}")
+
+    print("\nper query (hybrid+fast):")
+    _, paths, _, _ = results["hybrid+fast"]
+    for (user_id, query), path in zip(QUERIES, paths):
+        print(f"  {path:<8} {query}")
+
+
+if __name__ == "__main__":
+    main()
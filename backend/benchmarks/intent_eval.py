@@ -0,0 +1,78 @@
+#!/usr/bin/env python3
+"""Accuracy and LLM-call rate of the fast-path intent classifier on a labeled eval set.
+
+Runs every query in benchmarks/data/intent_eval.jsonl through the in-process
+pre-classifier and reports how many it answers on its own (the rest would go
+to the LLM router), how often those answers are right, per-intent breakdown
+and latency. With --llm, the fallbacks are sent to the real router too and
+end-to-end accuracy is reported (needs OPENAI_API_KEY).
+
+    uv run python -m benchmarks.intent_eval
+"""
+import argparse
+import asyncio
+import json
+import statistics
+import time
+from collections import Counter
+from pathlib import Path
+
+EVAL_SET = Path(__file__).resolve().parent / "data" / "intent_eval.jsonl"
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--eval-set", default=str(EVAL_SET))
+    parser.add_argument("--llm", action="store_true", help="classify fallbacks with the LLM router")
+    args = parser.parse_args()
+
+    import os
+    os.environ.setdefault("OPENAI_API_KEY", "unused")
+    from search.router import fast_router, classify_intent
+
+    rows = [json.loads(line) for line in Path(args.eval_set).read_text().splitlines() if line.strip()]
+    fast_router.load_products()
+
+    handled, correct, latencies = Counter(), Counter(), []
+    totals = Counter(row["intent"] for row in rows)
+    misroutes, fallbacks = [], []
+    for row in rows:
+        started = time.perf_counter()
+        result = fast_router.classify(row["query"])
+        latencies.append((time.perf_counter() - started) * 1000)
+        if result is None:
+            fallbacks.append(row)
+            continue
+        handled[row["intent"]] += 1
+        if result["intent"] == row["intent"]:
+            correct[row["intent"]] += 1
+        else:
+            misroutes.append((row["query"], row["intent"], result["intent"], result["reasoning"]))
+
+    n_handled = sum(handled.values())
+    print(f"{len(rows)} labeled queries")
+    print(f"fast path handled {n_handled} ({n_handled / len(rows):.0%}), "
+          f"LLM-call rate {len(fallbacks) / len(rows):.0%}")
+    print(f"fast-path accuracy {sum(correct.values()) / max(n_handled, 1):.1%} on handled queries")
+    print(f"latency p50 {statistics.median(latencies):.3f}ms, max {max(latencies):.3f}ms\n")
+    print(f"{'intent':<22} {'total':>5} {'fast':>5} {'correct':>7}")
+    for intent in sorted(totals):
+        print(f"{intent:<22} {totals[intent]:>5} {handled[intent]:>5} {correct[intent]:>7}")
+
+    if misroutes:
+        print("\nmisroutes:")
+        for query, expected, got, reasoning in misroutes:
+            print(f"  {query!r}: expected {expected}, got {got} ({reasoning})")
+
+    if args.llm:
+        async def classify_fallbacks():
+            return await asyncio.gather(*(classify_intent(row["query"]) for row in fallbacks))
+        llm_results = asyncio.run(classify_fallbacks())
+        llm_correct = sum(r["intent"] == row["intent"] for r, row in zip(llm_results, fallbacks))
+        total_correct = sum(correct.values()) + llm_correct
+        print(f"\nLLM accuracy on fallbacks {llm_correct}/{len(fallbacks)}; "
+              f"end-to-end accuracy {total_correct / len(rows):.1%}")
+
+
+if __name__ == "__main__":
+    main()
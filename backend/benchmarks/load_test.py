@@ -0,0 +1,263 @@
+#!/usr/bin/env python3
+"""End-to-end load test of /api/search against the local OpenAI stand-in.
+
+Starts the stand-in (fixed latency per call, streamed answers at a set token
+rate) and the app under uvicorn in a subprocess, then replays a query workload
+at a target concurrency: the labelled queries in benchmarks/data/intent_eval.jsonl
+and the router prompt's examples (or any JSONL of {"query", "user_id"?} via
+--workload), each paired with a seeded-random active user. Reports throughput,
+p50/p95/p99 time to first byte, first answer token and `done`, and error
+rates, overall and per intent. --output saves the run (with the commit it ran
+on) as JSON and --compare prints the change against such a file, so runs can
+be compared from one commit to the next. Needs an ingested index.
+
+    uv run python -m benchmarks.load_test --concurrency 16 --requests 400 --output /tmp/before.json
+    uv run python -m benchmarks.load_test --concurrency 16 --requests 400 --compare /tmp/before.json
+
+--url targets an already running server instead (no stand-in is started).
+"""
+import argparse
+import asyncio
+import json
+import os
+import random
+import subprocess
+import sys
+import threading
+import time
+from collections import Counter, defaultdict
+from pathlib import Path
+from benchmarks.concurrent_streams import free_port
+
+EVAL_PATH = Path(__file__).parent / "data" / "intent_eval.jsonl"
+METRICS = ("ttfb_ms", "first_answer_ms", "done_ms")
+
+
+def load_workload(path: Path | None) -> list[dict]:
+    if path:
+        with open(path) as f:
+            return [json.loads(line) for line in f if line.strip()]
+    from search.router import SYSTEM_PROMPT
+    from search.fast_router import seed_examples
+    with open(EVAL_PATH) as f:
+        queries = [json.loads(line)["query"] for line in f if line.strip()]
+    return [{"query": q} for q in dict.fromkeys(queries + [q for q, _ in seed_examples(SYSTEM_PROMPT)])]
+
+
+def active_users() -> list[str]:
+    from database.models import SessionLocal, User
+    session = SessionLocal()
+    try:
+        return [u.id for u in session.query(User).filter(User.is_active.is_(True)).order_by(User.id)]
+    finally:
+        session.close()
+
+
+def percentile(values: list[float], p: float) -> float | None:
+    """Nearest-rank percentile."""
+    if not values:
+        return None
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, max(0, round(p / 100 * len(ordered) + 0.5) - 1))]
+
+
+async def run_one(client, url: str, item: dict) -> dict:
+    started = time.perf_counter()
+    result = {"intent": "", "error": None, "ttfb_ms": None, "first_answer_ms": None, "done_ms": None}
+    elapsed = lambda: round((time.perf_counter() - started) * 1000, 2)
+    try:
+        async with client.stream("POST", url, json={"user_id": item["user_id"], "query": item["query"]}) as resp:
+            if resp.status_code != 200:
+                result["error"] = f"http_{resp.status_code}"
+                return result
+            event_type = ""
+            async for line in resp.aiter_lines():
+                if result["ttfb_ms"] is None:
+                    result["ttfb_ms"] = elapsed()
+                if line.startswith("event:"):
+                    event_type = line.split(":", 1)[1].strip()
+                elif line.startswith("data:"):
+                    if event_type == "intent":
+                        result["intent"] = json.loads(line[5:]).get("intent", "")
+                    elif event_type == "answer_chunk" and result["first_answer_ms"] is None:
+                        result["first_answer_ms"] = elapsed()
+                    elif event_type == "done":
+                        result["done_ms"] = elapsed()
+            if result["done_ms"] is None:
+                result["error"] = "no_done_event"
+    except Exception as e:
+        result["error"] = type(e).__name__
+    return result
+
+
+async def run_load(url: str, items: list[dict], concurrency: int) -> tuple[list[dict], float]:
+    import httpx
+    queue = asyncio.Queue()
+    for item in items:
+        queue.put_nowait(item)
+    results = []
+    limits = httpx.Limits(max_connections=concurrency, max_keepalive_connections=concurrency)
+
+    async with httpx.AsyncClient(timeout=120, limits=limits) as client:
+        async def worker():
+            while not queue.empty():
+                results.append(await run_one(client, url, queue.get_nowait()))
+
+        started = time.perf_counter()
+        await asyncio.gather(*(worker() for _ in range(concurrency)))
+        return results, time.perf_counter() - started
+
+
+def summarize(results: list[dict], elapsed: float) -> dict:
+    def stats(rows):
+        ok = [r for r in rows if not r["error"]]
+        summary = {"requests": len(rows), "errors": len(rows) - len(ok),
+                   "error_rate": round((len(rows) - len(ok)) / len(rows), 4) if rows else 0.0}
+        for metric in METRICS:
+            values = [r[metric] for r in ok if r[metric] is not None]
+            summary[metric] = {f"p{p}": percentile(values, p) for p in (50, 95, 99)}
+        return summary
+
+    by_intent = defaultdict(list)
+    for r in results:
+        by_intent[r["intent"] or "unknown"].append(r)
+    return {
+        **stats(results),
+        "throughput_rps": round(len(results) / elapsed, 2),
+        "elapsed_s": round(elapsed, 2),
+        "error_kinds": dict(Counter(r["error"] for r in results if r["error"])),
+        "intents": {intent: stats(rows) for intent, rows in sorted(by_intent.items())},
+    }
+
+
+def fmt(value) -> str:
+    return "-" if value is None else f"{value:.1f}"
+
+
+def print_summary(summary: dict):
+    print(f"{summary['requests']} requests in {summary['elapsed_s']}s: {summary['throughput_rps']} req/s, "
+          f"error rate {summary['error_rate']:.2%} {summary['error_kinds'] or ''}\n")
+    print(f"{'':<22} {'n':>5} {'err':>5}" + "".join(f" {m[:-3] + ' p' + str(p):>13}" for m in METRICS for p in (50, 95, 99)))
+    rows = [("all", summary)] + list(summary["intents"].items())
+    for name, s in rows:
+        print(f"{name:<22} {s['requests']:>5} {s['errors']:>5}"
+              + "".join(f" {fmt(s[m][f'p{p}']):>13}" for m in METRICS for p in (50, 95, 99)))
+
+
+def print_comparison(before: dict, after: dict):
+    print(f"\nvs {before['commit']} ({before['config']['concurrency']} concurrent, {before['summary']['requests']} requests):")
+    b, a = before["summary"], after["summary"]
+    changed = sorted(k for k in after["config"] if before["config"].get(k) != after["config"][k])
+    if changed:
+        print(f"  note: run settings differ: {', '.join(changed)}")
+
+    def delta(old, new, lower_is_better=True):
+        if old is None or new is None or not old:
+            return "-"
+        change = new / old - 1
+        better = change < 0 if lower_is_better else change > 0
+        return f"{old:.1f} -> {new:.1f} ({change:+.1%}{', better' if better and abs(change) >= 0.05 else ''})"
+
+    print(f"  throughput req/s  {delta(b['throughput_rps'], a['throughput_rps'], lower_is_better=False)}")
+    print(f"  error rate        {b['error_rate']:.2%} -> {a['error_rate']:.2%}")
+    for metric in METRICS:
+        for p in (50, 95, 99):
+            print(f"  {metric[:-3] + ' p' + str(p):<17} {delta(b[metric][f'p{p}'], a[metric][f'p{p}'])}")
+
+
+def start_app(port: int, env: dict) -> subprocess.Popen:
+    import httpx
+    proc = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "main:app", "--host", "127.0.0.1", "--port", str(port), "--log-level", "warning"],
+        cwd=Path(__file__).resolve().parent.parent, env=env,
+    )
+    deadline = time.time() + 60
+    while time.time() < deadline:
+        if proc.poll() is not None:
+            raise RuntimeError("app exited during startup")
+        try:
+            if httpx.get(f"http://127.0.0.1:{port}/api/companies", timeout=1).status_code == 200:
+                return proc
+        except httpx.HTTPError:
+            pass
+        time.sleep(0.2)
+    proc.terminate()
+    raise RuntimeError("app did not start within 60s")
+
+
+def git_commit() -> str:
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return "unknown"
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--requests", type=int, default=200)
+    parser.add_argument("--warmup", type=int, default=10, help="requests sent (and discarded) before measuring")
+    parser.add_argument("--workload", type=Path, help='JSONL of {"query", "user_id"?}; default: eval set + router examples')
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--unique", action="store_true", help="make every query distinct so the answer cache never hits")
+    parser.add_argument("--latency-ms", type=float, default=40.0, help="stand-in latency per OpenAI call")
+    parser.add_argument("--tokens-per-second", type=float, default=50.0, help="stand-in answer streaming rate")
+    parser.add_argument("--answer-tokens", type=int, default=40, help="stand-in answer length in tokens")
+    parser.add_argument("--url", help="base URL of a running server (skips starting the stand-in and the app)")
+    parser.add_argument("--output", type=Path, help="save the run as JSON")
+    parser.add_argument("--compare", type=Path, help="print the change against a saved run")
+    args = parser.parse_args()
+
+    os.environ.setdefault("OPENAI_API_KEY", "unused")
+    rng = random.Random(args.seed)
+    workload = load_workload(args.workload)
+    users = active_users()
+    items = []
+    for i in range(args.warmup + args.requests):
+        item = dict(workload[i % len(workload)] if i < len(workload) else rng.choice(workload))
+        item.setdefault("user_id", rng.choice(users))
+        if args.unique:
+            item["query"] = f"{item['query']} (#{i})"
+        items.append(item)
+    rng.shuffle(items)
+
+    proc = None
+    base_url = args.url
+    if not base_url:
+        from benchmarks.fake_openai import serve
+        fake_port = free_port()
+        fake = serve(port=fake_port, latency_ms=args.latency_ms, token_delay_ms=1000 / args.tokens_per_second,
+                     answer_tokens=args.answer_tokens)
+        threading.Thread(target=fake.serve_forever, daemon=True).start()
+        app_port = free_port()
+        proc = start_app(app_port, {**os.environ, "OPENAI_BASE_URL": f"http://127.0.0.1:{fake_port}/v1",
+                                    "OPENAI_API_KEY": "local"})
+        base_url = f"http://127.0.0.1:{app_port}"
+
+    try:
+        url = f"{base_url.rstrip('/')}/api/search"
+        if args.warmup:
+            asyncio.run(run_load(url, items[:args.warmup], min(args.concurrency, args.warmup)))
+        results, elapsed = asyncio.run(run_load(url, items[args.warmup:], args.concurrency))
+    finally:
+        if proc:
+            proc.terminate()
+            proc.wait()
+
+    summary = summarize(results, elapsed)
+    config = {k: (str(v) if isinstance(v, Path) else v) for k, v in vars(args).items() if k not in ("output", "compare")}
+    run = {"commit": git_commit(), "config": config, "summary": summary}
+    print(f"commit {run['commit']}, {args.concurrency} concurrent, workload of {len(workload)} queries x "
+          f"{len(users)} users, stand-in {args.latency_ms:.0f}ms/call {args.tokens_per_second:.0f} tok/s\n")
+    print_summary(summary)
+    if args.compare:
+        with open(args.compare) as f:
+            print_comparison(json.load(f), run)
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(run, f, indent=2)
+        print(f"\nsaved to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,107 @@
+#!/usr/bin/env python3
+"""Check that the history and user-detail lookups issue a constant number of SQL statements.
+
+Copies the SQLite database to a temp file, adds synthetic users with 1, 10 and
+100 submissions (each with a rep and feedback) and play assignments, then counts
+the statements executed by `get_user_submissions_with_feedback` and
+`GET /api/users/{id}` for each. Exits non-zero if any count grows with the
+number of rows. Needs a loaded database (`make ingest`).
+
+    uv run python -m benchmarks.query_counts
+"""
+import asyncio
+import os
+import shutil
+import sys
+import tempfile
+from contextlib import contextmanager
+
+SIZES = (1, 10, 100)
+
+
+def seed(session, company_id: str, n: int) -> str:
+    from database.models import User, Play, PlayAssignment, Rep, Asset, Submission, Feedback
+    user_id = f"qc-user-{n}"
+    session.add(User(id=user_id, username=user_id, company_id=company_id, is_active=True))
+    for i in range(n):
+        key = f"qc-{n}-{i}"
+        session.add(Play(id=f"play-{key}", company_id=company_id, title=f"Play {key}"))
+        session.add(PlayAssignment(id=f"pa-{key}", user_id=user_id, play_id=f"play-{key}", status="assigned"))
+        session.add(Rep(id=f"rep-{key}", play_id=f"play-{key}", company_id=company_id,
+                        prompt_type="practice", prompt_title=f"Rep {key}", prompt_text="Practice"))
+        session.add(Asset(id=f"ast-{key}", type="video", file_name=f"{key}.json", company_id=company_id))
+        session.add(Submission(id=f"sub-{key}", user_id=user_id, rep_id=f"rep-{key}",
+                               asset_id=f"ast-{key}", company_id=company_id, submission_type="video"))
+        session.add(Feedback(id=f"fb-{key}", submission_id=f"sub-{key}", company_id=company_id,
+                             score=7, text="Good pacing"))
+    return user_id
+
+
+@contextmanager
+def counting(engines):
+    from sqlalchemy import event
+    counter = {"statements": 0}
+
+    def count(*_):
+        counter["statements"] += 1
+
+    for engine in engines:
+        event.listen(engine, "before_cursor_execute", count)
+    try:
+        yield counter
+    finally:
+        for engine in engines:
+            event.remove(engine, "before_cursor_execute", count)
+
+
+def main():
+    # Config is read at import time; no API calls are made here
+    os.environ.setdefault("OPENAI_API_KEY", "unused")
+    from config import SQLITE_DB_PATH
+    if not os.path.exists(SQLITE_DB_PATH):
+        sys.exit(f"{SQLITE_DB_PATH} not found; load the database first")
+    tmp = os.path.join(tempfile.mkdtemp(prefix="query_counts_"), "bigspring.db")
+    shutil.copy(SQLITE_DB_PATH, tmp)
+
+    # Point every session factory at the copy before the app modules use them
+    from sqlalchemy import create_engine
+    from sqlalchemy.ext.asyncio import create_async_engine
+    from database import models
+    engine = create_engine(f"sqlite:///{tmp}")
+    async_engine = create_async_engine(f"sqlite+aiosqlite:///{tmp}")
+    models.SessionLocal.configure(bind=engine)
+    models.AsyncSessionLocal.configure(bind=async_engine)
+
+    from services.auth import get_user_submissions_with_feedback
+    from main import get_user_detail
+
+    session = models.SessionLocal()
+    company_id = session.query(models.Company.id).first()[0]
+    users = {n: seed(session, company_id, n) for n in SIZES}
+    session.commit()
+    session.close()
+
+    counts = {"get_user_submissions_with_feedback": {}, "get_user_detail": {}}
+    for n, user_id in users.items():
+        with counting([async_engine.sync_engine]) as c:
+            rows = asyncio.run(get_user_submissions_with_feedback(user_id))
+        assert len(rows) == n, (n, len(rows))
+        counts["get_user_submissions_with_feedback"][n] = c["statements"]
+
+        with counting([engine]) as c:
+            detail = get_user_detail(user_id)
+        assert len(detail["assigned_plays"]) == n, (n, len(detail["assigned_plays"]))
+        counts["get_user_detail"][n] = c["statements"]
+
+    ok = True
+    for name, by_size in counts.items():
+        constant = len(set(by_size.values())) == 1
+        ok &= constant
+        sizes = ", ".join(f"{n} rows: {k}" for n, k in by_size.items())
+        print(f"{'OK  ' if constant else 'FAIL'} {name}: {sizes} statements")
+    shutil.rmtree(os.path.dirname(tmp), ignore_errors=True)
+    sys.exit(0 if ok else 1)
+
+
+if __name__ == "__main__":
+    main()
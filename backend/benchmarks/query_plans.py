@@ -0,0 +1,78 @@
+#!/usr/bin/env python3
+"""Check that every hot SQLite lookup is served by an index, not a table scan.
+
+Copies the database to a temp file, applies pending migrations, then runs
+`EXPLAIN QUERY PLAN` on the statements the request path issues (user lists,
+user detail, per-play watch reps, recommendation reps, history submissions and
+feedback). Exits non-zero if any plan step is a SCAN. `--no-migrate` shows the
+plans of the database as it is. Needs a loaded database (`make ingest`).
+
+    uv run python -m benchmarks.query_plans
+"""
+import argparse
+import os
+import shutil
+import sys
+import tempfile
+
+
+def hot_queries():
+    from sqlalchemy import select
+    from database.models import User, Play, PlayAssignment, Rep, Submission, Feedback
+    return {
+        "users by company (GET /api/companies/{id}/users)":
+            select(User).where(User.company_id == "comp-x").order_by(User.username),
+        "assignments with plays (GET /api/users/{id})":
+            select(Play.id, Play.title, PlayAssignment.status, PlayAssignment.assigned_date)
+            .join(Play, Play.id == PlayAssignment.play_id).where(PlayAssignment.user_id == "user-x"),
+        "watch reps of plays (access index)":
+            select(Rep.asset_id).where(Rep.play_id.in_(["play-x", "play-y"]), Rep.prompt_type == "watch"),
+        "reps of assets (recommendations)":
+            select(Rep).where(Rep.asset_id.in_(["ast-x", "ast-y"])).order_by(Rep.id),
+        "submissions with rep and feedback (history)":
+            select(Submission.id, Submission.asset_id, Rep.prompt_title, Feedback.score, Feedback.text)
+            .outerjoin(Rep, Rep.id == Submission.rep_id)
+            .outerjoin(Feedback, Feedback.submission_id == Submission.id)
+            .where(Submission.user_id == "user-x").order_by(Submission.id, Feedback.id),
+        "feedback of a submission":
+            select(Feedback).where(Feedback.submission_id == "sub-x"),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--no-migrate", action="store_true", help="inspect the database without migrating it")
+    args = parser.parse_args()
+
+    os.environ.setdefault("OPENAI_API_KEY", "unused")
+    from sqlalchemy import create_engine
+    from config import SQLITE_DB_PATH
+    from database.migrations import migrate, schema_version
+    if not os.path.exists(SQLITE_DB_PATH):
+        sys.exit(f"{SQLITE_DB_PATH} not found; load the database first")
+
+    workdir = tempfile.mkdtemp(prefix="query_plans_")
+    tmp = os.path.join(workdir, "bigspring.db")
+    shutil.copy(SQLITE_DB_PATH, tmp)
+    engine = create_engine(f"sqlite:///{tmp}")
+    if not args.no_migrate:
+        migrate(engine)
+
+    ok = True
+    with engine.connect() as conn:
+        print(f"schema version {schema_version(conn)}\n")
+        for name, stmt in hot_queries().items():
+            sql = str(stmt.compile(engine, compile_kwargs={"literal_binds": True}))
+            steps = [row[-1] for row in conn.exec_driver_sql(f"EXPLAIN QUERY PLAN {sql}")]
+            scans = [s for s in steps if s.startswith("SCAN ")]
+            ok &= not scans
+            print(f"{'FAIL' if scans else 'OK  '} {name}")
+            for step in steps:
+                print(f"       {step}")
+    engine.dispose()
+    shutil.rmtree(workdir, ignore_errors=True)
+    sys.exit(0 if ok else 1)
+
+
+if __name__ == "__main__":
+    main()
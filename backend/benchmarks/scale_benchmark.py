@@ -0,0 +1,242 @@
+#!/usr/bin/env python3
+"""Ingestion throughput, index size and filtered query latency as the corpus grows.
+
+For each scale, generates a synthetic corpus (benchmarks/synthetic_corpus.py)
+into a temp dir and runs the full `run_ingestion.py` against it in a
+subprocess. Every data and index path is pointed at the temp dir through the
+config env overrides, and embeddings come from the local OpenAI stand-in. The
+run records wall time, chunks/sec and peak RSS. A second subprocess then opens
+the index, measures resident memory before and after loading every collection,
+and times filtered Chroma queries, exact scans of the same rows (the exact
+engine) and full `search_knowledge` calls for users grouped by accessible-set
+size (1, 2, 4, ... plays' worth of assets). It also reports the filtered HNSW
+recall against the exact top K and which engine `VECTOR_ENGINE=auto` picks. The
+query embeddings are computed in-process, so these numbers are retrieval only.
+
+    uv run python -m benchmarks.scale_benchmark --assets 10,40,160 --companies 4
+"""
+import argparse
+import asyncio
+import json
+import os
+import random
+import re
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from collections import defaultdict
+from pathlib import Path
+from benchmarks.concurrent_streams import free_port
+
+BACKEND_DIR = Path(__file__).resolve().parent.parent
+
+
+def state_env(root: Path) -> dict:
+    """Config overrides that put the source data and every generated store under `root`."""
+    return {
+        "DATABASE_DIR": str(root / "corpus" / "database"), "ASSETS_DIR": str(root / "corpus" / "assets"),
+        "SQLITE_DB_PATH": str(root / "bigspring.db"), "CHROMA_PERSIST_DIR": str(root / "chroma_db"),
+        "LEXICAL_INDEX_PATH": str(root / "lexical_index.db"), "INDEX_GENERATION_PATH": str(root / "index_generation"),
+        "EMBEDDING_CACHE_PATH": str(root / "embedding_cache.db"), "EXACT_INDEX_DIR": str(root / "exact_index"),
+    }
+
+
+def dir_size(path: Path) -> int:
+    if path.is_file():
+        return path.stat().st_size
+    return sum(p.stat().st_size for p in path.rglob("*") if p.is_file()) if path.exists() else 0
+
+
+def rss_mb() -> float:
+    """Current resident set size (Linux /proc), falling back to the peak from getrusage."""
+    try:
+        with open("/proc/self/status") as f:
+            for line in f:
+                if line.startswith("VmRSS:"):
+                    return int(line.split()[1]) / 1024
+    except OSError:
+        pass
+    import resource
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+def run_child(args: list[str], env: dict, log: Path) -> tuple[float, float, int]:
+    """Run a backend subprocess; returns (seconds, peak RSS in MB, exit status)."""
+    started = time.perf_counter()
+    with open(log, "w") as out:
+        proc = subprocess.Popen([sys.executable, *args], cwd=BACKEND_DIR, env=env, stdout=out, stderr=subprocess.STDOUT)
+        _, status, usage = os.wait4(proc.pid, 0)
+    return time.perf_counter() - started, usage.ru_maxrss / 1024, status
+
+
+def query_worker(args):
+    """Runs inside the corpus environment; prints one JSON line of memory and latency measurements."""
+    from benchmarks.fake_openai import fake_embedding
+    from config import KNOWLEDGE_TOP_K, RECOMMENDATION_POOL_K
+    rss_start = rss_mb()
+    from database.models import SessionLocal, User, async_engine
+    from services.access_index import access_index
+    from services.lexical_index import lexical_index
+    from services.vector_store import vector_store, collection_name, access_group_filter
+    from services.exact_index import exact_index
+    from search.knowledge import search_knowledge
+    rss_imported = rss_mb()
+    counts = vector_store.warm_up()
+    access_index.refresh(force=True)
+    rss_loaded = rss_mb()
+    exact_index.warm_up()
+    rss_exact = rss_mb()
+
+    rng = random.Random(args.seed)
+    session = SessionLocal()
+    users = [(u.id, u.company_id) for u in session.query(User).order_by(User.id)]
+    session.close()
+    buckets = defaultdict(list)
+    for user_id, company_id in users:
+        size = len(access_index.user_assets.get(user_id, ()))
+        if size:
+            buckets[1 << (size - 1).bit_length()].append((user_id, company_id))
+
+    async def embed(query: str):
+        return fake_embedding(query, args.dim)
+
+    def sample_queries(company_id: str, n: int) -> list[str]:
+        rows = lexical_index._conn().execute(
+            "SELECT text FROM chunks WHERE company_id = ? AND collection LIKE 'knowledge%' ORDER BY random() LIMIT ?",
+            (company_id, n),
+        ).fetchall()
+        return [" ".join(re.findall(r"[A-Za-z]+", text)[:6]) for (text,) in rows]
+
+    async def measure():
+        results = {}
+        n_results = KNOWLEDGE_TOP_K + RECOMMENDATION_POOL_K
+        for bucket, members in sorted(buckets.items()):
+            vector_ms, exact_ms, search_ms, recall, engines = [], [], [], [], set()
+            for user_id, company_id in rng.sample(members, min(args.users_per_bucket, len(members))):
+                name = collection_name("knowledge", company_id)
+                collection = vector_store.collection(name)
+                groups = access_index.user_groups.get(user_id, frozenset())
+                assets = access_index.user_assets.get(user_id, frozenset())
+                engines.add(exact_index.choose(name, assets))
+                for query in sample_queries(company_id, args.queries):
+                    vector = await embed(query)
+                    started = time.perf_counter()
+                    found = collection.query(query_embeddings=[vector], where=access_group_filter(groups),
+                                             n_results=n_results, include=["documents", "metadatas", "distances"])
+                    vector_ms.append((time.perf_counter() - started) * 1000)
+                    started = time.perf_counter()
+                    exact = exact_index.search(name, vector, assets, n_results)
+                    exact_ms.append((time.perf_counter() - started) * 1000)
+                    if exact:
+                        # Ties at the K-th distance count as found
+                        cutoff = exact[-1][1] + 1e-6
+                        recall.append(min(1.0, sum(d <= cutoff for d in found["distances"][0]) / len(exact)))
+                    started = time.perf_counter()
+                    await search_knowledge(query, user_id, company_id, embed=embed)
+                    search_ms.append((time.perf_counter() - started) * 1000)
+            if vector_ms:
+                results[bucket] = {
+                    "users": len(members), "queries": len(vector_ms),
+                    "vector_p50": statistics.median(vector_ms), "vector_p95": statistics.quantiles(vector_ms, n=20)[-1] if len(vector_ms) > 1 else vector_ms[0],
+                    "exact_p50": statistics.median(exact_ms), "exact_p95": statistics.quantiles(exact_ms, n=20)[-1] if len(exact_ms) > 1 else exact_ms[0],
+                    "recall": statistics.mean(recall) if recall else None, "engine": "/".join(sorted(engines)),
+                    "search_p50": statistics.median(search_ms), "search_p95": statistics.quantiles(search_ms, n=20)[-1] if len(search_ms) > 1 else search_ms[0],
+                }
+        await async_engine.dispose()
+        return results
+
+    latency = asyncio.run(measure())
+    print(json.dumps({
+        "collections": len(counts), "vectors": sum(counts.values()),
+        "rss_imported_mb": rss_imported - rss_start, "index_ram_mb": rss_loaded - rss_imported,
+        "exact_ram_mb": rss_exact - rss_loaded,
+        "rss_after_queries_mb": rss_mb(), "latency": latency,
+    }))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--assets", default="10,40,160", help="knowledge assets per company, one scale per value")
+    parser.add_argument("--companies", type=int, default=4)
+    parser.add_argument("--users", type=int, default=50, help="users per company")
+    parser.add_argument("--plays", type=int, default=16, help="plays per company")
+    parser.add_argument("--submissions", type=int, default=2, help="submissions per user")
+    parser.add_argument("--queries", type=int, default=5, help="queries per sampled user")
+    parser.add_argument("--users-per-bucket", type=int, default=4)
+    parser.add_argument("--latency-ms", type=float, default=0.0, help="stand-in latency per embeddings request")
+    parser.add_argument("--dim", type=int, default=1536)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--keep", action="store_true", help="keep the generated corpora and indexes")
+    parser.add_argument("--query-worker", action="store_true", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+    if args.query_worker:
+        return query_worker(args)
+
+    from benchmarks.fake_openai import serve
+    from benchmarks.synthetic_corpus import generate
+    fake_port = free_port()
+    fake = serve(port=fake_port, latency_ms=args.latency_ms, dim=args.dim)
+    threading.Thread(target=fake.serve_forever, daemon=True).start()
+
+    rows = []
+    for per_company in [int(n) for n in args.assets.split(",")]:
+        root = Path(tempfile.mkdtemp(prefix=f"scale_{per_company}_"))
+        try:
+            counts = generate(root / "corpus", args.companies, per_company, args.users, args.plays, args.submissions, args.seed)
+            env = {**os.environ, **state_env(root), "OPENAI_BASE_URL": f"http://127.0.0.1:{fake_port}/v1",
+                   "OPENAI_API_KEY": "local", "ANONYMIZED_TELEMETRY": "False", "EMBEDDING_DIMENSIONS": str(args.dim)}
+            seconds, ingest_rss, status = run_child(["run_ingestion.py"], env, root / "ingest.log")
+            log = (root / "ingest.log").read_text()
+            if status:
+                sys.exit(f"ingestion failed at {per_company} assets/company:\n{log[-2000:]}")
+            chunks = int(re.search(r"Ingested (\d+) chunks", log).group(1))
+            _, query_rss, status = run_child(
+                ["-m", "benchmarks.scale_benchmark", "--query-worker", "--dim", str(args.dim), "--seed", str(args.seed),
+                 "--queries", str(args.queries), "--users-per-bucket", str(args.users_per_bucket)],
+                env, root / "query.log",
+            )
+            query_log = (root / "query.log").read_text()
+            if status:
+                sys.exit(f"query worker failed:\n{query_log[-2000:]}")
+            measured = json.loads(query_log.strip().splitlines()[-1])
+            rows.append({
+                "assets": counts["assets"], "knowledge_assets": per_company * args.companies, "users": counts["users"],
+                "chunks": chunks, "ingest_s": seconds, "ingest_rss_mb": ingest_rss,
+                "chroma_mb": dir_size(root / "chroma_db") / 1e6, "exact_mb": dir_size(root / "exact_index") / 1e6,
+                "fts_mb": sum(dir_size(p) for p in root.glob("lexical_index.db*")) / 1e6,
+                "sqlite_mb": sum(dir_size(p) for p in root.glob("bigspring.db*")) / 1e6,
+                **measured,
+            })
+            print(f"scale {per_company} assets/company done: {chunks:,} chunks in {seconds:.1f}s", flush=True)
+        finally:
+            if args.keep:
+                print(f"  kept {root}")
+            else:
+                shutil.rmtree(root, ignore_errors=True)
+
+    print(f"\n{args.companies} companies, {args.users} users (with {args.submissions} submissions each) and "
+          f"{args.plays} plays per company, {args.dim}-dim stand-in embeddings; assets = knowledge assets\n")
+    print(f"{'assets':>7} {'chunks':>8} {'ingest s':>9} {'chunks/s':>9} {'ingest RSS':>11} {'chroma':>9} {'exact':>8} "
+          f"{'fts5':>8} {'sqlite':>8} {'index RAM':>10} {'exact RAM':>10}")
+    for r in rows:
+        print(f"{r['knowledge_assets']:>7,} {r['chunks']:>8,} {r['ingest_s']:>9.1f} {r['chunks'] / r['ingest_s']:>9.0f} "
+              f"{r['ingest_rss_mb']:>9.0f}MB {r['chroma_mb']:>7.1f}MB {r['exact_mb']:>6.1f}MB {r['fts_mb']:>6.1f}MB "
+              f"{r['sqlite_mb']:>6.1f}MB {r['index_ram_mb']:>8.0f}MB {r['exact_ram_mb']:>8.0f}MB")
+
+    print(f"\nquery latency (ms) by accessible-set size (assets the user can read):\n")
+    print(f"{'assets':>7} {'access <=':>10} {'users':>6} {'queries':>8} {'chroma p50':>11} {'chroma p95':>11} "
+          f"{'exact p50':>10} {'exact p95':>10} {'hnsw recall':>12} {'auto':>7} {'search p50':>11} {'search p95':>11}")
+    for r in rows:
+        for bucket, m in sorted(r["latency"].items(), key=lambda kv: int(kv[0])):
+            recall = "-" if m["recall"] is None else f"{m['recall']:.1%}"
+            print(f"{r['knowledge_assets']:>7,} {int(bucket):>10,} {m['users']:>6} {m['queries']:>8} {m['vector_p50']:>11.1f} "
+                  f"{m['vector_p95']:>11.1f} {m['exact_p50']:>10.2f} {m['exact_p95']:>10.2f} {recall:>12} {m['engine']:>7} "
+                  f"{m['search_p50']:>11.1f} {m['search_p95']:>11.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,113 @@
+#!/usr/bin/env python3
+"""Time to first `citations` event with and without speculative retrieval.
+
+Runs the FastAPI app in-process against the local OpenAI stand-in (its fixed
+latency plays the classifier / embeddings round trip), replays a few
+knowledge and history queries serially with SPECULATIVE_RETRIEVAL off and on,
+and prints p50 time-to-citations plus the per-branch timings from the
+`speculation` events so the wasted work can be checked. Needs an ingested index.
+
+    uv run python -m benchmarks.speculative_retrieval --latency-ms 300
+"""
+import argparse
+import asyncio
+import json
+import os
+import statistics
+import threading
+import time
+from collections import defaultdict
+from benchmarks.concurrent_streams import free_port
+
+QUERIES = [
+    ("a1b2-401", "What is the eradication rate for Streptococcus pneumoniae?"),
+    ("a1b2-401", "What is the dosage for Lydrenex?"),
+    ("a1b2-401", "How does Amproxin work?"),
+    ("f2g3-580", "When did I mention cooling energy costs?"),
+    ("f2g3-580", "Show me the GridMaster PUE efficiency table"),
+    ("f2g3-580", "What feedback did I get on my pitch?"),
+]
+
+
+async def time_to_citations(client, url: str, user_id: str, query: str) -> tuple[float | None, dict | None]:
+    started = time.perf_counter()
+    first_citations, speculation = None, None
+    async with client.stream("POST", url, json={"user_id": user_id, "query": query}) as resp:
+        resp.raise_for_status()
+        event_type = ""
+        async for line in resp.aiter_lines():
+            if line.startswith("event:"):
+                event_type = line.split(":", 1)[1].strip()
+            elif line.startswith("data:"):
+                if event_type == "citations" and first_citations is None:
+                    first_citations = (time.perf_counter() - started) * 1000
+                elif event_type == "speculation":
+                    speculation = json.loads(line.split(":", 1)[1])
+    return first_citations, speculation
+
+
+async def run(url: str, rounds: int, tag: str) -> tuple[list[float], list[dict]]:
+    import httpx
+    from services.embeddings import embedding_service
+    samples, reports = [], []
+    async with httpx.AsyncClient(timeout=120) as client:
+        for r in range(rounds):
+            for user_id, query in QUERIES:
+                # Distinct text per round and mode so the query embedding cache never short-circuits
+                ttc, report = await time_to_citations(client, url, user_id, f"{query} ({tag} {r})")
+                if ttc is not None:
+                    samples.append(ttc)
+                if report:
+                    reports.append(report)
+    embedding_service.lru.clear()
+    return samples, reports
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--latency-ms", type=float, default=300.0, help="stand-in latency per API call")
+    parser.add_argument("--rounds", type=int, default=3)
+    args = parser.parse_args()
+
+    from benchmarks.fake_openai import serve
+    fake_port = free_port()
+    fake = serve(port=fake_port, latency_ms=args.latency_ms)
+    threading.Thread(target=fake.serve_forever, daemon=True).start()
+
+    os.environ["OPENAI_BASE_URL"] = f"http://127.0.0.1:{fake_port}/v1"
+    os.environ["OPENAI_API_KEY"] = "local"
+    import uvicorn
+    import main as app_module
+    import search.router
+    # Every query here would be answered by the fast-path classifier; force the LLM round trip being overlapped
+    search.router.FAST_ROUTER = False
+
+    app_port = free_port()
+    server = uvicorn.Server(uvicorn.Config(app_module.app, host="127.0.0.1", port=app_port, log_level="warning"))
+    threading.Thread(target=server.run, daemon=True).start()
+    while not server.started:
+        time.sleep(0.05)
+
+    url = f"http://127.0.0.1:{app_port}/api/search"
+    results = {}
+    for mode in (False, True):
+        app_module.SPECULATIVE_RETRIEVAL = mode
+        results[mode] = asyncio.run(run(url, args.rounds, "spec" if mode else "serial"))
+    server.should_exit = True
+
+    serial, _ = results[False]
+    speculative, reports = results[True]
+    print(f"stand-in latency per call: {args.latency_ms:.0f}ms, {len(serial)} searches per mode")
+    print(f"time to first citations p50: serial {statistics.median(serial):.0f}ms, "
+          f"speculative {statistics.median(speculative):.0f}ms")
+
+    by_status = defaultdict(list)
+    for report in reports:
+        for branch in report["branches"].values():
+            by_status[branch["status"]].append(branch["ms"])
+    for status, ms in sorted(by_status.items()):
+        print(f"  {status:>9} branches: {len(ms):>3}, median {statistics.median(ms):.0f}ms after request start")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,216 @@
+#!/usr/bin/env python3
+"""Generate a synthetic corpus in the shapes of resources/database and resources/assets.
+
+Writes the eight source files (same names and columns as the take-home data)
+and one JSON file per asset: multi-page PDFs with tables, segmented
+video/audio transcripts, images with OCR and visual elements, and user
+submissions (segmented transcripts or plain text) with feedback. Each company
+gets its own invented product names, so retrieval and BM25 see
+company-specific vocabulary. Users are assigned 1, 2, 4, ... of their
+company's plays in rotation, so accessible-set sizes span a wide range; some
+assets sit in two plays, so access groups overlap like the real data. Output is
+deterministic for a given seed.
+
+    uv run python -m benchmarks.synthetic_corpus /tmp/corpus --companies 4 --assets 500 --users 100
+    DATABASE_DIR=/tmp/corpus/database ASSETS_DIR=/tmp/corpus/assets ... uv run python run_ingestion.py
+"""
+import argparse
+import csv
+import json
+import random
+from pathlib import Path
+
+DATABASE_FILES = {
+    "companies": "BigSpring_takehome_data - comapny.json",
+    "assets": "BigSpring_takehome_data - asset.csv",
+    "users": "BigSpring_takehome_data - users.csv",
+    "plays": "BigSpring_takehome_data - play.csv",
+    "play_assignments": "BigSpring_takehome_data - play_assignment.csv",
+    "reps": "BigSpring_takehome_data - rep.csv",
+    "submissions": "BigSpring_takehome_data - submission.csv",
+    "feedback": "BigSpring_takehome_data - feedback.csv",
+}
+COLUMNS = {
+    "assets": ["id", "type", "file_name", "created_at", "company_id"],
+    "users": ["id", "username", "display_name", "role", "segment", "created_at", "is_active", "company_id"],
+    "plays": ["id", "company_id", "title", "description", "created_at", "is_active"],
+    "play_assignments": ["id", "user_id", "play_id", "assigned_date", "status", "completed_at"],
+    "reps": ["id", "prompt_text", "prompt_title", "prompt_type", "play_id", "company_id", "asset_id", "created_at"],
+    "submissions": ["id", "user_id", "rep_id", "submitted_at", "submission_type", "asset_id", "company_id"],
+    "feedback": ["id", "submission_id", "company_id", "score", "text", "created_at"],
+}
+
+SYLLABLES = ["ly", "dre", "nex", "am", "pro", "xin", "ky", "ber", "on", "hex", "loom", "vel", "dra", "zal",
+             "or", "ic", "neu", "ra", "tis", "sen", "ti", "vue", "gri", "max", "cor", "tal", "qui", "mo"]
+TOPICS = ["efficacy", "dosage", "pricing", "onboarding", "latency", "throughput", "durability", "compliance",
+          "safety", "integration", "warranty", "uptime", "retention", "tolerance", "calibration", "savings",
+          "deployment", "procurement", "objection", "competitor", "renewal", "support", "training", "outcomes"]
+WORDS = ["customer", "clinical", "study", "results", "market", "value", "cost", "performance", "team", "data",
+         "benefit", "risk", "patient", "system", "partner", "quarter", "growth", "evidence", "trial", "energy",
+         "cooling", "capacity", "response", "adoption", "workflow", "budget", "metric", "baseline", "target",
+         "region", "account", "feedback", "pilot", "contract", "standard", "review", "process", "launch"]
+SEGMENTS = ["North America", "EMEA", "APAC", "LATAM"]
+ROLES = ["Sales Representative", "Account Executive", "Sales Manager"]
+FIRST = ["Alex", "Sam", "Jordan", "Taylor", "Morgan", "Casey", "Riley", "Jamie", "Avery", "Quinn"]
+LAST = ["Smith", "Lee", "Garcia", "Patel", "Kim", "Brown", "Nguyen", "Lopez", "Clark", "Young"]
+KNOWLEDGE_TYPES = ["pdf"] * 8 + ["video"] * 7 + ["audio"] * 2 + ["image"] * 3
+
+
+def product_name(rng: random.Random) -> str:
+    return "".join(rng.choice(SYLLABLES) for _ in range(rng.randint(2, 3))).capitalize()
+
+
+def sentence(rng: random.Random, products: list[str], topic: str) -> str:
+    product = rng.choice(products)
+    words = " ".join(rng.choice(WORDS) for _ in range(rng.randint(5, 12)))
+    number = f"{rng.randint(2, 98)}{rng.choice(['%', ' mg', ' ms', ' kW', ' days', 'x'])}"
+    return rng.choice([
+        f"{product} improves {topic} by {number} across {words}.",
+        f"The {topic} profile of {product} was measured at {number} in the {words} review.",
+        f"Reps should position {product} on {topic}, citing {number} and the {words}.",
+        f"When a buyer raises {topic}, compare {product} against the {words} at {number}.",
+    ])
+
+
+def paragraph(rng, products, topic, words: int) -> str:
+    parts = []
+    while sum(len(p.split()) for p in parts) < words:
+        parts.append(sentence(rng, products, topic))
+    return " ".join(parts)
+
+
+def timestamp(seconds: int) -> str:
+    return f"{seconds // 60:02d}:{seconds % 60:02d}"
+
+
+def segments(rng, products, topic, count: int, speakers: list[str]) -> list[dict]:
+    out, t = [], 0
+    for _ in range(count):
+        length = rng.randint(8, 20)
+        out.append({"start": timestamp(t), "end": timestamp(t + length - 1),
+                    "text": paragraph(rng, products, topic, rng.randint(15, 40)), "speaker": rng.choice(speakers)})
+        t += length
+    return out
+
+
+def knowledge_asset(rng, kind: str, products: list[str], topic: str):
+    if kind == "pdf":
+        pages = []
+        for page in range(1, rng.randint(2, 5) + 1):
+            tables = []
+            if rng.random() < 0.3:
+                headers = ["Product", topic.capitalize(), "Baseline", "Change"]
+                rows = [[rng.choice(products), f"{rng.randint(1, 999)}", f"{rng.randint(1, 999)}", f"{rng.randint(-50, 80)}%"]
+                        for _ in range(rng.randint(3, 8))]
+                tables.append({"id": f"tab_{page}_1", "title": f"Table {page}: {topic.capitalize()} comparison",
+                               "headers": headers, "rows": rows})
+            pages.append({"page": page, "text": paragraph(rng, products, topic, rng.randint(150, 300)), "tables": tables})
+        return pages
+    if kind in ("video", "audio"):
+        segs = segments(rng, products, topic, rng.randint(6, 20), [f"{rng.choice(FIRST)} {rng.choice(LAST)}" for _ in range(2)])
+        return {"full_transcript": " ".join(s["text"] for s in segs), "segments": segs}
+    return {
+        "alt_text": f"Diagram of {rng.choice(products)} {topic} architecture.",
+        "ocr_text": " ".join(w.upper() for w in rng.sample(WORDS, 8)),
+        "tags": [topic, "diagram"],
+        "visual_elements": [{"label": rng.choice(WORDS).capitalize(), "description": sentence(rng, products, topic)}
+                            for _ in range(rng.randint(2, 5))],
+    }
+
+
+def submission_asset(rng, kind: str, products: list[str], topic: str, speaker: str):
+    if kind == "text":
+        return {"full_text": paragraph(rng, products, topic, rng.randint(40, 120))}
+    segs = segments(rng, products, topic, rng.randint(3, 8), [speaker])
+    return {"full_transcript": " ".join(s["text"] for s in segs), "segments": segs}
+
+
+def generate(out_dir: Path, companies: int = 4, assets: int = 200, users: int = 50, plays: int = 16,
+             submissions: int = 2, seed: int = 0) -> dict:
+    """Write a corpus of `assets` knowledge assets and `users` users per company; returns row counts."""
+    rng = random.Random(seed)
+    db_dir, assets_dir = out_dir / "database", out_dir / "assets"
+    db_dir.mkdir(parents=True, exist_ok=True)
+    assets_dir.mkdir(parents=True, exist_ok=True)
+    tables = {name: [] for name in COLUMNS}
+    company_rows = []
+    created = "2024-01-15T09:00:00Z"
+
+    for c in range(companies):
+        company_id = f"comp-syn-{c:03d}"
+        products = [product_name(rng) for _ in range(6)]
+        company_rows.append({"id": company_id, "name": f"{products[0]} Corp {c}",
+                             "description": f"Synthetic company selling {', '.join(products)}."})
+        play_ids = [f"play-syn-{c:03d}-{p:04d}" for p in range(plays)]
+        for p, play_id in enumerate(play_ids):
+            tables["plays"].append({"id": play_id, "company_id": company_id, "title": f"{products[p % len(products)]}: {TOPICS[p % len(TOPICS)]}",
+                                    "description": f"Training on {TOPICS[p % len(TOPICS)]}.", "created_at": created, "is_active": "TRUE"})
+            tables["reps"].append({"id": f"rep-syn-{c:03d}-{p:04d}-p", "prompt_text": f"Pitch {products[p % len(products)]}.",
+                                   "prompt_title": f"{TOPICS[p % len(TOPICS)].capitalize()} pitch", "prompt_type": "practice",
+                                   "play_id": play_id, "company_id": company_id, "asset_id": "", "created_at": created})
+
+        for a in range(assets):
+            kind = rng.choice(KNOWLEDGE_TYPES)
+            asset_id, file_name = f"ast-syn-{c:03d}-{a:06d}", f"syn_{c:03d}_{a:06d}.json"
+            topic = rng.choice(TOPICS)
+            with open(assets_dir / file_name, "w") as f:
+                json.dump(knowledge_asset(rng, kind, products, topic), f)
+            tables["assets"].append({"id": asset_id, "type": kind, "file_name": file_name, "created_at": created, "company_id": company_id})
+            # Every asset is watched in one play; every fifth also in the next one (overlapping access groups)
+            for p in {a % plays, (a + 1) % plays} if a % 5 == 0 else {a % plays}:
+                tables["reps"].append({"id": f"rep-syn-{c:03d}-{a:06d}-{p:04d}", "prompt_text": f"Watch {file_name}.",
+                                       "prompt_title": f"{topic.capitalize()} overview", "prompt_type": "watch",
+                                       "play_id": play_ids[p], "company_id": company_id, "asset_id": asset_id, "created_at": created})
+
+        for u in range(users):
+            user_id = f"syn-{c:03d}-{u:05d}"
+            name = f"{rng.choice(FIRST)} {rng.choice(LAST)}"
+            tables["users"].append({"id": user_id, "username": f"user{u}-syn{c}", "display_name": name, "role": rng.choice(ROLES),
+                                    "segment": rng.choice(SEGMENTS), "created_at": created, "is_active": "TRUE", "company_id": company_id})
+            # 1, 2, 4, ... plays in rotation so accessible-set sizes span orders of magnitude
+            sizes = [1 << i for i in range(plays.bit_length()) if 1 << i <= plays]
+            assigned = rng.sample(play_ids, sizes[u % len(sizes)])
+            for p, play_id in enumerate(assigned):
+                tables["play_assignments"].append({"id": f"asgn-{user_id}-{p:04d}", "user_id": user_id, "play_id": play_id,
+                                                   "assigned_date": created, "status": "completed", "completed_at": created})
+            for s in range(submissions):
+                kind = rng.choice(["video", "audio", "text"])
+                play_index = play_ids.index(rng.choice(assigned))
+                asset_id, file_name = f"ast-syn-{user_id}-sub-{s:02d}", f"syn_{user_id}_sub_{s:02d}.json"
+                with open(assets_dir / file_name, "w") as f:
+                    json.dump(submission_asset(rng, kind, products, TOPICS[play_index % len(TOPICS)], name), f)
+                submission_id = f"sub-{user_id}-{s:02d}"
+                tables["assets"].append({"id": asset_id, "type": kind, "file_name": file_name, "created_at": created, "company_id": company_id})
+                tables["submissions"].append({"id": submission_id, "user_id": user_id, "rep_id": f"rep-syn-{c:03d}-{play_index:04d}-p",
+                                              "submitted_at": created, "submission_type": kind, "asset_id": asset_id, "company_id": company_id})
+                tables["feedback"].append({"id": f"fb-{submission_id}", "submission_id": submission_id, "company_id": company_id,
+                                           "score": rng.randint(3, 10), "text": sentence(rng, products, TOPICS[play_index % len(TOPICS)]),
+                                           "created_at": created})
+
+    with open(db_dir / DATABASE_FILES["companies"], "w") as f:
+        json.dump({"companies": company_rows}, f)
+    for name, columns in COLUMNS.items():
+        with open(db_dir / DATABASE_FILES[name], "w", newline="") as f:
+            writer = csv.DictWriter(f, fieldnames=columns)
+            writer.writeheader()
+            writer.writerows(tables[name])
+    return {"companies": len(company_rows), **{name: len(rows) for name, rows in tables.items()}}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("out_dir", type=Path)
+    parser.add_argument("--companies", type=int, default=4)
+    parser.add_argument("--assets", type=int, default=200, help="knowledge assets per company")
+    parser.add_argument("--users", type=int, default=50, help="users per company")
+    parser.add_argument("--plays", type=int, default=16, help="plays per company")
+    parser.add_argument("--submissions", type=int, default=2, help="submissions per user")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+    counts = generate(args.out_dir, args.companies, args.assets, args.users, args.plays, args.submissions, args.seed)
+    print(", ".join(f"{n:,} {name}" for name, n in counts.items()))
+    print(f"DATABASE_DIR={args.out_dir / 'database'} ASSETS_DIR={args.out_dir / 'assets'}")
+
+
+if __name__ == "__main__":
+    main()
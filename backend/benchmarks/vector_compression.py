@@ -0,0 +1,162 @@
+#!/usr/bin/env python3
+"""Recall@k vs memory vs latency of compact vector storage against the full-precision `knowledge` collections.
+
+Reads the exact-search matrices of the current index generation (written by
+ingestion) and, for each variant, runs unfiltered top-K searches through
+`ExactIndex` for query snippets sampled from each knowledge collection's
+chunks, embedded with the configured provider (the OpenAI provider is pointed
+at the local stand-in). Variants:
+- float16 and int8 (per-vector scale) codes, with and without rescoring the
+  best `--rescore` x K from float32;
+- reduced dimensions, which is what `EMBEDDING_DIMENSIONS` asks the API for:
+  leading components, renormalized. text-embedding-3 vectors are trained so
+  that a prefix keeps most of the ranking; the stand-in's hashed vectors spread
+  information evenly across dimensions, so their reduced-dimension recall is a
+  floor, not an estimate.
+Recall is measured against the float32 full-dimension top K, with ties at the
+K-th distance counted as found. Memory is what the first pass keeps resident.
+Point EXACT_INDEX_DIR (and the other state paths, see scale_benchmark.state_env)
+at a `scale_benchmark --keep` corpus for latency at a larger scale.
+
+    uv run python -m benchmarks.vector_compression --dims 512,256 --rescore 4
+"""
+import argparse
+import copy
+import json
+import os
+import random
+import re
+import shutil
+import statistics
+import tempfile
+import threading
+import time
+from pathlib import Path
+from benchmarks.concurrent_streams import free_port
+
+
+def shortened(vectors, dims: int):
+    import numpy as np
+    head = np.ascontiguousarray(vectors[..., :dims], dtype=np.float32)
+    norms = np.linalg.norm(head, axis=-1, keepdims=True)
+    return head / np.where(norms == 0, 1.0, norms)
+
+
+def write_shortened(source: Path, target: Path, names: list[str], dims: int):
+    """A copy of the generation's knowledge matrices cut to `dims` components."""
+    import numpy as np
+    target.mkdir(parents=True)
+    for name in names:
+        np.save(target / f"{name}.npy", shortened(np.load(source / f"{name}.npy", mmap_mode="r"), dims))
+        with open(source / f"{name}.json") as f:
+            info = json.load(f)
+        info["signature"]["embedding_dim"] = dims
+        with open(target / f"{name}.json", "w") as f:
+            json.dump(info, f)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--k", type=int, default=None, help="top K (default KNOWLEDGE_TOP_K)")
+    parser.add_argument("--queries", type=int, default=50, help="query snippets per collection")
+    parser.add_argument("--dims", default="512,256", help="reduced dimensions to compare")
+    parser.add_argument("--rescore", type=int, default=4, help="rescoring pool as a multiple of K")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    from benchmarks.fake_openai import serve
+    fake_port = free_port()
+    fake = serve(port=fake_port, latency_ms=0)
+    threading.Thread(target=fake.serve_forever, daemon=True).start()
+    os.environ["OPENAI_BASE_URL"] = f"http://127.0.0.1:{fake_port}/v1"
+    os.environ["OPENAI_API_KEY"] = "local"
+
+    import numpy as np
+    from config import EXACT_INDEX_DIR, KNOWLEDGE_TOP_K
+    from services.embedding_providers import provider
+    from services.exact_index import ExactIndex
+    from services.lexical_index import lexical_index
+    from services.vector_store import vector_store
+    k = args.k or KNOWLEDGE_TOP_K
+    generation = vector_store.current_generation()
+    source = Path(EXACT_INDEX_DIR) / str(generation)
+    names = sorted(p.stem for p in source.glob("knowledge_*.json"))
+    if not names:
+        raise SystemExit(f"no exact-search matrices in {source}; run ingestion first")
+
+    rng = random.Random(args.seed)
+    baseline = ExactIndex(engine="exact", quantization="none")
+    queries = {}
+    for name in names:
+        texts = [text for (text,) in lexical_index._conn().execute(
+            "SELECT text FROM chunks WHERE collection = ? ORDER BY id", (name,))]
+        snippets = []
+        for text in rng.sample(texts, min(args.queries, len(texts))):
+            words = re.findall(r"[A-Za-z]{3,}", text)
+            start = rng.randrange(max(1, len(words) - 6))
+            snippets.append(" ".join(words[start:start + 6]) or text[:40])
+        queries[name] = np.asarray(provider.embed(snippets), dtype=np.float32)
+
+    truth = {}
+    for name in names:
+        matrix = baseline.matrix(name)
+        assets = list(matrix.ranges)
+        truth[name] = [baseline.search(name, q, assets, k) for q in queries[name]]
+
+    def run(index: ExactIndex, dims: int | None) -> dict:
+        latencies, recalls, resident = [], [], 0
+        for name in names:
+            matrix = index.matrix(name)
+            full = baseline.matrix(name)
+            assets = list(matrix.ranges)
+            resident += matrix.vectors.nbytes if matrix.codes is None else \
+                matrix.codes.nbytes + (0 if matrix.scales is None else matrix.scales.nbytes)
+            for q, expected in zip(queries[name], truth[name]):
+                started = time.perf_counter()
+                hits = index.search(name, shortened(q, dims) if dims else q, assets, k)
+                latencies.append((time.perf_counter() - started) * 1000)
+                if expected:
+                    # Judge the returned chunks by their full-precision distance
+                    cutoff = expected[-1][1] + 1e-6
+                    rows = [full.rows[cid] for cid, _ in hits]
+                    distances = 1 - np.asarray(full.vectors[rows]) @ (q / (np.linalg.norm(q) or 1.0))
+                    recalls.append(min(1.0, float((distances <= cutoff).sum()) / len(expected)))
+        return {"recall": statistics.mean(recalls), "resident": resident, "p50": statistics.median(latencies),
+                "p95": statistics.quantiles(latencies, n=20)[-1] if len(latencies) > 1 else latencies[0]}
+
+    rows = []
+    full_dim = provider.dim
+    variants = [("float32 (exact)", "none", 0), ("float16", "float16", 0), (f"float16 + rescore x{args.rescore}", "float16", args.rescore),
+                ("int8", "int8", 0), (f"int8 + rescore x{args.rescore}", "int8", args.rescore)]
+    for label, quantization, factor in variants:
+        rows.append((label, full_dim, run(ExactIndex(engine="exact", quantization=quantization, rescore_factor=factor), None)))
+
+    tmp = Path(tempfile.mkdtemp(prefix="vector_compression_"))
+    try:
+        for dims in [int(d) for d in args.dims.split(",") if d and int(d) < full_dim]:
+            root = tmp / str(dims)
+            write_shortened(source, root / str(generation), names, dims)
+            embedder = copy.copy(provider)
+            embedder.dim = dims
+            for label, quantization, factor in (variants[0], variants[-1]):
+                index = ExactIndex(root=str(root), embedder=embedder, engine="exact", quantization=quantization,
+                                   rescore_factor=factor)
+                rows.append((label.replace(" (exact)", ""), dims, run(index, dims)))
+    finally:
+        shutil.rmtree(tmp, ignore_errors=True)
+
+    vectors = sum(len(baseline.matrix(name).ids) for name in names)
+    print(f"{len(names)} knowledge collections, {vectors:,} vectors, {sum(len(q) for q in queries.values())} queries, "
+          f"top {k}, provider {provider.name}/{provider.model}\n")
+    print(f"{'variant':<24} {'dims':>5} {'resident':>10} {'bytes/vec':>10} {'vs f32':>7} {'recall@' + str(k):>9} "
+          f"{'p50 ms':>8} {'p95 ms':>8}")
+    base = rows[0][2]["resident"]
+    for label, dims, r in rows:
+        print(f"{label:<24} {dims:>5} {r['resident'] / 1e6:>8.2f}MB {r['resident'] / vectors:>10.0f} "
+              f"{r['resident'] / base:>7.0%} {r['recall']:>9.1%} {r['p50']:>8.3f} {r['p95']:>8.3f}")
+    print(f"\nrescoring reads {args.rescore} x {k} float32 rows per query from the memory-mapped file "
+          f"({args.rescore * k * full_dim * 4 / 1024:.0f}KB at {full_dim} dims)")
+
+
+if __name__ == "__main__":
+    main()
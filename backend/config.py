@@ -6,16 +6,107 @@ BACKEND_DIR = Path(__file__).resolve().parent
 BASE_DIR = BACKEND_DIR.parent
 
 load_dotenv(BACKEND_DIR / ".env")
-DATABASE_DIR = BASE_DIR / "resources" / "database"
-ASSETS_DIR = BASE_DIR / "resources" / "assets"
+# Source data and every generated store can be pointed elsewhere (e.g. a synthetic corpus in a temp dir)
+DATABASE_DIR = Path(os.getenv("DATABASE_DIR", str(BASE_DIR / "resources" / "database")))
+ASSETS_DIR = Path(os.getenv("ASSETS_DIR", str(BASE_DIR / "resources" / "assets")))
 
 OPENAI_API_KEY = os.getenv("OPENAI_API_KEY", "")
-CHROMA_PERSIST_DIR = str(BASE_DIR / "backend" / "chroma_db")
-SQLITE_DB_PATH = str(BASE_DIR / "backend" / "bigspring.db")
+# Point at a local OpenAI-compatible stand-in (e.g. benchmarks/fake_openai.py) for offline runs
+OPENAI_BASE_URL = os.getenv("OPENAI_BASE_URL") or None
+CHROMA_PERSIST_DIR = os.getenv("CHROMA_PERSIST_DIR", str(BASE_DIR / "backend" / "chroma_db"))
+# Bumped by ingestion; running servers reopen Chroma when it changes
+INDEX_GENERATION_PATH = os.getenv("INDEX_GENERATION_PATH", str(BASE_DIR / "backend" / "index_generation"))
+# SQLite FTS5 index of the same chunks, written by ingestion alongside Chroma
+LEXICAL_INDEX_PATH = os.getenv("LEXICAL_INDEX_PATH", str(BASE_DIR / "backend" / "lexical_index.db"))
+VECTOR_STORE_RECHECK_SECONDS = float(os.getenv("VECTOR_STORE_RECHECK_SECONDS", "2"))
+# Threads for blocking Chroma calls made from the async request path
+BLOCKING_IO_WORKERS = int(os.getenv("BLOCKING_IO_WORKERS", "8"))
+# How often the access index polls SQLite for committed play assignment / rep changes
+ACCESS_INDEX_RECHECK_SECONDS = float(os.getenv("ACCESS_INDEX_RECHECK_SECONDS", "1"))
+SQLITE_DB_PATH = os.getenv("SQLITE_DB_PATH", str(BASE_DIR / "backend" / "bigspring.db"))
+# Connections per engine (sync and async); SQLite pragmas applied on every new connection
+SQLITE_POOL_SIZE = int(os.getenv("SQLITE_POOL_SIZE", "10"))
+SQLITE_MMAP_SIZE = int(os.getenv("SQLITE_MMAP_SIZE", str(256 * 1024 * 1024)))
+SQLITE_CACHE_SIZE_KB = int(os.getenv("SQLITE_CACHE_SIZE_KB", "65536"))
+SQLITE_BUSY_TIMEOUT_MS = int(os.getenv("SQLITE_BUSY_TIMEOUT_MS", "5000"))
+# Bulk CSV load: rows per parsed chunk / executemany, rows per commit, parallel table parsers
+LOAD_CHUNK_ROWS = int(os.getenv("LOAD_CHUNK_ROWS", "50000"))
+LOAD_COMMIT_ROWS = int(os.getenv("LOAD_COMMIT_ROWS", "500000"))
+LOAD_WORKERS = int(os.getenv("LOAD_WORKERS", "4"))
+EMBEDDING_CACHE_PATH = os.getenv("EMBEDDING_CACHE_PATH", str(BASE_DIR / "backend" / "embedding_cache.db"))
+# Memory-mapped copy of every collection's vectors for exact search, one subdirectory per index generation
+EXACT_INDEX_DIR = os.getenv("EXACT_INDEX_DIR", str(BASE_DIR / "backend" / "exact_index"))
 
-EMBEDDING_MODEL = "text-embedding-3-small"
+# Embedding provider: "openai" (embeddings API) or "local" (in-process hashed n-gram vectors, no network).
+# Collections record the provider, model and dimension that built them; queries must use the same
+EMBEDDING_PROVIDER = os.getenv("EMBEDDING_PROVIDER", "openai").lower()
+EMBEDDING_MODEL = os.getenv("EMBEDDING_MODEL", "text-embedding-3-small" if EMBEDDING_PROVIDER == "openai" else "hashed-ngrams-v1")
+LOCAL_EMBEDDING_DIM = int(os.getenv("LOCAL_EMBEDDING_DIM", "512"))
+# Shorter vectors from the embeddings API (text-embedding-3 models shorten and renormalize); unset keeps the full size
+EMBEDDING_DIMENSIONS = int(os.getenv("EMBEDDING_DIMENSIONS", "0")) or None
 CLASSIFIER_MODEL = "gpt-4o-mini"
 ANSWER_MODEL = "gpt-4o"
 
+# Keyword rules + nearest-centroid pre-classifier; only ambiguous queries go to the LLM router
+FAST_ROUTER = os.getenv("FAST_ROUTER", "true").lower() == "true"
+
 KNOWLEDGE_TOP_K = 8
 HISTORY_TOP_K = 6
+# Knowledge retrieval fetches this many extra results; recommendations come from that tail
+RECOMMENDATION_POOL_K = 12
+RECOMMENDATION_LIMIT = 3
+# Answer context: retrieved chunks are de-duplicated and packed into this many (estimated) tokens;
+# a block that does not fit is cut to the remaining budget if at least CONTEXT_MIN_BLOCK_TOKENS are left
+# (the default fits KNOWLEDGE_TOP_K chunks of CHUNK_MAX_TOKENS with their labels, so only repeats are removed)
+CONTEXT_MAX_TOKENS = int(os.getenv("CONTEXT_MAX_TOKENS", "2400"))
+CONTEXT_MIN_BLOCK_TOKENS = int(os.getenv("CONTEXT_MIN_BLOCK_TOKENS", "64"))
+# Vector search engine: "chroma" (HNSW with a metadata filter), "exact" (in-process scan of only the rows the
+# user may read) or "auto": exact when the allowed rows are at most VECTOR_EXACT_MAX_ROWS or at most
+# VECTOR_EXACT_MAX_SELECTIVITY of the collection (filtered HNSW visits ~k/selectivity nodes and loses recall)
+VECTOR_ENGINE = os.getenv("VECTOR_ENGINE", "auto").lower()
+VECTOR_EXACT_MAX_ROWS = int(os.getenv("VECTOR_EXACT_MAX_ROWS", "20000"))
+VECTOR_EXACT_MAX_SELECTIVITY = float(os.getenv("VECTOR_EXACT_MAX_SELECTIVITY", "0.1"))
+# Exact-engine vectors: "none" (float32), "float16" or "int8" (per-vector scale). Quantized vectors are the
+# resident first pass; the best VECTOR_RESCORE_FACTOR x K are rescored from the float32 file (0: no rescoring)
+VECTOR_QUANTIZATION = os.getenv("VECTOR_QUANTIZATION", "none").lower()
+VECTOR_RESCORE_FACTOR = int(os.getenv("VECTOR_RESCORE_FACTOR", "4"))
+# Knowledge retrieval fuses BM25 (FTS5) and vector ranks with reciprocal rank fusion
+HYBRID_RETRIEVAL = os.getenv("HYBRID_RETRIEVAL", "true").lower() == "true"
+RRF_K = int(os.getenv("RRF_K", "60"))
+# Lexical-only fast path (no query embedding): short queries whose terms all match one
+# accessible chunk and include at least one rare term (in at most this share of the company's chunks)
+LEXICAL_FAST_PATH = os.getenv("LEXICAL_FAST_PATH", "true").lower() == "true"
+LEXICAL_MAX_TERMS = int(os.getenv("LEXICAL_MAX_TERMS", "4"))
+LEXICAL_RARE_TERM_RATIO = float(os.getenv("LEXICAL_RARE_TERM_RATIO", "0.1"))
+# Start knowledge and history retrieval alongside intent classification and keep the matching branch
+SPECULATIVE_RETRIEVAL = os.getenv("SPECULATIVE_RETRIEVAL", "true").lower() == "true"
+
+# Completed knowledge answers, replayed for repeat / near-duplicate questions from users with the same access
+ANSWER_CACHE_SIZE = int(os.getenv("ANSWER_CACHE_SIZE", "1024"))
+ANSWER_CACHE_TTL_SECONDS = float(os.getenv("ANSWER_CACHE_TTL_SECONDS", "3600"))
+ANSWER_CACHE_SIMILARITY = float(os.getenv("ANSWER_CACHE_SIMILARITY", "0.95"))
+
+# POST /api/search/batch: queries per request, queries per LLM classification call,
+# and answers generated at once when a batch asks for them
+BATCH_MAX_QUERIES = int(os.getenv("BATCH_MAX_QUERIES", "1000"))
+BATCH_CLASSIFY_SIZE = int(os.getenv("BATCH_CLASSIFY_SIZE", "25"))
+BATCH_ANSWER_CONCURRENCY = int(os.getenv("BATCH_ANSWER_CONCURRENCY", "4"))
+
+# Chunker token budget (estimated at ~4 characters per token): chunks hold at most CHUNK_MAX_TOKENS
+# and consecutive windows of the same page or transcript share up to CHUNK_OVERLAP_TOKENS
+CHUNK_MAX_TOKENS = int(os.getenv("CHUNK_MAX_TOKENS", "256"))
+CHUNK_OVERLAP_TOKENS = int(os.getenv("CHUNK_OVERLAP_TOKENS", "32"))
+
+# Ingestion embedding batches: inputs are packed up to a token budget per request,
+# with several requests in flight at once
+EMBEDDING_BATCH_TOKENS = int(os.getenv("EMBEDDING_BATCH_TOKENS", "100000"))
+EMBEDDING_BATCH_SIZE = int(os.getenv("EMBEDDING_BATCH_SIZE", "512"))
+EMBEDDING_CONCURRENCY = int(os.getenv("EMBEDDING_CONCURRENCY", "4"))
+CHROMA_ADD_BATCH_SIZE = int(os.getenv("CHROMA_ADD_BATCH_SIZE", "2000"))
+# Persistent embedding cache survives index rebuilds; 0 disables size-bounded eviction
+EMBEDDING_CACHE_MAX_ENTRIES = int(os.getenv("EMBEDDING_CACHE_MAX_ENTRIES", "500000"))
+
+# Query embeddings: in-process LRU with TTL, optionally backed by the on-disk embedding cache
+QUERY_EMBEDDING_CACHE_SIZE = int(os.getenv("QUERY_EMBEDDING_CACHE_SIZE", "4096"))
+QUERY_EMBEDDING_TTL_SECONDS = float(os.getenv("QUERY_EMBEDDING_TTL_SECONDS", "86400"))
+QUERY_EMBEDDING_PERSIST = os.getenv("QUERY_EMBEDDING_PERSIST", "false").lower() == "true"
@@ -1,106 +1,227 @@
 import json
-import pandas as pd
+import queue
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
-from config import DATABASE_DIR
+from typing import Iterator
+import pandas as pd
+from sqlalchemy import Boolean, Integer
+from sqlalchemy.orm import Session
+from sqlalchemy.schema import CreateTable
+from config import DATABASE_DIR, LOAD_CHUNK_ROWS, LOAD_COMMIT_ROWS, LOAD_WORKERS
 from database.models import (
     engine, SessionLocal, Base,
     Company, User, Play, PlayAssignment, Rep, Asset, Submission, Feedback,
 )
+from database.manifest import file_hash, get_entries, put_entry
+from database.migrations import migrate
+
+
+def prepare_rows(model, df: pd.DataFrame) -> list[dict]:
+    """Shape a source frame into insert-ready rows for `model`.
+
+    Columns are taken in model order and converted by column type (TRUE/FALSE
+    strings to booleans, integers to ints); missing values become None.
+    """
+    columns = [c.name for c in model.__table__.columns]
+    df = df.reindex(columns=columns)
+    for column in model.__table__.columns:
+        if isinstance(column.type, Boolean):
+            df[column.name] = df[column.name].astype(str).str.upper() == "TRUE"
+        elif isinstance(column.type, Integer):
+            df[column.name] = df[column.name].astype("Int64")
+    # zip over plain tuples is several times faster than DataFrame.to_dict("records")
+    values = df.astype(object).where(df.notna(), None).itertuples(index=False, name=None)
+    return [dict(zip(columns, row)) for row in values]
+
+
+def iter_row_chunks(model, path: Path, chunksize: int = LOAD_CHUNK_ROWS) -> Iterator[list[dict]]:
+    """Stream a source file as chunks of rows; JSON sources hold a list under the table's name."""
+    if path.suffix == ".json":
+        with open(path) as f:
+            yield prepare_rows(model, pd.DataFrame(json.load(f)[model.__tablename__]))
+        return
+    for df in pd.read_csv(path, chunksize=chunksize):
+        yield prepare_rows(model, df)
+
+
+def read_rows(model, path: Path) -> list[dict]:
+    return [row for chunk in iter_row_chunks(model, path) for row in chunk]
+
+
+# Load order respects foreign keys (assets before reps since reps reference assets)
+TABLE_SOURCES = [
+    (Company, "BigSpring_takehome_data - comapny.json"),
+    (Asset, "BigSpring_takehome_data - asset.csv"),
+    (User, "BigSpring_takehome_data - users.csv"),
+    (Play, "BigSpring_takehome_data - play.csv"),
+    (PlayAssignment, "BigSpring_takehome_data - play_assignment.csv"),
+    (Rep, "BigSpring_takehome_data - rep.csv"),
+    (Submission, "BigSpring_takehome_data - submission.csv"),
+    (Feedback, "BigSpring_takehome_data - feedback.csv"),
+]
+
+
+def load_all(data_dir: Path = DATABASE_DIR, engine=engine, chunksize: int = LOAD_CHUNK_ROWS,
+             commit_rows: int = LOAD_COMMIT_ROWS, workers: int = LOAD_WORKERS) -> dict[str, dict]:
+    """Rebuild the data tables from the source files with streamed bulk inserts.
+
+    Worker threads parse the source files in parallel, chunk by chunk, and hand
+    them to a single writer (SQLite has one) that inserts each chunk with one
+    executemany and commits every `commit_rows` rows. Secondary indexes are
+    built once all rows are in. Returns per-table row counts and timings.
+    """
+    # The ingest manifest outlives full reloads so vector ingestion can still diff against it
+    data_tables = [m.__table__ for m, _ in TABLE_SOURCES]
+    Base.metadata.drop_all(engine, tables=data_tables)
+    with engine.begin() as conn:
+        for table in data_tables:
+            conn.execute(CreateTable(table))  # no secondary indexes yet
+    Base.metadata.create_all(engine, tables=[t for t in Base.metadata.sorted_tables if t not in data_tables])
 
+    stats = {m.__tablename__: {"rows": 0, "parse_s": 0.0, "insert_s": 0.0} for m, _ in TABLE_SOURCES}
+    chunks: queue.Queue = queue.Queue(maxsize=max(2, workers * 2))
+    stop = threading.Event()
 
-def load_all():
-    Base.metadata.drop_all(engine)
+    def hand_off(item) -> bool:
+        # Bounded queue keeps memory flat; give up if the writer has failed
+        while not stop.is_set():
+            try:
+                chunks.put(item, timeout=0.1)
+                return True
+            except queue.Full:
+                continue
+        return False
+
+    def parse(model, path: Path):
+        table_stats = stats[model.__tablename__]
+        try:
+            started = time.perf_counter()
+            for rows in iter_row_chunks(model, path, chunksize):
+                table_stats["parse_s"] += time.perf_counter() - started
+                if not hand_off((model.__table__, rows)):
+                    return
+                started = time.perf_counter()
+            hand_off((model.__table__, None))
+        except Exception as e:
+            hand_off((model.__table__, e))
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="load-parse") as pool, engine.connect() as conn:
+        # Full rebuild from source files: durability of each intermediate commit is not needed
+        conn.exec_driver_sql("PRAGMA synchronous=OFF")
+        try:
+            for model, file_name in TABLE_SOURCES:
+                pool.submit(parse, model, data_dir / file_name)
+            remaining, uncommitted = len(TABLE_SOURCES), 0
+            while remaining:
+                table, rows = chunks.get()
+                if rows is None:
+                    remaining -= 1
+                    continue
+                if isinstance(rows, Exception):
+                    raise rows
+                insert_started = time.perf_counter()
+                conn.execute(table.insert(), rows)
+                uncommitted += len(rows)
+                if uncommitted >= commit_rows:
+                    conn.commit()
+                    uncommitted = 0
+                stats[table.name]["insert_s"] += time.perf_counter() - insert_started
+                stats[table.name]["rows"] += len(rows)
+            conn.commit()
+        except Exception:
+            stop.set()
+            conn.rollback()
+            raise
+        finally:
+            conn.exec_driver_sql("PRAGMA synchronous=NORMAL")
+
+    index_started = time.perf_counter()
+    with engine.begin() as conn:
+        for table in data_tables:
+            for index in table.indexes:
+                index.create(conn)
+    index_s = time.perf_counter() - index_started
+    migrate(engine)
+
+    with Session(engine) as session:
+        for model, file_name in TABLE_SOURCES:
+            put_entry(session, "table", model.__tablename__, file_hash=file_hash(data_dir / file_name))
+        session.commit()
+
+    elapsed = time.perf_counter() - started
+    total = sum(t["rows"] for t in stats.values())
+    for name, t in stats.items():
+        busy = t["parse_s"] + t["insert_s"]
+        rate = t["rows"] / busy if busy else 0.0
+        print(f"  {name:<18} {t['rows']:>10,} rows  parse {t['parse_s']:6.2f}s  insert {t['insert_s']:6.2f}s  {rate:>12,.0f} rows/s")
+    print(f"  indexes built in {index_s:.2f}s")
+    print(f"Loaded {total:,} rows into SQLite in {elapsed:.2f}s ({total / elapsed:,.0f} rows/s).")
+    return {**stats, "_index_s": index_s, "_elapsed_s": elapsed}
+
+
+def sync_table(session, model, rows: list[dict]) -> dict:
+    """Apply a row-level diff of `rows` against `model`'s table (deletes are returned, not applied)."""
+    existing = {obj.id: obj for obj in session.query(model).all()}
+    inserted, updated = [], []
+    for row in rows:
+        obj = existing.get(row["id"])
+        if obj is None:
+            session.add(model(**row))
+            inserted.append(row["id"])
+        elif any(getattr(obj, k) != v for k, v in row.items()):
+            for k, v in row.items():
+                setattr(obj, k, v)
+            updated.append(row["id"])
+    incoming = {row["id"] for row in rows}
+    deleted = [pk for pk in existing if pk not in incoming]
+    return {"inserted": inserted, "updated": updated, "deleted": deleted}
+
+
+def sync_all() -> dict[str, dict]:
+    """Incrementally bring SQLite in line with the source files.
+
+    Tables whose source file hash matches the manifest are skipped; the rest get
+    row-level inserts/updates/deletes. Returns the per-table change sets.
+    """
     Base.metadata.create_all(engine)
+    migrate()
     session = SessionLocal()
+    changes = {}
 
     try:
-        # Companies
-        with open(DATABASE_DIR / "BigSpring_takehome_data - comapny.json") as f:
-            data = json.load(f)
-        for c in data["companies"]:
-            session.add(Company(id=c["id"], name=c["name"], description=c["description"]))
-        session.flush()
-
-        # Assets (load before reps since reps reference assets)
-        df = pd.read_csv(DATABASE_DIR / "BigSpring_takehome_data - asset.csv")
-        for _, r in df.iterrows():
-            session.add(Asset(
-                id=r["id"], type=r["type"], file_name=r["file_name"],
-                created_at=r["created_at"], company_id=r["company_id"],
-            ))
-        session.flush()
-
-        # Users
-        df = pd.read_csv(DATABASE_DIR / "BigSpring_takehome_data - users.csv")
-        for _, r in df.iterrows():
-            session.add(User(
-                id=r["id"], username=r["username"], display_name=r["display_name"],
-                role=r["role"], segment=r["segment"], created_at=r["created_at"],
-                is_active=str(r["is_active"]).upper() == "TRUE",
-                company_id=r["company_id"],
-            ))
-        session.flush()
-
-        # Plays
-        df = pd.read_csv(DATABASE_DIR / "BigSpring_takehome_data - play.csv")
-        for _, r in df.iterrows():
-            session.add(Play(
-                id=r["id"], company_id=r["company_id"], title=r["title"],
-                description=r["description"], created_at=r["created_at"],
-                is_active=str(r["is_active"]).upper() == "TRUE",
-            ))
-        session.flush()
-
-        # Play Assignments
-        df = pd.read_csv(DATABASE_DIR / "BigSpring_takehome_data - play_assignment.csv")
-        for _, r in df.iterrows():
-            completed = r["completed_at"] if pd.notna(r["completed_at"]) else None
-            session.add(PlayAssignment(
-                id=r["id"], user_id=r["user_id"], play_id=r["play_id"],
-                assigned_date=r["assigned_date"], status=r["status"],
-                completed_at=completed,
-            ))
-        session.flush()
-
-        # Reps
-        df = pd.read_csv(DATABASE_DIR / "BigSpring_takehome_data - rep.csv")
-        for _, r in df.iterrows():
-            asset_id = r["asset_id"] if pd.notna(r["asset_id"]) else None
-            session.add(Rep(
-                id=r["id"], prompt_text=r["prompt_text"], prompt_title=r["prompt_title"],
-                prompt_type=r["prompt_type"], play_id=r["play_id"],
-                company_id=r["company_id"], asset_id=asset_id,
-                created_at=r["created_at"],
-            ))
-        session.flush()
-
-        # Submissions
-        df = pd.read_csv(DATABASE_DIR / "BigSpring_takehome_data - submission.csv")
-        for _, r in df.iterrows():
-            session.add(Submission(
-                id=r["id"], user_id=r["user_id"], rep_id=r["rep_id"],
-                submitted_at=r["submitted_at"], submission_type=r["submission_type"],
-                asset_id=r["asset_id"], company_id=r["company_id"],
-            ))
-        session.flush()
-
-        # Feedback
-        df = pd.read_csv(DATABASE_DIR / "BigSpring_takehome_data - feedback.csv")
-        for _, r in df.iterrows():
-            session.add(Feedback(
-                id=r["id"], submission_id=r["submission_id"],
-                company_id=r["company_id"], score=int(r["score"]),
-                text=r["text"], created_at=r["created_at"],
-            ))
+        manifest = get_entries(session, "table")
+        for model, file_name in TABLE_SOURCES:
+            path = DATABASE_DIR / file_name
+            digest = file_hash(path)
+            entry = manifest.get(model.__tablename__)
+            if entry and entry.file_hash == digest:
+                continue
+            changes[model.__tablename__] = sync_table(session, model, read_rows(model, path))
+            session.flush()
+            put_entry(session, "table", model.__tablename__, file_hash=digest)
+
+        # Delete children before parents
+        for model, _ in reversed(TABLE_SOURCES):
+            deleted = changes.get(model.__tablename__, {}).get("deleted")
+            if deleted:
+                session.query(model).filter(model.id.in_(deleted)).delete(synchronize_session=False)
 
         session.commit()
-        print(f"Loaded all data into SQLite successfully.")
     except Exception as e:
         session.rollback()
         raise e
     finally:
         session.close()
 
+    for table, diff in changes.items():
+        print(f"  {table}: +{len(diff['inserted'])} ~{len(diff['updated'])} -{len(diff['deleted'])}")
+    if not changes:
+        print("SQLite is up to date.")
+    return changes
+
 
 if __name__ == "__main__":
     load_all()
@@ -0,0 +1,42 @@
+import hashlib
+import json
+from datetime import datetime, timezone
+from pathlib import Path
+from database.models import IngestManifest
+
+
+def file_hash(path: Path) -> str:
+    h = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            h.update(block)
+    return h.hexdigest()
+
+
+def row_checksum(*values) -> str:
+    return hashlib.sha256(json.dumps(values, default=str).encode()).hexdigest()
+
+
+def get_entries(session, kind: str) -> dict[str, IngestManifest]:
+    return {e.key: e for e in session.query(IngestManifest).filter(IngestManifest.kind == kind).all()}
+
+
+def put_entry(session, kind: str, key: str, **fields):
+    entry = session.get(IngestManifest, (kind, key))
+    if entry is None:
+        entry = IngestManifest(kind=kind, key=key)
+        session.add(entry)
+    for name, value in fields.items():
+        if name == "chunk_ids":
+            value = json.dumps(value)
+        setattr(entry, name, value)
+    entry.updated_at = datetime.now(timezone.utc).isoformat()
+    return entry
+
+
+def entry_chunk_ids(entry: IngestManifest) -> list[str]:
+    return json.loads(entry.chunk_ids) if entry.chunk_ids else []
+
+
+def clear_kind(session, kind: str):
+    session.query(IngestManifest).filter(IngestManifest.kind == kind).delete()
@@ -0,0 +1,41 @@
+from sqlalchemy import inspect
+from database.models import engine as default_engine, Base
+
+
+def create_model_indexes(conn):
+    """Create the indexes declared on the models that are missing from existing tables."""
+    inspector = inspect(conn)
+    for table in Base.metadata.sorted_tables:
+        if not inspector.has_table(table.name):
+            continue  # create_all will build it with its indexes
+        for index in table.indexes:
+            index.create(conn, checkfirst=True)
+
+
+# Schema version lives in SQLite's `PRAGMA user_version`. Models stay the source of truth
+# (create_all builds fresh databases complete); these steps bring older databases up to
+# date, each in its own transaction. Append a (version, description, apply) to change the schema.
+MIGRATIONS = [
+    (1, "secondary indexes for user, assignment, rep, submission and feedback lookups", create_model_indexes),
+]
+
+SCHEMA_VERSION = MIGRATIONS[-1][0]
+
+
+def schema_version(conn) -> int:
+    return conn.exec_driver_sql("PRAGMA user_version").scalar()
+
+
+def migrate(engine=default_engine) -> int:
+    """Apply pending migrations; returns the resulting schema version."""
+    with engine.connect() as conn:
+        current = schema_version(conn)
+    for version, description, apply in MIGRATIONS:
+        if version <= current:
+            continue
+        with engine.begin() as conn:
+            apply(conn)
+            conn.exec_driver_sql(f"PRAGMA user_version = {version}")
+        print(f"  Migrated SQLite schema to v{version}: {description}")
+        current = version
+    return current
@@ -1,10 +1,38 @@
-from sqlalchemy import create_engine, Column, String, Boolean, Integer, DateTime, ForeignKey, Text
+from sqlalchemy import create_engine, event, Column, String, Boolean, Integer, DateTime, ForeignKey, Text, Index
 from sqlalchemy.orm import declarative_base, sessionmaker, relationship
-from config import SQLITE_DB_PATH
+from sqlalchemy.ext.asyncio import create_async_engine, async_sessionmaker
+from sqlalchemy.pool import AsyncAdaptedQueuePool
+from config import SQLITE_DB_PATH, SQLITE_POOL_SIZE, SQLITE_MMAP_SIZE, SQLITE_CACHE_SIZE_KB, SQLITE_BUSY_TIMEOUT_MS
 
 Base = declarative_base()
-engine = create_engine(f"sqlite:///{SQLITE_DB_PATH}", echo=False)
+engine = create_engine(f"sqlite:///{SQLITE_DB_PATH}", echo=False, pool_size=SQLITE_POOL_SIZE)
 SessionLocal = sessionmaker(bind=engine)
+# Used by the async search path so DB access never blocks the event loop. aiosqlite defaults to
+# NullPool (a new connection and worker thread per session); pool them like the sync engine
+async_engine = create_async_engine(f"sqlite+aiosqlite:///{SQLITE_DB_PATH}", echo=False,
+                                   poolclass=AsyncAdaptedQueuePool, pool_size=SQLITE_POOL_SIZE)
+AsyncSessionLocal = async_sessionmaker(bind=async_engine, expire_on_commit=False)
+
+# WAL lets readers run alongside a writer; mmap and a larger page cache keep hot pages out of read() calls
+SQLITE_PRAGMAS = [
+    "PRAGMA journal_mode=WAL",
+    "PRAGMA synchronous=NORMAL",
+    f"PRAGMA mmap_size={SQLITE_MMAP_SIZE}",
+    f"PRAGMA cache_size=-{SQLITE_CACHE_SIZE_KB}",
+    f"PRAGMA busy_timeout={SQLITE_BUSY_TIMEOUT_MS}",
+    "PRAGMA temp_store=MEMORY",
+]
+
+
+def configure_sqlite(dbapi_connection, _connection_record=None):
+    cursor = dbapi_connection.cursor()
+    for pragma in SQLITE_PRAGMAS:
+        cursor.execute(pragma)
+    cursor.close()
+
+
+event.listen(engine, "connect", configure_sqlite)
+event.listen(async_engine.sync_engine, "connect", configure_sqlite)
 
 
 class Company(Base):
@@ -24,6 +52,7 @@ class User(Base):
     created_at = Column(String)
     is_active = Column(Boolean, default=True)
     company_id = Column(String, ForeignKey("companies.id"))
+    __table_args__ = (Index("ix_users_company_username", "company_id", "username"),)
 
 
 class Play(Base):
@@ -44,6 +73,7 @@ class PlayAssignment(Base):
     assigned_date = Column(String)
     status = Column(String)
     completed_at = Column(String, nullable=True)
+    __table_args__ = (Index("ix_play_assignments_user_play", "user_id", "play_id"),)
 
 
 class Rep(Base):
@@ -56,6 +86,10 @@ class Rep(Base):
     company_id = Column(String, ForeignKey("companies.id"))
     asset_id = Column(String, ForeignKey("assets.id"), nullable=True)
     created_at = Column(String)
+    __table_args__ = (
+        Index("ix_reps_play_type_asset", "play_id", "prompt_type", "asset_id"),
+        Index("ix_reps_asset", "asset_id"),
+    )
 
 
 class Asset(Base):
@@ -76,6 +110,7 @@ class Submission(Base):
     submission_type = Column(String)
     asset_id = Column(String, ForeignKey("assets.id"))
     company_id = Column(String, ForeignKey("companies.id"))
+    __table_args__ = (Index("ix_submissions_user_asset", "user_id", "asset_id"),)
 
 
 class Feedback(Base):
@@ -86,7 +121,23 @@ class Feedback(Base):
     score = Column(Integer)
     text = Column(Text)
     created_at = Column(String)
+    __table_args__ = (Index("ix_feedback_submission", "submission_id"),)
+
+
+class IngestManifest(Base):
+    """Per-source fingerprints used by incremental loading and ingestion."""
+    __tablename__ = "ingest_manifest"
+    kind = Column(String, primary_key=True)  # "table" or "asset"
+    key = Column(String, primary_key=True)  # table name or asset_id
+    file_hash = Column(String)
+    checksum = Column(String)  # row checksum (asset row + submission owner)
+    chunker_version = Column(Integer, nullable=True)
+    collection = Column(String, nullable=True)
+    chunk_ids = Column(Text, nullable=True)  # JSON list of chunk ids in `collection`
+    updated_at = Column(String)
 
 
 def init_tables():
+    from database.migrations import migrate
     Base.metadata.create_all(engine)
+    migrate()
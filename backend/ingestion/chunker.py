@@ -1,41 +1,97 @@
-import json
-from pathlib import Path
+import re
 from typing import Any
+from config import CHUNK_MAX_TOKENS, CHUNK_OVERLAP_TOKENS
+
+# Bump whenever chunk boundaries or metadata change so incremental ingestion re-chunks every asset
+CHUNKER_VERSION = 2
+
+SENTENCE_RE = re.compile(r"(?<=[.!?])\s+")
+
+
+def estimate_tokens(text: str) -> int:
+    # ~4 characters per token for English text; close enough for chunk and request budgeting
+    return len(text) // 4 + 1
+
+
+def pack_windows(units: list, size, max_tokens: int = CHUNK_MAX_TOKENS,
+                 overlap_tokens: int = CHUNK_OVERLAP_TOKENS) -> list[list]:
+    """Group consecutive units into windows of at most `max_tokens` (by `size(unit)`).
+
+    Each new window starts with the trailing units of the previous one that fit
+    in `overlap_tokens`, so context spanning a boundary is retrievable from
+    either side. A unit larger than `max_tokens` gets a window of its own;
+    callers split such units first.
+    """
+    windows, current, used = [], [], 0
+    for unit in units:
+        tokens = size(unit)
+        if current and used + tokens > max_tokens:
+            windows.append(current)
+            carry, carried = [], 0
+            for prev in reversed(current):
+                prev_tokens = size(prev)
+                if carried + prev_tokens > overlap_tokens or carried + prev_tokens + tokens > max_tokens:
+                    break
+                carry.insert(0, prev)
+                carried += prev_tokens
+            current, used = carry, carried
+        current.append(unit)
+        used += tokens
+    if current:
+        windows.append(current)
+    return windows
+
+
+def split_text(text: str, max_tokens: int = CHUNK_MAX_TOKENS, overlap_tokens: int = CHUNK_OVERLAP_TOKENS) -> list[str]:
+    """Split text into overlapping windows on sentence boundaries (then words, then characters); nothing is dropped."""
+    text = text.strip()
+    if estimate_tokens(text) <= max_tokens:
+        return [text] if text else []
+    max_chars = max_tokens * 4
+    units = []
+    for sentence in SENTENCE_RE.split(text):
+        if estimate_tokens(sentence) <= max_tokens:
+            units.append(sentence)
+            continue
+        for words in pack_windows(sentence.split(), lambda w: estimate_tokens(w + " "), max_tokens, 0):
+            piece = " ".join(words)
+            units += [piece[i:i + max_chars] for i in range(0, len(piece), max_chars)]
+    return [" ".join(window) for window in pack_windows(units, lambda s: estimate_tokens(s + " "), max_tokens, overlap_tokens)]
 
 
 def chunk_pdf_asset(data: list[dict], asset_id: str, company_id: str, file_name: str) -> list[dict]:
     chunks = []
     for page in data:
         page_num = page.get("page", 0)
-        # Full page text as a chunk
-        if page.get("text"):
+        # Page text in token-budgeted windows
+        for text in split_text(page.get("text", "")):
             chunks.append({
-                "text": page["text"],
+                "text": text,
                 "metadata": {
                     "asset_id": asset_id, "company_id": company_id,
                     "source_file": file_name, "page": page_num,
                     "chunk_type": "page_text",
                 },
             })
-        # Each table as a separate chunk for precise retrieval
+        # Each table as a separate chunk for precise retrieval (row windows repeat the title and headers)
         for table in page.get("tables", []):
-            table_text = format_table(table)
-            chunks.append({
-                "text": table_text,
-                "metadata": {
-                    "asset_id": asset_id, "company_id": company_id,
-                    "source_file": file_name, "page": page_num,
-                    "chunk_type": "table", "table_id": table.get("id", ""),
-                    "table_title": table.get("title", ""),
-                },
-            })
+            for table_text in table_windows(table):
+                chunks.append({
+                    "text": table_text,
+                    "metadata": {
+                        "asset_id": asset_id, "company_id": company_id,
+                        "source_file": file_name, "page": page_num,
+                        "chunk_type": "table", "table_id": table.get("id", ""),
+                        "table_title": table.get("title", ""),
+                    },
+                })
     return chunks
 
 
-def format_table(table: dict) -> str:
+def format_table(table: dict, rows: list = None) -> str:
     title = table.get("title", "")
     headers = table.get("headers", [])
-    rows = table.get("rows", [])
+    rows = table.get("rows", []) if rows is None else rows
     lines = [f"Table: {title}"]
     if headers:
         lines.append(" | ".join(headers))
@@ -45,26 +101,56 @@ def format_table(table: dict) -> str:
     return "\n".join(lines)
 
 
+def table_windows(table: dict, max_tokens: int = CHUNK_MAX_TOKENS) -> list[str]:
+    text = format_table(table)
+    if estimate_tokens(text) <= max_tokens:
+        return [text]
+    budget = max_tokens - estimate_tokens(format_table(table, rows=[]))
+    if budget <= 0 or not table.get("rows"):
+        return split_text(text, max_tokens)
+    windows = []
+    for rows in pack_windows(table["rows"], lambda row: estimate_tokens(" | ".join(map(str, row)) + "\n"), budget, 0):
+        windows += split_text(format_table(table, rows=rows), max_tokens)
+    return windows
+
+
+def segment_windows(segments: list[dict], max_tokens: int = CHUNK_MAX_TOKENS,
+                    overlap_tokens: int = CHUNK_OVERLAP_TOKENS) -> list[dict]:
+    """Merge consecutive transcript segments into windows, keeping the first start and last end timestamps."""
+    pieces = []
+    for seg in segments:
+        # An oversized segment is split; every piece keeps the segment's timestamps
+        for text in split_text(seg.get("text", ""), max_tokens, overlap_tokens):
+            pieces.append({**seg, "text": text})
+    windows = []
+    for window in pack_windows(pieces, lambda seg: estimate_tokens(seg["text"] + "\n"), max_tokens, overlap_tokens):
+        speakers = list(dict.fromkeys(seg.get("speaker", "") for seg in window if seg.get("speaker")))
+        windows.append({
+            "text": "\n".join(seg["text"] for seg in window),
+            "start": window[0].get("start", ""), "end": window[-1].get("end", ""),
+            "speaker": ", ".join(speakers),
+        })
+    return windows
+
+
+def transcript_windows(data: dict) -> list[dict]:
+    # Segment windows already cover the whole transcript, so it is not indexed again as one chunk;
+    # the full transcript is only used when there are no segments
+    if data.get("segments"):
+        return segment_windows(data["segments"])
+    return [{"text": text, "start": "", "end": "", "speaker": ""} for text in split_text(data.get("full_transcript", ""))]
+
+
 def chunk_video_asset(data: dict, asset_id: str, company_id: str, file_name: str) -> list[dict]:
     chunks = []
-    # Full transcript as one chunk
-    if data.get("full_transcript"):
-        chunks.append({
-            "text": data["full_transcript"],
-            "metadata": {
-                "asset_id": asset_id, "company_id": company_id,
-                "source_file": file_name, "chunk_type": "full_transcript",
-            },
-        })
-    # Each segment as a chunk
-    for seg in data.get("segments", []):
+    for window in transcript_windows(data):
         chunks.append({
-            "text": seg["text"],
+            "text": window["text"],
             "metadata": {
                 "asset_id": asset_id, "company_id": company_id,
                 "source_file": file_name, "chunk_type": "segment",
-                "start": seg.get("start", ""), "end": seg.get("end", ""),
-                "speaker": seg.get("speaker", ""),
+                "start": window["start"], "end": window["end"],
+                "speaker": window["speaker"],
             },
         })
     return chunks
@@ -78,37 +164,27 @@ def chunk_image_asset(data: dict, asset_id: str, company_id: str, file_name: str
         parts.append(data["ocr_text"])
     for elem in data.get("visual_elements", []):
         parts.append(f"{elem.get('label', '')}: {elem.get('description', '')}")
-    text = "\n".join(parts)
     return [{
         "text": text,
         "metadata": {
             "asset_id": asset_id, "company_id": company_id,
             "source_file": file_name, "chunk_type": "image_description",
         },
-    }] if text.strip() else []
+    } for text in split_text("\n".join(parts))]
 
 
 def chunk_submission_asset(data: dict, asset_id: str, company_id: str, user_id: str,
                            submission_id: str, file_name: str) -> list[dict]:
     chunks = []
-    if data.get("full_transcript"):
-        chunks.append({
-            "text": data["full_transcript"],
-            "metadata": {
-                "asset_id": asset_id, "company_id": company_id,
-                "user_id": user_id, "submission_id": submission_id,
-                "source_file": file_name, "chunk_type": "submission_transcript",
-            },
-        })
-    for seg in data.get("segments", []):
+    for window in transcript_windows(data):
         chunks.append({
-            "text": seg["text"],
+            "text": window["text"],
             "metadata": {
                 "asset_id": asset_id, "company_id": company_id,
                 "user_id": user_id, "submission_id": submission_id,
                 "source_file": file_name, "chunk_type": "submission_segment",
-                "start": seg.get("start", ""), "end": seg.get("end", ""),
-                "speaker": seg.get("speaker", ""),
+                "start": window["start"], "end": window["end"],
+                "speaker": window["speaker"],
             },
         })
     return chunks
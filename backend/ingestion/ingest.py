@@ -1,88 +1,318 @@
 import json
 import shutil
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
 from pathlib import Path
 import chromadb
-from openai import OpenAI
-from config import ASSETS_DIR, CHROMA_PERSIST_DIR, EMBEDDING_MODEL, OPENAI_API_KEY
-from database.models import SessionLocal, Asset, Submission
-from ingestion.chunker import chunk_asset
+from config import (
+    ASSETS_DIR, CHROMA_PERSIST_DIR,
+    EMBEDDING_BATCH_TOKENS, EMBEDDING_BATCH_SIZE, EMBEDDING_CONCURRENCY, CHROMA_ADD_BATCH_SIZE,
+)
+from database.models import SessionLocal, Asset, Rep, Submission
+from database.manifest import file_hash, row_checksum, get_entries, put_entry, entry_chunk_ids, clear_kind
+from ingestion.chunker import chunk_asset, estimate_tokens, CHUNKER_VERSION
+from services.embedding_cache import EmbeddingCache
+from services.embedding_providers import provider, index_signature, MAX_INPUT_CHARS
+from services.embeddings import embed_texts
+from services.lexical_index import LexicalIndex
+from services.exact_index import export_collections
+from services.vector_store import publish_generation, read_generation, chroma_dir, collection_name, access_group_id
 
-client = OpenAI(api_key=OPENAI_API_KEY)
 
+def pack_batches(records: list[dict], max_tokens: int = EMBEDDING_BATCH_TOKENS,
+                 max_inputs: int = EMBEDDING_BATCH_SIZE) -> list[list[dict]]:
+    """Greedily pack chunk records into request-sized batches by estimated token count."""
+    batches, current, current_tokens = [], [], 0
+    for rec in records:
+        tokens = estimate_tokens(rec["text"])
+        if current and (current_tokens + tokens > max_tokens or len(current) >= max_inputs):
+            batches.append(current)
+            current, current_tokens = [], 0
+        current.append(rec)
+        current_tokens += tokens
+    if current:
+        batches.append(current)
+    return batches
 
-def get_embedding(text: str) -> list[float]:
-    text = text[:8000]
-    resp = client.embeddings.create(input=[text], model=EMBEDDING_MODEL)
-    return resp.data[0].embedding
 
+def load_submission_owners(session) -> dict[str, tuple[str, str]]:
+    """Map submission asset_id -> (user_id, submission_id)."""
+    return {sub.asset_id: (sub.user_id, sub.id) for sub in session.query(Submission).all()}
 
-def run_ingestion():
-    # Clean up old data
-    chroma_path = Path(CHROMA_PERSIST_DIR)
-    if chroma_path.exists():
-        shutil.rmtree(chroma_path)
 
-    chroma = chromadb.PersistentClient(path=CHROMA_PERSIST_DIR)
-    knowledge_col = chroma.get_or_create_collection("knowledge", metadata={"hnsw:space": "cosine"})
-    submissions_col = chroma.get_or_create_collection("submissions", metadata={"hnsw:space": "cosine"})
+def load_asset_plays(session) -> dict[str, list[str]]:
+    """Map knowledge asset_id -> ids of the plays whose Watch Reps include it."""
+    asset_plays = {}
+    for rep in session.query(Rep).filter(Rep.prompt_type == "watch", Rep.asset_id.isnot(None)).all():
+        asset_plays.setdefault(rep.asset_id, set()).add(rep.play_id)
+    return {asset_id: sorted(plays) for asset_id, plays in asset_plays.items()}
 
-    session = SessionLocal()
 
-    submission_map = {}
-    for sub in session.query(Submission).all():
-        submission_map[sub.asset_id] = (sub.user_id, sub.id)
+def asset_checksum(asset: Asset, owner: tuple[str, str], play_ids: list[str]) -> str:
+    return row_checksum(asset.type, asset.file_name, asset.company_id, *owner, *play_ids)
+
 
-    assets = session.query(Asset).all()
-    print(f"Processing {len(assets)} assets...")
+def chunk_asset_records(asset: Asset, owner: tuple[str, str] | None, play_ids: list[str]) -> list[dict]:
+    """Chunk one asset file into flat records tagged with their target collection.
 
-    knowledge_count = 0
-    submission_count = 0
+    Knowledge chunks go to their company's partition and are tagged with the
+    access group of the plays granting access, so queries filter on a few
+    group ids instead of every accessible asset id.
+    """
+    with open(ASSETS_DIR / asset.file_name) as f:
+        data = json.load(f)
 
-    for asset in assets:
-        file_path = ASSETS_DIR / asset.file_name
-        if not file_path.exists():
-            print(f"  Skipping {asset.file_name} (file not found)")
+    user_id, submission_id = owner or ("", "")
+    chunks = chunk_asset(
+        asset_type=asset.type, data=data,
+        asset_id=asset.id, company_id=asset.company_id,
+        file_name=asset.file_name,
+        user_id=user_id, submission_id=submission_id,
+    )
+
+    collection = collection_name("submissions" if owner else "knowledge", asset.company_id)
+    tags = {} if owner else {"access_group": access_group_id(play_ids)}
+    records = []
+    for i, chunk in enumerate(chunks):
+        text = chunk["text"]
+        if not text.strip():
             continue
+        if len(text) > MAX_INPUT_CHARS:
+            # The embeddings call would cut it short; chunks must fit instead (see CHUNK_MAX_TOKENS)
+            raise ValueError(f"{asset.file_name}: chunk {i} has {len(text)} characters, over the "
+                             f"{MAX_INPUT_CHARS}-character embedding input limit")
+        records.append({
+            "id": f"{asset.id}_chunk_{i}",
+            "text": text,
+            "metadata": {**{k: str(v) for k, v in chunk["metadata"].items()}, **tags},
+            "collection": collection,
+        })
+    return records
+
 
-        with open(file_path) as f:
-            data = json.load(f)
+class BulkWriter:
+    """Buffers embedded chunks per collection and flushes them in large `upsert` calls."""
 
-        is_submission = asset.id in submission_map
-        user_id, submission_id = submission_map.get(asset.id, ("", ""))
+    def __init__(self, chroma, flush_size: int = CHROMA_ADD_BATCH_SIZE):
+        self.chroma = chroma
+        self.flush_size = flush_size
+        self.pending = {}
+        self.counts = {}
 
-        chunks = chunk_asset(
-            asset_type=asset.type, data=data,
-            asset_id=asset.id, company_id=asset.company_id,
-            file_name=asset.file_name,
-            user_id=user_id, submission_id=submission_id,
-        )
+    def add(self, record: dict, embedding: list[float]):
+        buf = self.pending.setdefault(record["collection"], [])
+        buf.append((record, embedding))
+        if len(buf) >= self.flush_size:
+            self.flush(record["collection"])
 
-        # Collect chunks for this asset and insert in one batch
-        ids, embeddings, documents, metadatas = [], [], [], []
-        for i, chunk in enumerate(chunks):
-            text = chunk["text"]
-            if not text.strip():
+    def flush(self, name: str = None):
+        for col_name in ([name] if name else list(self.pending)):
+            buf = self.pending[col_name]
+            if not buf:
                 continue
-            chunk_id = f"{asset.id}_chunk_{i}"
-            embedding = get_embedding(text)
-            meta = {k: str(v) for k, v in chunk["metadata"].items()}
-            ids.append(chunk_id)
-            embeddings.append(embedding)
-            documents.append(text)
-            metadatas.append(meta)
-
-        if ids:
-            target = submissions_col if is_submission else knowledge_col
-            target.add(ids=ids, embeddings=embeddings, documents=documents, metadatas=metadatas)
-            if is_submission:
-                submission_count += len(ids)
+            # The provider signature lets query-time code refuse vectors from a different model
+            collection = self.chroma.get_or_create_collection(
+                col_name, metadata={"hnsw:space": "cosine", **provider.signature})
+            collection.upsert(
+                ids=[r["id"] for r, _ in buf],
+                embeddings=[e for _, e in buf],
+                documents=[r["text"] for r, _ in buf],
+                metadatas=[r["metadata"] for r, _ in buf],
+            )
+            self.counts[col_name] = self.counts.get(col_name, 0) + len(buf)
+            self.pending[col_name] = []
+
+
+def embed_records(records: list[dict], writer: BulkWriter, cache: EmbeddingCache = None,
+                  concurrency: int = EMBEDDING_CONCURRENCY):
+    """Embed records in packed batches with up to `concurrency` requests in flight.
+
+    Records whose text is already in `cache` are written straight through and
+    never sent to the embedding provider.
+    """
+    if cache is not None:
+        cached = cache.get_many(provider.cache_key, [r["text"] for r in records])
+        pending = []
+        for rec, emb in zip(records, cached):
+            if emb is None:
+                pending.append(rec)
             else:
-                knowledge_count += len(ids)
+                writer.add(rec, emb)
+    else:
+        pending = records
+
+    batches = pack_batches(pending)
+    print(f"Embedding {len(pending)} of {len(records)} chunks in {len(batches)} batches "
+          f"(concurrency={concurrency})...")
+    with ThreadPoolExecutor(max_workers=max(1, concurrency)) as pool:
+        futures = {pool.submit(embed_texts, [r["text"] for r in batch]): batch for batch in batches}
+        for future in as_completed(futures):
+            batch = futures[future]
+            embeddings = future.result()
+            # Chroma and cache writes stay on this thread; only the embedding calls run in the pool
+            if cache is not None:
+                cache.put_many(provider.cache_key, [r["text"] for r in batch], embeddings)
+            for rec, emb in zip(batch, embeddings):
+                writer.add(rec, emb)
+    writer.flush()
+
+
+def _prune_stores(keep: int):
+    """Delete the Chroma stores of generations before `keep`, whose store servers may still be reading."""
+    root = Path(CHROMA_PERSIST_DIR)
+    # Files of a store from before per-generation directories go once no server can be reading them
+    legacy = chroma_dir(keep) != root
+    for path in root.iterdir():
+        if not ((int(path.name) < keep) if path.name.isdigit() else legacy):
+            continue
+        if path.is_dir():
+            shutil.rmtree(path)
+        else:
+            path.unlink()
+
+
+def run_ingestion(incremental: bool = False):
+    """Chunk, embed and index every asset.
+
+    With `incremental=True` the existing index is kept: only assets whose file
+    hash, row checksum or chunker version differ from the manifest are
+    re-chunked and upserted, and chunks of removed assets are deleted. The
+    FTS5 lexical index receives the same chunks; an asset missing from it is
+    re-chunked too (its embeddings come from the cache).
+    """
+    started = time.perf_counter()
+
+    # Servers keep reading the published store; this run writes the next generation's directory
+    previous = read_generation()
+    source, target = chroma_dir(previous), Path(CHROMA_PERSIST_DIR) / str(previous + 1)
+    shutil.rmtree(target, ignore_errors=True)
+    if incremental and (source / "chroma.sqlite3").exists():
+        existing = chromadb.PersistentClient(path=str(source))
+        built = [index_signature(c.metadata) for c in existing.list_collections()]
+        # PersistentClient caches its system per path; drop it before the store is copied
+        existing.clear_system_cache()
+        other = next((b for b in built if b != provider.signature), None)
+        if other:
+            # Vectors from two models cannot share an index
+            print(f"Index was built with {other['embedding_provider']}/{other['embedding_model']} "
+                  f"({other['embedding_dim']} dims), not {provider.name}/{provider.model} ({provider.dim} dims); "
+                  f"rebuilding in full")
+            incremental = False
+
+    lexical = LexicalIndex()
+    if not incremental:
+        lexical.reset()
+    lexical_assets = lexical.asset_ids()
+
+    session = SessionLocal()
+    try:
+        if not incremental:
+            clear_kind(session, "asset")
+        manifest = get_entries(session, "asset")
+        owners = load_submission_owners(session)
+        asset_plays = load_asset_plays(session)
+        assets = session.query(Asset).all()
+        print(f"Processing {len(assets)} assets...")
+
+        records, stale_chunks, changed, skipped = [], [], {}, 0
+        for asset in assets:
+            file_path = ASSETS_DIR / asset.file_name
+            if not file_path.exists():
+                print(f"  Skipping {asset.file_name} (file not found)")
+                continue
+            owner = owners.get(asset.id)
+            play_ids = [] if owner else asset_plays.get(asset.id, [])
+            fingerprint = {
+                "file_hash": file_hash(file_path),
+                "checksum": asset_checksum(asset, owner or ("", ""), play_ids),
+                "chunker_version": CHUNKER_VERSION,
+            }
+            entry = manifest.get(asset.id)
+            # An entry with no chunks is indexed too: the asset simply produced none
+            if entry and all(getattr(entry, k) == v for k, v in fingerprint.items()) and \
+                    (asset.id in lexical_assets or not entry_chunk_ids(entry)):
+                skipped += 1
+                continue
+
+            asset_records = chunk_asset_records(asset, owner, play_ids)
+            new_ids = {r["id"] for r in asset_records}
+            new_collection = asset_records[0]["collection"] if asset_records else None
+            if entry:
+                stale_chunks += [(entry.collection, cid) for cid in entry_chunk_ids(entry)
+                                 if cid not in new_ids or entry.collection != new_collection]
+            records += asset_records
+            changed[asset.id] = (fingerprint, asset_records)
+            print(f"  Chunked {asset.file_name}: {len(asset_records)} chunks")
+
+        # Assets that disappeared from the DB or from disk
+        present = {a.id for a in assets if (ASSETS_DIR / a.file_name).exists()}
+        removed = [asset_id for asset_id in manifest if asset_id not in present]
+        for asset_id in removed:
+            entry = manifest[asset_id]
+            stale_chunks += [(entry.collection, cid) for cid in entry_chunk_ids(entry)]
+            session.delete(entry)
+
+        # A run that writes and deletes nothing keeps the current generation so running services do not reopen
+        # the index; any other run works on a copy of the published store (or a fresh one)
+        unchanged = incremental and not records and not stale_chunks
+        if not unchanged and incremental and (source / "chroma.sqlite3").exists():
+            shutil.copytree(source, target, ignore=lambda d, names: [n for n in names if n.isdigit()]
+                            if Path(d) == source else [])
+        chroma = None if unchanged else chromadb.PersistentClient(path=str(target))
+
+        for col_name in {name for name, _ in stale_chunks if name}:
+            ids = [cid for name, cid in stale_chunks if name == col_name]
+            try:
+                chroma.get_collection(col_name).delete(ids=ids)
+            except ValueError:
+                pass
+
+        writer = BulkWriter(chroma)
+        cache = EmbeddingCache() if provider.cacheable else None
+        try:
+            embed_records(records, writer, cache)
+            cache_stats = cache.stats() if cache else None
+        finally:
+            if cache:
+                cache.close()
+        lexical.write(records, stale_ids=[cid for _, cid in stale_chunks])
+
+        for asset_id, (fingerprint, asset_records) in changed.items():
+            put_entry(session, "asset", asset_id, **fingerprint,
+                      collection=asset_records[0]["collection"] if asset_records else None,
+                      chunk_ids=[r["id"] for r in asset_records])
+        session.commit()
+    finally:
+        session.close()
+        lexical.close()
 
-        print(f"  Processed {asset.file_name}: {len(ids)} chunks")
+    # Memory-mapped copy for exact search, written for the generation about to be published
+    export_started = time.perf_counter()
+    if unchanged:
+        exported, generation = 0, read_generation()
+    else:
+        changed_collections = set(writer.counts) | {name for name, _ in stale_chunks if name} if incremental else None
+        exported = export_collections(chroma, previous + 1, changed_collections)
+        chroma.clear_system_cache()
+        generation = publish_generation()
+        _prune_stores(previous)
+    export_seconds = time.perf_counter() - export_started
 
-    print(f"\nTotal: {knowledge_count} knowledge chunks, {submission_count} submission chunks")
-    session.close()
+    elapsed = time.perf_counter() - started
+    total = sum(writer.counts.values())
+    if incremental:
+        print(f"\nIncremental: {len(changed)} assets changed, {skipped} unchanged, "
+              f"{len(removed)} removed, {len(stale_chunks)} stale chunks deleted")
+    knowledge_total = sum(n for name, n in writer.counts.items() if name.startswith("knowledge_"))
+    print(f"\nTotal: {knowledge_total} knowledge chunks, {total - knowledge_total} submission chunks "
+          f"across {len(writer.counts)} collections")
+    print(f"Embeddings: {provider.name}/{provider.model} ({provider.dim} dims); "
+          f"exact-search matrices written for {exported} collections in {export_seconds:.1f}s")
+    if cache_stats:
+        print(f"Embedding cache: {cache_stats['hits']} hits, {cache_stats['misses']} misses "
+              f"({cache_stats['hit_rate']:.0%}), {cache_stats['evictions']} evicted, {cache_stats['entries']} entries")
+    print(f"Ingested {total} chunks in {elapsed:.1f}s ({total / elapsed if elapsed else 0:.1f} chunks/sec)")
+    print(f"Index unchanged, kept generation {generation}" if unchanged else f"Published index generation {generation}")
     print("Ingestion complete!")
 
 
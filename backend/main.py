@@ -1,20 +1,49 @@
 import json
+import time
+from contextlib import asynccontextmanager
 from fastapi import FastAPI, HTTPException
+from fastapi.responses import PlainTextResponse, StreamingResponse
 from fastapi.middleware.cors import CORSMiddleware
 from pydantic import BaseModel
 from sse_starlette.sse import EventSourceResponse
 
+from config import SPECULATIVE_RETRIEVAL, BATCH_MAX_QUERIES, BATCH_ANSWER_CONCURRENCY
 from database.models import SessionLocal, Company, User, Play, PlayAssignment
-from services.auth import get_user
+from database.migrations import migrate
+from services.auth import get_user, get_user_accessible_asset_ids
 from services.streaming import sse_event
-from search.router import classify_intent
+from services.executor import run_blocking
+from services.embeddings import request_scope, embedding_service
+from services.metrics import (
+    metrics, stage, record_stage, timing_scope, current_timer, StageTimer, request_seconds, intents_total,
+)
+from search.router import classify_intent, fast_router
 from search.knowledge import search_knowledge, generate_knowledge_answer
 from search.history import search_history, generate_history_answer
+from search.speculation import SpeculativeRetrieval
+from search.batch import batch_search
+from search.answer_cache import answer_cache, access_scope
 from search.fallback import generate_fallback_answer, DISCLAIMER
-from search.guardrails import OUT_OF_SCOPE_MESSAGE, NO_RESULTS_MESSAGE
+from search.guardrails import OUT_OF_SCOPE_MESSAGE, NO_RESULTS_MESSAGE, HISTORY_NO_RESULTS_MESSAGE
 from services.recommendations import get_recommendations
+from services.vector_store import vector_store
+from services.exact_index import exact_index
+from services.access_index import access_index
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Bring an existing database's indexes up to date, then open Chroma and load the
+    # HNSW indexes (and the exact-search matrices) once, before the first request pays for it
+    migrate()
+    vector_store.warm_up()
+    exact_index.warm_up()
+    access_index.refresh(force=True)
+    fast_router.load_products()
+    yield
 
-app = FastAPI(title="BigSpring Knowledge Search Agent")
+
+app = FastAPI(title="BigSpring Knowledge Search Agent", lifespan=lifespan)
 
 app.add_middleware(
     CORSMiddleware,
@@ -54,15 +83,17 @@ def get_user_detail(user_id: str):
         session.close()
         raise HTTPException(status_code=404, detail="User not found")
 
-    assignments = session.query(PlayAssignment).filter(PlayAssignment.user_id == user_id).all()
-    plays_info = []
-    for a in assignments:
-        play = session.query(Play).filter(Play.id == a.play_id).first()
-        if play:
-            plays_info.append({
-                "play_id": play.id, "title": play.title,
-                "status": a.status, "assigned_date": a.assigned_date,
-            })
+    # Assignments joined to their plays in one query (an assignment whose play is gone is skipped)
+    rows = (
+        session.query(Play.id, Play.title, PlayAssignment.status, PlayAssignment.assigned_date)
+        .join(Play, Play.id == PlayAssignment.play_id)
+        .filter(PlayAssignment.user_id == user_id)
+        .all()
+    )
+    plays_info = [
+        {"play_id": play_id, "title": title, "status": status, "assigned_date": assigned_date}
+        for play_id, title, status, assigned_date in rows
+    ]
 
     result = {
         "id": user.id, "username": user.username, "display_name": user.display_name,
@@ -73,98 +104,239 @@ def get_user_detail(user_id: str):
     return result
 
 
-class SearchRequest(BaseModel):
-    user_id: str
-    query: str
+@app.get("/api/answer-cache")
+def answer_cache_metrics():
+    return answer_cache.metrics()
 
 
-@app.post("/api/search")
-async def search(request: SearchRequest):
-    user = get_user(request.user_id)
-    if not user:
-        raise HTTPException(status_code=404, detail="User not found")
+@metrics.collector
+def _cache_metrics():
+    return [
+        ("search_answer_cache_total", "counter", "Answer cache lookups by outcome.",
+         [({"result": k}, answer_cache.stats[k]) for k in ("exact_hits", "semantic_hits", "misses")]),
+        ("query_embedding_lookups_total", "counter", "Query embeddings by where they were found.",
+         [({"source": k}, v) for k, v in embedding_service.stats.items()]),
+    ]
 
-    async def event_generator():
-        query = request.query
-        company_id = user["company_id"]
-        user_id = user["id"]
 
-        # Step 1: Classify intent
-        intent_result = classify_intent(query)
-        intent = intent_result["intent"]
-        reasoning = intent_result["reasoning"]
+@app.get("/metrics")
+def prometheus_metrics():
+    return PlainTextResponse(metrics.render(), media_type="text/plain; version=0.0.4")
 
-        yield sse_event("intent", {"intent": intent, "reasoning": reasoning})
 
-        # Step 2: Handle based on intent
-        if intent == "OUT_OF_SCOPE":
-            yield sse_event("answer_chunk", {"text": OUT_OF_SCOPE_MESSAGE})
-            yield sse_event("done", {"status": "complete"})
-            return
+class SearchRequest(BaseModel):
+    user_id: str
+    query: str
+    # Emit a `timing` event with per-stage milliseconds before `done`
+    timing: bool = False
+
+
+async def search_events(query: str, user: dict):
+    company_id = user["company_id"]
+    user_id = user["id"]
+
+    # Retrieval for both search intents starts now, overlapping the classifier round trip
+    speculation = SpeculativeRetrieval(query, user_id, company_id) if SPECULATIVE_RETRIEVAL else None
+    try:
+        async for event in _search_events(query, user_id, company_id, speculation):
+            yield event
+    finally:
+        if speculation:
+            speculation.discard()
+
+
+async def _retrieve(branch: str, speculation, classify_ms: float, search_fn, *args):
+    with stage("retrieve"):
+        if speculation is None:
+            return await search_fn(*args), None
+        result = await speculation.take(branch)
+    return result, speculation.report(classify_ms)
+
+
+async def _answer_events(answer, chunks: list[str] = None):
+    """Stream a chat completion as `answer_chunk` events, timing first token and the whole answer."""
+    chunks = [] if chunks is None else chunks
+    started = time.perf_counter()
+    with stage("llm", upstream="openai"):
+        stream = await answer
+        async for chunk in stream:
+            if chunk.choices and chunk.choices[0].delta.content:
+                if not chunks:
+                    record_stage("llm_ttft", time.perf_counter() - started)
+                chunks.append(chunk.choices[0].delta.content)
+                yield sse_event("answer_chunk", {"text": chunk.choices[0].delta.content})
 
-        if intent == "GENERAL_PROFESSIONAL":
-            yield sse_event("answer_chunk", {"text": DISCLAIMER})
-            stream = generate_fallback_answer(query)
-            for chunk in stream:
-                if chunk.choices and chunk.choices[0].delta.content:
-                    yield sse_event("answer_chunk", {"text": chunk.choices[0].delta.content})
-            yield sse_event("done", {"status": "complete"})
-            return
 
-        if intent == "HISTORY_SEARCH":
-            result = search_history(query, user_id, company_id)
-            if result["no_results"]:
-                yield sse_event("answer_chunk", {
-                    "text": "I couldn't find any matching content in your practice submissions. "
-                    "Make sure you've completed practice reps with submissions to search through."
-                })
-                yield sse_event("done", {"status": "complete"})
-                return
-
-            yield sse_event("citations", {"citations": result["citations"]})
-
-            stream = generate_history_answer(query, result["context"], result["citations"])
-            for chunk in stream:
-                if chunk.choices and chunk.choices[0].delta.content:
-                    yield sse_event("answer_chunk", {"text": chunk.choices[0].delta.content})
-
-            # Get recommendations
-            try:
-                recs = get_recommendations(query, user_id, company_id)
-                if recs:
-                    yield sse_event("recommendations", {"recommendations": recs})
-            except Exception:
-                pass
+async def _replay_cached(cached: dict):
+    yield sse_event("cache", {"hit": cached["hit"], "similarity": cached["similarity"]})
+    yield sse_event("citations", {"citations": cached["citations"]})
+    for text in cached["chunks"]:
+        yield sse_event("answer_chunk", {"text": text})
+    yield sse_event("recommendations", {"recommendations": cached["recommendations"]})
+    yield sse_event("done", {"status": "complete"})
+
+
+async def _search_events(query: str, user_id: str, company_id: str, speculation):
+    # Step 1: Classify intent
+    started = time.perf_counter()
+    with stage("classify", upstream="openai"):
+        intent_result = await classify_intent(query)
+    classify_ms = round((time.perf_counter() - started) * 1000, 1)
+    intent = intent_result["intent"]
+    reasoning = intent_result["reasoning"]
+    intents_total.inc(intent=intent, classifier=intent_result["classifier"])
+    timer = current_timer()
+    if timer:
+        timer.intent = intent
+
+    yield sse_event("intent", {"intent": intent, "reasoning": reasoning, "classifier": intent_result["classifier"]})
+
+    # Step 2: Handle based on intent
+    if intent in ("OUT_OF_SCOPE", "GENERAL_PROFESSIONAL") and speculation:
+        speculation.discard()
+        yield sse_event("speculation", speculation.report(classify_ms))
+
+    if intent == "OUT_OF_SCOPE":
+        yield sse_event("answer_chunk", {"text": OUT_OF_SCOPE_MESSAGE})
+        yield sse_event("done", {"status": "complete"})
+        return
 
-            yield sse_event("done", {"status": "complete"})
-            return
+    if intent == "GENERAL_PROFESSIONAL":
+        yield sse_event("answer_chunk", {"text": DISCLAIMER})
+        async for event in _answer_events(generate_fallback_answer(query)):
+            yield event
+        yield sse_event("done", {"status": "complete"})
+        return
 
-        # KNOWLEDGE_SEARCH (default)
-        result = search_knowledge(query, user_id, company_id)
+    if intent == "HISTORY_SEARCH":
+        result, timings = await _retrieve("history", speculation, classify_ms, search_history, query, user_id, company_id)
+        if timings:
+            yield sse_event("speculation", timings)
         if result["no_results"]:
-            yield sse_event("answer_chunk", {"text": NO_RESULTS_MESSAGE})
+            yield sse_event("answer_chunk", {"text": HISTORY_NO_RESULTS_MESSAGE})
             yield sse_event("done", {"status": "complete"})
             return
 
+        yield sse_event("context", result["context_stats"])
         yield sse_event("citations", {"citations": result["citations"]})
 
-        stream = generate_knowledge_answer(query, result["context"], result["citations"])
-        for chunk in stream:
-            if chunk.choices and chunk.choices[0].delta.content:
-                yield sse_event("answer_chunk", {"text": chunk.choices[0].delta.content})
+        async for event in _answer_events(generate_history_answer(query, result["context"], result["citations"])):
+            yield event
 
-        # Get recommendations (excluding already-cited assets)
+        # Get recommendations
         try:
-            cited_assets = {c.get("source_file", "").replace(".json", "") for c in result["citations"]}
-            recs = get_recommendations(query, user_id, company_id)
+            with stage("recommendations", upstream="openai"):
+                recs = await get_recommendations(query, user_id, company_id)
             if recs:
                 yield sse_event("recommendations", {"recommendations": recs})
         except Exception:
             pass
 
         yield sse_event("done", {"status": "complete"})
+        return
+
+    # KNOWLEDGE_SEARCH (default)
+    # Answers are shared between users with the same accessible set; exact text first, then by embedding
+    with stage("cache"):
+        # The access index may re-check SQLite (and rebuild) on lookup; keep that off the event loop
+        scope = access_scope(await run_blocking(get_user_accessible_asset_ids, user_id))
+        cached = answer_cache.lookup_exact(company_id, scope, query)
+    if cached:
+        if speculation:
+            speculation.discard()
+            yield sse_event("speculation", speculation.report(classify_ms))
+        async for event in _replay_cached(cached):
+            yield event
+        return
+
+    result, timings = await _retrieve("knowledge", speculation, classify_ms, search_knowledge, query, user_id, company_id)
+    if timings:
+        yield sse_event("speculation", timings)
+    if result.get("retrieval"):
+        yield sse_event("retrieval", result["retrieval"])
+    # The lexical fast path returns no query embedding, so there is nothing to compare semantically
+    query_embedding = result.get("query_embedding")
+    with stage("cache"):
+        cached = answer_cache.lookup_similar(company_id, scope, query_embedding)
+    if cached:
+        async for event in _replay_cached(cached):
+            yield event
+        return
+
+    if result["no_results"]:
+        yield sse_event("answer_chunk", {"text": NO_RESULTS_MESSAGE})
+        yield sse_event("done", {"status": "complete"})
+        return
+
+    yield sse_event("context", result["context_stats"])
+    yield sse_event("citations", {"citations": result["citations"]})
+
+    chunks = []
+    async for event in _answer_events(generate_knowledge_answer(query, result["context"], result["citations"]), chunks):
+        yield event
+
+    # Recommendations were derived from the same retrieval, excluding already-cited assets (empty when none
+    # could be built)
+    yield sse_event("recommendations", {"recommendations": result["recommendations"]})
+
+    if chunks:
+        answer_cache.store(company_id, scope, query, query_embedding, result["citations"], chunks, result["recommendations"])
+    yield sse_event("done", {"status": "complete"})
+
 
-    return EventSourceResponse(event_generator())
+@app.post("/api/search")
+async def search(request: SearchRequest):
+    timer = StageTimer()
+    with timing_scope(timer), stage("user"):
+        user = await get_user(request.user_id)
+    if not user:
+        raise HTTPException(status_code=404, detail="User not found")
+
+    async def event_generator():
+        # One embedding per query per request, however many retrieval steps need it
+        with request_scope(), timing_scope(timer):
+            async for event in search_events(request.query, user):
+                if event["event"] == "done" and request.timing:
+                    yield sse_event("timing", {**timer.report(), "server_timing": timer.server_timing()})
+                yield event
+        request_seconds.observe(time.perf_counter() - timer.started, intent=timer.intent)
+
+    # Headers leave before the stream starts, so they only carry the stages run so far;
+    # the `timing` event has the full breakdown
+    return EventSourceResponse(event_generator(), headers={"Server-Timing": timer.server_timing()})
+
+
+class BatchQuery(BaseModel):
+    user_id: str
+    query: str
+    # Echoed back with the result, since with answers results arrive in completion order
+    id: str | None = None
+
+
+class BatchSearchRequest(BaseModel):
+    queries: list[BatchQuery]
+    # Generate an answer per query, at most `concurrency` (capped at BATCH_ANSWER_CONCURRENCY) at once
+    answers: bool = False
+    concurrency: int = BATCH_ANSWER_CONCURRENCY
+
+
+@app.post("/api/search/batch")
+async def search_batch(request: BatchSearchRequest):
+    """Many (user_id, query) pairs in one request, streamed back as NDJSON: one result per line, then a summary."""
+    if len(request.queries) > BATCH_MAX_QUERIES:
+        raise HTTPException(status_code=413, detail=f"At most {BATCH_MAX_QUERIES} queries per batch")
+    timer = StageTimer()
+    timer.intent = "BATCH"
+    items = [q.model_dump() for q in request.queries]
+    concurrency = min(request.concurrency, BATCH_ANSWER_CONCURRENCY)
+
+    async def lines():
+        with request_scope(), timing_scope(timer):
+            async for result in batch_search(items, request.answers, concurrency):
+                yield json.dumps(result) + "\n"
+        request_seconds.observe(time.perf_counter() - timer.started, intent=timer.intent)
+
+    return StreamingResponse(lines(), media_type="application/x-ndjson")
 
 
 if __name__ == "__main__":
@@ -1,25 +1,34 @@
 #!/usr/bin/env python3
-"""Run data loading and vector ingestion pipeline."""
+"""Run data loading and vector ingestion pipeline.
+
+Pass --incremental to apply row-level diffs to SQLite and only re-embed
+assets that changed since the last run, instead of a full rebuild.
+"""
 import sys
 
-from config import OPENAI_API_KEY
+from config import OPENAI_API_KEY, EMBEDDING_PROVIDER
 
-if not OPENAI_API_KEY or OPENAI_API_KEY == "your-openai-api-key-here":
+if EMBEDDING_PROVIDER == "openai" and (not OPENAI_API_KEY or OPENAI_API_KEY == "your-openai-api-key-here"):
     print("ERROR: Please set OPENAI_API_KEY in backend/.env file before running ingestion.")
     print("Edit backend/.env and replace 'your-openai-api-key-here' with your actual key.")
     sys.exit(1)
 
+incremental = "--incremental" in sys.argv[1:]
+
 print("=" * 60)
 print("BigSpring Knowledge Search - Data Ingestion Pipeline")
 print("=" * 60)
 
 print("\nStep 1: Loading CSV/JSON data into SQLite...")
-from database.init_db import load_all
-load_all()
+from database.init_db import load_all, sync_all
+if incremental:
+    sync_all()
+else:
+    load_all()
 
 print("\nStep 2: Ingesting assets into ChromaDB with embeddings...")
 from ingestion.ingest import run_ingestion
-run_ingestion()
+run_ingestion(incremental=incremental)
 
 print("\n" + "=" * 60)
 print("Ingestion complete! You can now start the servers:")
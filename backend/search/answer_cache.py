@@ -0,0 +1,132 @@
+import hashlib
+import re
+import threading
+import time
+from collections import Counter, OrderedDict
+import numpy as np
+from config import ANSWER_CACHE_SIZE, ANSWER_CACHE_TTL_SECONDS, ANSWER_CACHE_SIMILARITY
+from services.vector_store import vector_store
+
+PUNCTUATION_RE = re.compile(r"[^\w\s]")
+WHITESPACE_RE = re.compile(r"\s+")
+
+
+def normalize_query(query: str) -> str:
+    return WHITESPACE_RE.sub(" ", PUNCTUATION_RE.sub(" ", query.lower())).strip()
+
+
+def access_scope(asset_ids) -> str:
+    """Stable id for an accessible asset set; users with the same plays share cached answers."""
+    return hashlib.sha1("|".join(sorted(asset_ids)).encode()).hexdigest()[:16]
+
+
+class AnswerCache:
+    """Completed knowledge answers (citations, streamed chunks, recommendations).
+
+    Entries are scoped by company and the hash of the user's accessible asset
+    set, so a hit can only replay sources the user may already read. Within a
+    scope a query hits on its normalized text, or on a cached query whose
+    embedding has cosine similarity of at least `similarity`. Bounded LRU
+    with TTL; everything is dropped when ingestion publishes a new index
+    generation.
+    """
+
+    def __init__(self, max_entries: int = ANSWER_CACHE_SIZE, ttl_seconds: float = ANSWER_CACHE_TTL_SECONDS,
+                 similarity: float = ANSWER_CACHE_SIMILARITY):
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self.similarity = similarity
+        self.lock = threading.Lock()
+        self.entries: OrderedDict[tuple[str, str, str], dict] = OrderedDict()
+        self.scopes: dict[tuple[str, str], set[tuple[str, str, str]]] = {}
+        self.generation = None
+        self.stats = Counter()
+
+    def _check_generation(self):
+        generation = vector_store.current_generation()
+        if generation != self.generation:
+            if self.entries:
+                self.stats["invalidations"] += 1
+            self.entries.clear()
+            self.scopes.clear()
+            self.generation = generation
+
+    def _expired(self, entry: dict) -> bool:
+        return bool(self.ttl_seconds) and time.monotonic() - entry["stored_at"] > self.ttl_seconds
+
+    def _remove(self, key: tuple[str, str, str]):
+        self.entries.pop(key, None)
+        scope_keys = self.scopes.get(key[:2])
+        if scope_keys is not None:
+            scope_keys.discard(key)
+            if not scope_keys:
+                del self.scopes[key[:2]]
+
+    def lookup_exact(self, company_id: str, scope: str, query: str) -> dict | None:
+        with self.lock:
+            self._check_generation()
+            self.stats["lookups"] += 1
+            key = (company_id, scope, normalize_query(query))
+            entry = self.entries.get(key)
+            if entry is not None and self._expired(entry):
+                self._remove(key)
+                entry = None
+            if entry is None:
+                return None
+            self.entries.move_to_end(key)
+            self.stats["exact_hits"] += 1
+            return {**entry, "hit": "exact", "similarity": 1.0}
+
+    def lookup_similar(self, company_id: str, scope: str, embedding: list[float] | None) -> dict | None:
+        """Second stage after a `lookup_exact` miss; counts the miss if nothing is close enough (or no embedding)."""
+        with self.lock:
+            keys = [k for k in self.scopes.get((company_id, scope), ()) if not self._expired(self.entries[k])]
+            if embedding is None:
+                keys = []
+            best_key, best = None, -1.0
+            if keys:
+                matrix = np.asarray([self.entries[k]["embedding"] for k in keys], dtype=np.float32)
+                query = np.asarray(embedding, dtype=np.float32)
+                sims = matrix @ query / (np.linalg.norm(matrix, axis=1) * np.linalg.norm(query) + 1e-12)
+                i = int(np.argmax(sims))
+                best_key, best = keys[i], float(sims[i])
+            if best_key is None or best < self.similarity:
+                self.stats["misses"] += 1
+                return None
+            self.entries.move_to_end(best_key)
+            self.stats["semantic_hits"] += 1
+            return {**self.entries[best_key], "hit": "semantic", "similarity": round(best, 4)}
+
+    def store(self, company_id: str, scope: str, query: str, embedding: list[float] | None,
+              citations: list[dict], chunks: list[str], recommendations: list[dict]):
+        if not self.max_entries:
+            return
+        with self.lock:
+            self._check_generation()
+            key = (company_id, scope, normalize_query(query))
+            self.entries[key] = {
+                "query": query, "embedding": embedding, "citations": citations,
+                "chunks": chunks, "recommendations": recommendations, "stored_at": time.monotonic(),
+            }
+            self.entries.move_to_end(key)
+            if embedding is not None:
+                self.scopes.setdefault(key[:2], set()).add(key)
+            else:
+                self.scopes.get(key[:2], set()).discard(key)
+            self.stats["stores"] += 1
+            while len(self.entries) > self.max_entries:
+                self._remove(next(iter(self.entries)))
+
+    def metrics(self) -> dict:
+        with self.lock:
+            hits = self.stats["exact_hits"] + self.stats["semantic_hits"]
+            lookups = self.stats["lookups"]
+            return {
+                **{k: self.stats[k] for k in ("lookups", "exact_hits", "semantic_hits", "misses", "stores", "invalidations")},
+                "hit_rate": round(hits / lookups, 4) if lookups else 0.0,
+                "entries": len(self.entries),
+                "generation": self.generation,
+            }
+
+
+answer_cache = AnswerCache()
@@ -0,0 +1,205 @@
+import asyncio
+import json
+from collections import Counter
+from config import BATCH_ANSWER_CONCURRENCY
+from services.auth import get_users, get_user_accessible_asset_ids
+from services.embeddings import embedding_service
+from services.executor import run_blocking
+from services.exact_index import query_collection_many
+from services.metrics import stage, current_timer, intents_total
+from search.router import classify_intents
+from search.knowledge import plan_knowledge, finish_knowledge, generate_knowledge_answer
+from search.history import plan_history, finish_history, generate_history_answer
+from search.fallback import generate_fallback_answer, DISCLAIMER
+from search.guardrails import OUT_OF_SCOPE_MESSAGE, NO_RESULTS_MESSAGE, HISTORY_NO_RESULTS_MESSAGE
+from search.answer_cache import answer_cache, access_scope
+
+RESULT_FIELDS = ("ids", "documents", "metadatas", "distances")
+
+
+def _row(results: dict, j: int) -> dict:
+    """Query `j` of a multi-query result, shaped like a single-query result."""
+    return {field: [results[field][j]] for field in RESULT_FIELDS if results.get(field) is not None}
+
+
+def _error(exc: Exception) -> str:
+    return f"{type(exc).__name__}: {exc}"
+
+
+async def _vector_search(plans: dict[int, dict], embeddings: dict[int, list[float]]) -> tuple[dict, int]:
+    """One `query_collection_many` call per collection and filter, shared by every query under them.
+
+    A failed call is returned as the exception for each of its queries.
+    """
+    groups: dict[tuple, list[int]] = {}
+    for i, plan in plans.items():
+        vector = plan["vector"]
+        key = (plan["name"], frozenset(vector["asset_ids"]), json.dumps(vector["where"], sort_keys=True))
+        groups.setdefault(key, []).append(i)
+
+    async def run(indices: list[int]) -> dict:
+        plan = plans[indices[0]]
+        results, engine = await run_blocking(
+            query_collection_many, plan["collection"], plan["name"], [embeddings[i] for i in indices], **plan["vector"])
+        return {i: (_row(results, j), engine) for j, i in enumerate(indices)}
+
+    with stage("vector", upstream="chroma"):
+        found = await asyncio.gather(*(run(indices) for indices in groups.values()), return_exceptions=True)
+    return {i: (part[i] if not isinstance(part, Exception) else part) for indices, part in zip(groups.values(), found)
+            for i in indices}, len(groups)
+
+
+async def _collect(answer) -> list[str]:
+    """A streamed chat completion's text chunks."""
+    chunks = []
+    with stage("llm", upstream="openai"):
+        stream = await answer
+        async for chunk in stream:
+            if chunk.choices and chunk.choices[0].delta.content:
+                chunks.append(chunk.choices[0].delta.content)
+    return chunks
+
+
+async def _answer(query: str, user: dict, intent: str, searched: dict | None) -> tuple[str, bool]:
+    """The answer `/api/search` would stream for this query, and whether it came from the answer cache."""
+    if intent == "OUT_OF_SCOPE":
+        return OUT_OF_SCOPE_MESSAGE, False
+    if intent == "GENERAL_PROFESSIONAL":
+        return DISCLAIMER + "".join(await _collect(generate_fallback_answer(query))), False
+    if searched["no_results"]:
+        return (HISTORY_NO_RESULTS_MESSAGE if intent == "HISTORY_SEARCH" else NO_RESULTS_MESSAGE), False
+    if intent == "HISTORY_SEARCH":
+        return "".join(await _collect(generate_history_answer(query, searched["context"], searched["citations"]))), False
+
+    company_id = user["company_id"]
+    with stage("cache"):
+        scope = access_scope(await run_blocking(get_user_accessible_asset_ids, user["id"]))
+        cached = (answer_cache.lookup_exact(company_id, scope, query)
+                  or answer_cache.lookup_similar(company_id, scope, searched.get("query_embedding")))
+    if cached:
+        return "".join(cached["chunks"]), True
+    chunks = await _collect(generate_knowledge_answer(query, searched["context"], searched["citations"]))
+    if chunks:
+        answer_cache.store(company_id, scope, query, searched.get("query_embedding"), searched["citations"], chunks,
+                           searched["recommendations"])
+    return "".join(chunks), False
+
+
+async def batch_search(items: list[dict], answers: bool = False, concurrency: int = BATCH_ANSWER_CONCURRENCY):
+    """Search many `{"user_id", "query", "id"}` items, yielding one result per item and then a summary.
+
+    Each stage runs once for the whole batch: one user lookup, intent
+    classification in batches, one multi-input embedding call for every query
+    that needs a vector, and one multi-query vector call per collection and
+    access filter (users with the same plays share one). Without `answers`,
+    results come in input order once retrieval is done; with it, answers are
+    generated `concurrency` at a time and each result is yielded as its answer
+    completes. A failing item is reported in its result and does not stop the batch.
+    """
+    results = [{"index": i, "id": item.get("id"), "user_id": item["user_id"], "query": item["query"]}
+               for i, item in enumerate(items)]
+    with stage("user"):
+        try:
+            users, missing = await get_users(item["user_id"] for item in items), "User not found"
+        except Exception as exc:
+            users, missing = {}, _error(exc)
+    known = [i for i, item in enumerate(items) if item["user_id"] in users]
+    for i in set(range(len(items))) - set(known):
+        results[i]["error"] = missing
+
+    with stage("classify", upstream="openai"):
+        intents = await classify_intents([items[i]["query"] for i in known])
+    for i, intent in zip(known, intents):
+        if isinstance(intent, Exception):
+            results[i]["error"] = _error(intent)
+            continue
+        results[i].update(intent)
+        intents_total.inc(intent=intent["intent"], classifier=intent["classifier"])
+    known = [i for i in known if "error" not in results[i]]
+
+    def plan(i: int):
+        user = users[items[i]["user_id"]]
+        if results[i]["intent"] == "HISTORY_SEARCH":
+            return plan_history(user["id"], user["company_id"])
+        return plan_knowledge(items[i]["query"], user["id"], user["company_id"])
+
+    searching = [i for i in known if results[i]["intent"] in ("KNOWLEDGE_SEARCH", "HISTORY_SEARCH")]
+    plans = {}
+    for i, planned in zip(searching, await asyncio.gather(*(plan(i) for i in searching), return_exceptions=True)):
+        if isinstance(planned, Exception):
+            results[i]["error"] = _error(planned)
+        else:
+            plans[i] = planned
+
+    # Only queries the lexical fast path cannot serve are embedded, all in one request
+    vector_plans = {i: p for i, p in plans.items() if p["result"] is None and p["vector"] is not None}
+    embeddings, found, vector_calls = {}, {}, 0
+    if vector_plans:
+        try:
+            vectors = await embedding_service.aembed_many([items[i]["query"] for i in vector_plans])
+        except Exception as exc:
+            for i in vector_plans:
+                results[i]["error"] = _error(exc)
+        else:
+            embeddings = dict(zip(vector_plans, vectors))
+            found, vector_calls = await _vector_search(vector_plans, embeddings)
+            for i, hit in found.items():
+                if isinstance(hit, Exception):
+                    results[i]["error"] = _error(hit)
+
+    async def finish(i: int) -> dict:
+        planned = plans[i]
+        if planned["result"] is not None:
+            return planned["result"]
+        if results[i]["intent"] == "HISTORY_SEARCH":
+            return finish_history(planned, found[i][0])
+        vector_results, engine = found.get(i, (None, None))
+        return await finish_knowledge(planned, embeddings.get(i), vector_results, engine)
+
+    searched, finishing = {}, [i for i in plans if "error" not in results[i]]
+    for i, result in zip(finishing, await asyncio.gather(*(finish(i) for i in finishing), return_exceptions=True)):
+        if isinstance(result, Exception):
+            results[i]["error"] = _error(result)
+            continue
+        searched[i] = result
+        results[i].update(no_results=result["no_results"], citations=result["citations"])
+        for key in ("retrieval", "recommendations"):
+            if result.get(key) is not None:
+                results[i][key] = result[key]
+
+    summary = {
+        "done": True, "queries": len(items), "intents": dict(Counter(results[i]["intent"] for i in known)),
+        "classifier": dict(Counter(results[i]["classifier"] for i in known)),
+        "embedded": len(vector_plans), "vector_calls": vector_calls,
+    }
+    if not answers:
+        for result in results:
+            yield result
+    else:
+        limit = asyncio.Semaphore(max(1, concurrency))
+
+        async def answer(i: int) -> dict:
+            result = results[i]
+            if "error" not in result:
+                async with limit:
+                    try:
+                        result["answer"], result["answer_cached"] = await _answer(
+                            items[i]["query"], users[items[i]["user_id"]], result["intent"], searched.get(i))
+                    except Exception as exc:
+                        result["error"] = _error(exc)
+            return result
+
+        tasks = [asyncio.create_task(answer(i)) for i in range(len(items))]
+        try:
+            for task in asyncio.as_completed(tasks):
+                yield await task
+        finally:
+            # The client went away: stop generating answers nobody will read
+            for task in tasks:
+                task.cancel()
+
+    summary["errors"] = sum("error" in result for result in results)
+    timer = current_timer()
+    if timer:
+        summary["timing"] = timer.report()
+    yield summary
@@ -0,0 +1,132 @@
+import re
+from config import CONTEXT_MAX_TOKENS, CONTEXT_MIN_BLOCK_TOKENS
+from ingestion.chunker import SENTENCE_RE, estimate_tokens, split_text
+
+SEPARATOR = "\n\n---\n\n"
+# Units this short (table headers, titles, speaker turns like "Yes.") are never dropped as repeats
+MIN_UNIT_WORDS = 5
+
+
+def _normalize(text: str) -> str:
+    return re.sub(r"\s+", " ", text).strip().lower()
+
+
+def _units(text: str) -> list[list[str]]:
+    """Lines of `text`, each split into sentences."""
+    return [SENTENCE_RE.split(line) for line in text.split("\n")]
+
+
+def _seconds(timestamp: str | None) -> float | None:
+    """A "1:02:03", "09:30" or "45" timestamp in seconds; None when missing or unparseable."""
+    try:
+        return sum(float(part) * 60 ** i for i, part in enumerate(reversed(timestamp.split(":"))))
+    except (AttributeError, ValueError):
+        return None
+
+
+def _same_region(a: dict, b: dict) -> bool:
+    """Whether two chunks can overlap: same asset, and the same page or intersecting time ranges.
+
+    A chunk without a page or time range (a whole transcript, an image description)
+    covers its whole asset.
+    """
+    if a.get("asset_id") != b.get("asset_id"):
+        return False
+    if a.get("page") and b.get("page"):
+        return a["page"] == b["page"]
+    start_a, start_b = _seconds(a.get("start")), _seconds(b.get("start"))
+    if start_a is not None and start_b is not None:
+        end_a, end_b = _seconds(a.get("end")), _seconds(b.get("end"))
+        return start_a <= (start_b if end_b is None else end_b) and start_b <= (start_a if end_a is None else end_a)
+    return True
+
+
+def _label(kind: str, index: int, item: dict) -> str:
+    meta = item["meta"]
+    label = f"[{kind} {index}: {item['title']}"
+    if meta.get("page"):
+        label += f", Page {meta['page']}"
+    if meta.get("start"):
+        label += f", {meta['start']}-{meta.get('end', '')}"
+    return label + "]"
+
+
+def _block(kind: str, index: int, item: dict, text: str) -> str:
+    return f"{_label(kind, index, item)}\n{text}{item.get('note', '')}"
+
+
+def pack_context(items: list[dict], kind: str = "Source", max_tokens: int = CONTEXT_MAX_TOKENS):
+    """Build the answer context from ranked chunks, without repeats and within `max_tokens`.
+
+    `items` are best-first dicts with `text`, `meta` (chunk metadata), `title`
+    (source name for the label), `citation` and an optional `note` appended to
+    the block. A chunk whose sentences all appear in a higher-ranked chunk of the
+    same asset and page / time range is dropped; one that only partly repeats
+    them (overlapping chunker windows, a full transcript next to its segments)
+    keeps just its new sentences. Table windows are kept whole, so each still
+    carries its title and header row. Blocks are then added in rank order while they
+    fit the budget; a block that does not fit is cut at a sentence boundary if
+    at least CONTEXT_MIN_BLOCK_TOKENS remain. The first block is always kept.
+
+    Returns (context, citations, stats). Kept blocks are numbered 1..N in
+    order and the returned citations carry the same indices, so `[{kind} N]`
+    in the answer always refers to `citations[N - 1]`.
+    """
+    kept, stats = [], {"chunks": len(items), "duplicates": 0, "trimmed": 0, "over_budget": 0, "cut": 0}
+    for item in items:
+        seen = set()
+        for other in kept:
+            if _same_region(item["meta"], other["meta"]):
+                seen |= other["units"]
+        # Table windows repeat the title and header row on purpose; only exact repeats of them are dropped
+        dedupe = item["meta"].get("chunk_type") != "table"
+        lines, units, dropped = [], set(), False
+        for line in _units(item["text"]):
+            fresh = []
+            for sentence in line:
+                key = _normalize(sentence)
+                if dedupe and key in seen and len(key.split()) >= MIN_UNIT_WORDS:
+                    dropped = True
+                    continue
+                fresh.append(sentence)
+                units.add(key)
+            if fresh:
+                lines.append(" ".join(fresh))
+        text = "\n".join(lines).strip()
+        if not any(len(u.split()) >= MIN_UNIT_WORDS for u in units) and dropped:
+            stats["duplicates"] += 1
+            continue
+        # Exact repeats across assets (the same table in two decks) are dropped whatever their location
+        if any(_normalize(text) == _normalize(other["text"]) for other in kept):
+            stats["duplicates"] += 1
+            continue
+        stats["trimmed"] += dropped
+        kept.append({**item, "text": text, "units": units})
+
+    blocks, citations, used = [], [], 0
+    for item in kept:
+        index = len(blocks) + 1
+        block = _block(kind, index, item, item["text"])
+        cost = estimate_tokens(block + SEPARATOR)
+        if blocks and used + cost > max_tokens:
+            # Cut to the first sentence-aligned window that fits the remaining budget
+            overhead = estimate_tokens(_block(kind, index, item, "") + SEPARATOR)
+            remaining = max_tokens - used - overhead
+            if remaining < CONTEXT_MIN_BLOCK_TOKENS:
+                stats["over_budget"] += 1
+                continue
+            block = _block(kind, index, item, split_text(item["text"], remaining, 0)[0])
+            cost = estimate_tokens(block + SEPARATOR)
+            stats["cut"] += 1
+        blocks.append(block)
+        citations.append({"index": index, **item["citation"]})
+        used += cost
+
+    verbatim = SEPARATOR.join(_block(kind, i + 1, item, item["text"]) for i, item in enumerate(items))
+    context = SEPARATOR.join(blocks)
+    stats.update(
+        packed=len(blocks), budget=max_tokens,
+        tokens_before=estimate_tokens(verbatim), tokens=estimate_tokens(context),
+    )
+    stats["tokens_saved"] = stats["tokens_before"] - stats["tokens"]
+    return context, citations, stats
@@ -1,7 +1,7 @@
-from openai import OpenAI
-from config import OPENAI_API_KEY, ANSWER_MODEL
+from openai import AsyncOpenAI
+from config import OPENAI_API_KEY, OPENAI_BASE_URL, ANSWER_MODEL
 
-client = OpenAI(api_key=OPENAI_API_KEY)
+client = AsyncOpenAI(api_key=OPENAI_API_KEY, base_url=OPENAI_BASE_URL)
 
 DISCLAIMER = (
     "**Note:** This response is based on general professional knowledge, "
@@ -9,14 +9,14 @@ DISCLAIMER = (
 )
 
 
-def generate_fallback_answer(query: str):
+async def generate_fallback_answer(query: str):
     system = """You are a helpful professional sales assistant. The user is a sales representative
 asking a general professional question that is NOT about their specific training materials.
 
 Provide a helpful, concise answer based on general sales and professional knowledge.
 Keep it practical and actionable. Do NOT reference any specific company products or training materials."""
 
-    stream = client.chat.completions.create(
+    stream = await client.chat.completions.create(
         model=ANSWER_MODEL,
         messages=[
             {"role": "system", "content": system},
@@ -0,0 +1,150 @@
+import difflib
+import math
+import re
+import threading
+from collections import Counter
+from services.text import tokenize, STOPWORDS
+
+# Someone else's work by name ("Show me Aaron's pitch") is a knowledge query, as the LLM router prompt says
+OTHER_PERSON_RE = re.compile(r"\b([A-Z][a-z]+)'s\s+(?:pitch|pitches|submission|submissions|recording|practice|feedback|score)\b")
+# Unambiguous first-person references to past practice; "my video" or "my reps" just as often mean assigned training
+HISTORY_RES = [
+    re.compile(r"\bmy\s+(?:pitch|pitches|submission|submissions|score|scores|feedback|recording|recordings"
+               r"|attempt|attempts)\b"),
+    re.compile(r"\b(?:when|where|how often|how many times) did i\b"),
+    re.compile(r"\bhow did i (?:do|score|perform)\b"),
+    re.compile(r"\b(?:did|have) i (?:ever )?(?:mention|say|talk|discuss|cover|bring up|explain|pitch)"),
+    re.compile(r"\bwhat (?:feedback |score |scores )?did i (?:say|mention|talk|get)\b"),
+]
+# Wording about the training content itself; with a history cue as well, the query is left to the LLM
+TRAINING_RE = re.compile(r"\b(?:assigned|training|module|modules|course|courses)\b")
+
+INTENT_HEADER_RE = re.compile(r"^\d+\.\s+([A-Z_]+)\s+-", re.MULTILINE)
+EXAMPLE_RE = re.compile(r'^\s+-\s+"(.+)"\s*$', re.MULTILINE)
+
+
+def features(text: str) -> Counter:
+    tokens = [t for t in tokenize(text) if t not in STOPWORDS]
+    return Counter(tokens + [f"{a} {b}" for a, b in zip(tokens, tokens[1:])])
+
+
+def seed_examples(prompt: str) -> list[tuple[str, str]]:
+    """Labeled (query, intent) pairs from the numbered intent sections of the LLM router prompt."""
+    examples = []
+    headers = list(INTENT_HEADER_RE.finditer(prompt))
+    for header, following in zip(headers, headers[1:] + [None]):
+        section = prompt[header.end():following.start() if following else len(prompt)]
+        # Stop at the first blank line so trailing instructions are not read as examples
+        section = section.split("\n\n")[0]
+        examples.extend((m.group(1), header.group(1)) for m in EXAMPLE_RE.finditer(section))
+    return examples
+
+
+def product_terms(play_titles: list[str], rep_titles: list[str]) -> set[str]:
+    """Product names from training content titles: the "<Product>: ..." prefix of play
+    titles, plus brand-shaped words (CamelCase, hyphenated or containing digits)."""
+    terms = set()
+    for title in play_titles:
+        if ":" in title:
+            terms.add(title.split(":", 1)[0].strip().lower())
+    for title in play_titles + rep_titles:
+        for word in re.findall(r"[A-Za-z0-9]+(?:-[A-Za-z0-9]+)+|[A-Za-z]*[a-z][A-Z][A-Za-z]*|\w*\d\w*", title):
+            terms.add(word.lower())
+            head = word.split("-")[0].lower()
+            if len(head) >= 6:
+                terms.add(head)
+    return {t for t in terms if len(t) >= 4}
+
+
+class FastRouter:
+    """In-process pre-classifier in front of the LLM intent router.
+
+    Keyword rules catch first-person history questions and queries naming a
+    known product (a query with both goes to the LLM); everything else is
+    scored against per-intent TF-IDF centroids of labeled examples (seeded
+    from the LLM router prompt).
+    Returns None unless the nearest centroid is both similar enough and
+    clearly ahead of the runner-up, leaving ambiguous queries to the LLM.
+    Product names come from play and rep titles and are re-read when
+    ingestion publishes a new index generation.
+    """
+
+    def __init__(self, examples: list[tuple[str, str]],
+                 min_similarity: float = 0.3, min_margin: float = 0.12, fuzzy_cutoff: float = 0.85):
+        self.min_similarity = min_similarity
+        self.min_margin = min_margin
+        self.fuzzy_cutoff = fuzzy_cutoff
+        self.products: set[str] = set()
+        # Index generation the products were read at; ingestion publishes a new one when content changes
+        self.generation = None
+        self.lock = threading.Lock()
+        self._fit(examples)
+
+    def _fit(self, examples: list[tuple[str, str]]):
+        docs = [(features(text), intent) for text, intent in examples]
+        df = Counter(term for feats, _ in docs for term in feats)
+        self.idf = {term: math.log((len(docs) + 1) / (n + 1)) + 1 for term, n in df.items()}
+        sums: dict[str, Counter] = {}
+        for feats, intent in docs:
+            for term, weight in self._vector(feats).items():
+                sums.setdefault(intent, Counter())[term] += weight
+        self.centroids = {}
+        for intent, total in sums.items():
+            norm = math.sqrt(sum(w * w for w in total.values())) or 1.0
+            self.centroids[intent] = {term: w / norm for term, w in total.items()}
+
+    def _vector(self, feats: Counter) -> dict[str, float]:
+        # Terms never seen in the examples carry no signal for any centroid
+        vec = {term: count * self.idf[term] for term, count in feats.items() if term in self.idf}
+        norm = math.sqrt(sum(w * w for w in vec.values())) or 1.0
+        return {term: w / norm for term, w in vec.items()}
+
+    def load_products(self):
+        from database.models import SessionLocal, Play, Rep
+        from services.vector_store import vector_store
+        generation = vector_store.current_generation()
+        session = SessionLocal()
+        try:
+            play_titles = [t for (t,) in session.query(Play.title).all() if t]
+            rep_titles = [t for (t,) in session.query(Rep.prompt_title).filter(Rep.prompt_type == "watch").all() if t]
+        finally:
+            session.close()
+        with self.lock:
+            self.products = product_terms(play_titles, rep_titles)
+            self.generation = generation
+
+    def _product_mentioned(self, tokens: list[str]) -> str | None:
+        for token in tokens:
+            if token in self.products:
+                return token
+            if len(token) >= 5:
+                close = difflib.get_close_matches(token, self.products, n=1, cutoff=self.fuzzy_cutoff)
+                if close:
+                    return close[0]
+        return None
+
+    def scores(self, query: str) -> list[tuple[float, str]]:
+        vec = self._vector(features(query))
+        return sorted(((sum(w * centroid.get(term, 0.0) for term, w in vec.items()), intent)
+                       for intent, centroid in self.centroids.items()), reverse=True)
+
+    def classify(self, query: str) -> dict | None:
+        other = OTHER_PERSON_RE.search(query)
+        if other and other.group(1).lower() not in self.products:
+            return {"intent": "KNOWLEDGE_SEARCH", "reasoning": f"Fast path: asks about {other.group(1)}'s work, not the user's own."}
+        lowered = query.lower().replace("’", "'")
+        history = next((m for m in (pattern.search(lowered) for pattern in HISTORY_RES) if m), None)
+        product = self._product_mentioned(tokenize(query))
+        if history and (product or TRAINING_RE.search(lowered)):
+            return None
+        if history:
+            return {"intent": "HISTORY_SEARCH", "reasoning": f"Fast path: refers to the user's own practice (\"{history.group(0)}\")."}
+        if product:
+            return {"intent": "KNOWLEDGE_SEARCH", "reasoning": f"Fast path: names the product \"{product}\"."}
+
+        ranked = self.scores(query)
+        (best, intent), (runner_up, _) = ranked[0], ranked[1]
+        if best >= self.min_similarity and best - runner_up >= self.min_margin:
+            return {"intent": intent, "reasoning": f"Fast path: closest to the {intent} examples ({best:.2f} vs {runner_up:.2f})."}
+        return None
+
@@ -12,6 +12,11 @@ NO_RESULTS_MESSAGE = (
     "Try rephrasing your question or check with your manager about accessing additional training content."
 )
 
+HISTORY_NO_RESULTS_MESSAGE = (
+    "I couldn't find any matching content in your practice submissions. "
+    "Make sure you've completed practice reps with submissions to search through."
+)
+
 PEER_SUBMISSION_MESSAGE = (
     "I can only show you your own practice submissions and feedback. "
     "For privacy and security, other representatives' submissions are not accessible. "
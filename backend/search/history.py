@@ -1,60 +1,77 @@
-import chromadb
-from openai import OpenAI
-from config import CHROMA_PERSIST_DIR, OPENAI_API_KEY, EMBEDDING_MODEL, ANSWER_MODEL, HISTORY_TOP_K
-from services.auth import get_user_submission_asset_ids, get_user_submissions_with_feedback
-
-client = OpenAI(api_key=OPENAI_API_KEY)
-
-
-def get_embedding(text: str) -> list[float]:
-    resp = client.embeddings.create(input=[text[:8000]], model=EMBEDDING_MODEL)
-    return resp.data[0].embedding
-
-
-def search_history(query: str, user_id: str, company_id: str):
-    submission_asset_ids = get_user_submission_asset_ids(user_id)
+from openai import AsyncOpenAI
+from config import OPENAI_API_KEY, OPENAI_BASE_URL, ANSWER_MODEL, HISTORY_TOP_K
+from services.embeddings import aembed_query
+from services.executor import run_blocking
+from services.metrics import stage
+from services.vector_store import vector_store, collection_name
+from services.exact_index import query_collection
+from services.auth import get_user_submissions_with_feedback
+from search.context_packer import pack_context
+
+client = AsyncOpenAI(api_key=OPENAI_API_KEY, base_url=OPENAI_BASE_URL)
+
+
+async def search_history(query: str, user_id: str, company_id: str, embed=aembed_query):
+    plan = await plan_history(user_id, company_id)
+    if plan["result"] is not None:
+        return plan["result"]
+    query_embedding = await embed(query)
+    with stage("history_vector", upstream="chroma"):
+        results, _ = await run_blocking(
+            query_collection, plan["collection"], plan["name"], query_embedding, **plan["vector"])
+    return finish_history(plan, results)
+
+
+async def plan_history(user_id: str, company_id: str) -> dict:
+    """The user's submissions and the `query_collection` arguments for them (`result` set when there are none)."""
+    # One joined query gives both the ACL (the user's own submission assets) and the feedback context
+    with stage("history_access"):
+        submissions_with_feedback = await get_user_submissions_with_feedback(user_id)
+    feedback_map = {s["asset_id"]: s for s in submissions_with_feedback}
+    submission_asset_ids = set(feedback_map)
     if not submission_asset_ids:
-        return {"chunks": [], "answer": None, "citations": [], "no_results": True}
-
-    chroma = chromadb.PersistentClient(path=CHROMA_PERSIST_DIR)
-    collection = chroma.get_collection("submissions")
-
-    query_embedding = get_embedding(query)
-
-    where_filter = {
-        "$and": [
-            {"user_id": {"$eq": user_id}},
-            {"asset_id": {"$in": list(submission_asset_ids)}},
-        ]
+        return {"result": {"chunks": [], "answer": None, "citations": [], "no_results": True}}
+
+    name = collection_name("submissions", company_id)
+    collection = await run_blocking(vector_store.collection, name)
+    if collection is None:
+        return {"result": {"chunks": [], "answer": None, "citations": [], "no_results": True}}
+
+    # Submissions are partitioned per company; the user's own chunks are one equality match
+    # (for the exact engine, the row ranges of the user's submission assets)
+    where_filter = {"user_id": {"$eq": user_id}}
+    return {
+        "result": None, "name": name, "collection": collection, "feedback_map": feedback_map,
+        "vector": {
+            "asset_ids": submission_asset_ids, "where": where_filter, "n_results": HISTORY_TOP_K,
+            "include": ["documents", "metadatas", "distances"],
+        },
     }
 
-    results = collection.query(
-        query_embeddings=[query_embedding],
-        where=where_filter,
-        n_results=HISTORY_TOP_K,
-        include=["documents", "metadatas", "distances"],
-    )
 
+def finish_history(plan: dict, results: dict) -> dict:
+    """Citations and packed context from the vector `results` for a `plan_history` plan."""
+    feedback_map = plan["feedback_map"]
+    submission_asset_ids = plan["vector"]["asset_ids"]
     if not results["documents"] or not results["documents"][0]:
         return {"chunks": [], "answer": None, "citations": [], "no_results": True}
 
-    documents = results["documents"][0]
-    metadatas = results["metadatas"][0]
-    distances = results["distances"][0]
-
-    # Get feedback context
-    submissions_with_feedback = get_user_submissions_with_feedback(user_id)
-    feedback_map = {s["asset_id"]: s for s in submissions_with_feedback}
+    rows = [(doc, meta, dist) for doc, meta, dist
+            in zip(results["documents"][0], results["metadatas"][0], results["distances"][0])
+            if meta.get("asset_id") in submission_asset_ids]
+    if not rows:
+        return {"chunks": [], "answer": None, "citations": [], "no_results": True}
 
-    context_parts = []
-    citations = []
+    documents = [doc for doc, _, _ in rows]
+    metadatas = [meta for _, meta, _ in rows]
+    distances = [dist for _, _, dist in rows]
 
-    for i, (doc, meta, dist) in enumerate(zip(documents, metadatas, distances)):
+    items = []
+    for doc, meta, dist in zip(documents, metadatas, distances):
         asset_id = meta.get("asset_id", "")
         sub_info = feedback_map.get(asset_id, {})
 
         citation = {
-            "index": i + 1,
             "source_file": meta.get("source_file", ""),
             "source_name": f"Your submission: {sub_info.get('rep_title', 'Practice')}",
             "asset_type": "submission",
@@ -69,24 +86,23 @@ def search_history(query: str, user_id: str, company_id: str):
             citation["feedback_score"] = sub_info["feedback_score"]
             citation["feedback_text"] = sub_info.get("feedback_text", "")
 
-        citations.append(citation)
-
-        label = f"[Submission {i+1}: {sub_info.get('rep_title', 'Practice')}"
-        if meta.get("start"):
-            label += f", {meta['start']}-{meta.get('end', '')}"
-        label += "]"
-
         feedback_note = ""
         if sub_info.get("feedback_score") is not None:
             feedback_note = f"\nFeedback (Score {sub_info['feedback_score']}/10): {sub_info.get('feedback_text', '')}"
 
-        context_parts.append(f"{label}\n{doc}{feedback_note}")
+        items.append({
+            "text": doc, "meta": meta, "title": sub_info.get("rep_title", "Practice"),
+            "citation": citation, "note": feedback_note,
+        })
 
-    context = "\n\n---\n\n".join(context_parts)
-    return {"chunks": documents, "context": context, "citations": citations, "no_results": False}
+    context, citations, context_stats = pack_context(items, "Submission")
+    return {
+        "chunks": documents, "context": context, "citations": citations,
+        "no_results": False, "context_stats": context_stats,
+    }
 
 
-def generate_history_answer(query: str, context: str, citations: list[dict]):
+async def generate_history_answer(query: str, context: str, citations: list[dict]):
     system = """You are a helpful search assistant for BigSpring, a sales training platform.
 The user is asking about their OWN past practice submissions and feedback.
 Answer using ONLY the provided submission transcripts and feedback data.
@@ -100,7 +116,7 @@ Rules:
 
     user_msg = f"Question: {query}\n\nYour Submissions & Feedback:\n{context}"
 
-    stream = client.chat.completions.create(
+    stream = await client.chat.completions.create(
         model=ANSWER_MODEL,
         messages=[
             {"role": "system", "content": system},
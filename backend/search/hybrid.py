@@ -0,0 +1,37 @@
+from config import LEXICAL_FAST_PATH, LEXICAL_MAX_TERMS, LEXICAL_RARE_TERM_RATIO, RRF_K
+from services.text import tokenize, STOPWORDS
+from services.lexical_index import lexical_index
+
+
+def query_terms(query: str) -> list[str]:
+    """Distinct content words of the query, in order."""
+    return list(dict.fromkeys(t for t in tokenize(query) if t not in STOPWORDS and len(t) > 1))
+
+
+def rrf_fuse(*rankings: list[str], k: int = RRF_K) -> list[str]:
+    """Reciprocal rank fusion: ids ordered by the sum of 1 / (k + rank) over the rankings they appear in."""
+    scores = {}
+    for ranking in rankings:
+        for rank, key in enumerate(ranking, start=1):
+            scores[key] = scores.get(key, 0.0) + 1.0 / (k + rank)
+    return sorted(scores, key=scores.get, reverse=True)
+
+
+def lexical_search(query: str, collection: str, access_groups, limit: int) -> dict:
+    """BM25 hits for any query term, plus whether they are confident enough to skip vector search.
+
+    Confident means an identifier-style query: at most LEXICAL_MAX_TERMS content
+    words, all of them present in one accessible chunk, and at least one of them
+    rare in the company's corpus (a product name, table title, metric).
+    """
+    terms = query_terms(query)
+    hits = lexical_index.search(collection, access_groups, terms, limit)
+    confidence = {"terms": terms, "full_match": False, "rarest_ratio": None, "confident": False}
+    if not hits or len(terms) > LEXICAL_MAX_TERMS:
+        return {"hits": hits, **confidence}
+
+    confidence["full_match"] = bool(lexical_index.search(collection, access_groups, terms, 1, operator="AND"))
+    if confidence["full_match"]:
+        confidence["rarest_ratio"] = round(min(lexical_index.term_ratios(collection, terms).values()), 4)
+        confidence["confident"] = LEXICAL_FAST_PATH and confidence["rarest_ratio"] <= LEXICAL_RARE_TERM_RATIO
+    return {"hits": hits, **confidence}
@@ -1,61 +1,184 @@
-import chromadb
-from openai import OpenAI
-from config import CHROMA_PERSIST_DIR, OPENAI_API_KEY, EMBEDDING_MODEL, ANSWER_MODEL, KNOWLEDGE_TOP_K
-from services.auth import get_user_accessible_asset_ids
-from database.models import SessionLocal, Asset
-
-client = OpenAI(api_key=OPENAI_API_KEY)
-
-
-def get_embedding(text: str) -> list[float]:
-    resp = client.embeddings.create(input=[text[:8000]], model=EMBEDDING_MODEL)
-    return resp.data[0].embedding
-
-
-def search_knowledge(query: str, user_id: str, company_id: str):
-    accessible_asset_ids = get_user_accessible_asset_ids(user_id)
-    if not accessible_asset_ids:
-        return {"chunks": [], "answer": None, "citations": [], "no_results": True}
-
-    chroma = chromadb.PersistentClient(path=CHROMA_PERSIST_DIR)
-    collection = chroma.get_collection("knowledge")
-
-    query_embedding = get_embedding(query)
-
-    # ChromaDB where filter: asset_id must be in user's accessible set AND company must match
-    where_filter = {
-        "$and": [
-            {"company_id": {"$eq": company_id}},
-            {"asset_id": {"$in": list(accessible_asset_ids)}},
-        ]
-    }
-
-    results = collection.query(
-        query_embeddings=[query_embedding],
-        where=where_filter,
-        n_results=KNOWLEDGE_TOP_K,
-        include=["documents", "metadatas", "distances"],
-    )
-
+import asyncio
+import numpy as np
+from openai import AsyncOpenAI
+from config import (
+    OPENAI_API_KEY, OPENAI_BASE_URL, ANSWER_MODEL, KNOWLEDGE_TOP_K, RECOMMENDATION_POOL_K, RECOMMENDATION_LIMIT,
+    HYBRID_RETRIEVAL,
+)
+from services.embeddings import aembed_query
+from services.executor import run_blocking
+from services.metrics import stage
+from services.vector_store import vector_store, collection_name, access_group_filter
+from services.exact_index import exact_index, query_collection
+from services.auth import get_user_accessible_asset_ids, get_user_access_groups
+from services.recommendations import build_recommendations
+from search.hybrid import lexical_search, rrf_fuse
+from search.context_packer import pack_context
+from sqlalchemy import select
+from database.models import AsyncSessionLocal, Asset
+
+client = AsyncOpenAI(api_key=OPENAI_API_KEY, base_url=OPENAI_BASE_URL)
+
+
+def _vector_rows(results: dict, accessible_asset_ids: set[str]) -> list[tuple[str, str, dict, float]]:
     if not results["documents"] or not results["documents"][0]:
-        return {"chunks": [], "answer": None, "citations": [], "no_results": True}
-
-    documents = results["documents"][0]
-    metadatas = results["metadatas"][0]
-    distances = results["distances"][0]
-
-    # Build context for answer generation
-    context_parts = []
-    citations = []
-    session = SessionLocal()
-
-    for i, (doc, meta, dist) in enumerate(zip(documents, metadatas, distances)):
-        asset = session.query(Asset).filter(Asset.id == meta.get("asset_id")).first()
+        return []
+    # Defense in depth: drop anything whose access-group tags are stale relative to the ACL
+    return [(cid, doc, meta, dist) for cid, doc, meta, dist
+            in zip(results["ids"][0], results["documents"][0], results["metadatas"][0], results["distances"][0])
+            if meta.get("asset_id") in accessible_asset_ids]
+
+
+def _cosine_distances(collection, ids: list[str], query_embedding: list[float]) -> dict[str, float]:
+    """Vector distances for chunks found only lexically, so fused results share one relevance scale."""
+    if not ids:
+        return {}
+    distances = exact_index.distances(collection.name, ids, query_embedding)
+    if distances is not None:
+        return distances
+    stored = collection.get(ids=ids, include=["embeddings"])
+    query = np.asarray(query_embedding, dtype=np.float32)
+    distances = {}
+    for cid, embedding in zip(stored["ids"], stored["embeddings"]):
+        vector = np.asarray(embedding, dtype=np.float32)
+        distances[cid] = 1 - float(vector @ query / (np.linalg.norm(vector) * np.linalg.norm(query) + 1e-12))
+    return distances
+
+
+def _neighbour_candidates(collection, chunk_id: str, asset_ids: set[str], where: dict | None) -> list[tuple[dict, float]]:
+    """(metadata, distance) of chunks near a stored chunk's vector, for paths without a query embedding."""
+    matrix = exact_index.matrix(collection.name) if exact_index.engine != "chroma" else None
+    if matrix is not None and chunk_id in matrix.rows:
+        vector = np.asarray(matrix.vectors[matrix.rows[chunk_id]]).tolist()
+    else:
+        stored = collection.get(ids=[chunk_id], include=["embeddings"])
+        if not stored["ids"]:
+            return []
+        vector = list(stored["embeddings"][0])
+    results, _ = query_collection(collection, collection.name, vector, asset_ids=asset_ids, where=where,
+                                  n_results=RECOMMENDATION_POOL_K, include=["metadatas", "distances"])
+    return [(meta, dist) for meta, dist in zip(results["metadatas"][0], results["distances"][0])
+            if meta.get("asset_id") in asset_ids]
+
+
+async def search_knowledge(query: str, user_id: str, company_id: str, embed=aembed_query):
+    """Retrieve knowledge chunks for `query` and build the answer context.
+
+    The query is embedded while the access check and BM25 (FTS5) lookup run;
+    when BM25 is confident the results are served from it alone and the
+    embedding is cancelled. Otherwise the vector results are fused with the
+    BM25 ranking by reciprocal rank fusion. `retrieval` reports which path
+    served the results; `query_embedding` is None on the lexical path.
+    """
+    embedding = asyncio.ensure_future(embed(query))
+    try:
+        plan = await plan_knowledge(query, user_id, company_id)
+    except BaseException:
+        _drop(embedding)
+        raise
+    if plan["result"] is not None or plan["vector"] is None:
+        _drop(embedding)
+        if plan["result"] is not None:
+            return plan["result"]
+        return await finish_knowledge(plan)
+    query_embedding = await embedding
+    with stage("vector", upstream="chroma"):
+        results, engine = await run_blocking(
+            query_collection, plan["collection"], plan["name"], query_embedding, **plan["vector"])
+    return await finish_knowledge(plan, query_embedding, results, engine)
+
+
+def _drop(task: asyncio.Future):
+    task.cancel()
+    if task.done() and not task.cancelled():
+        task.exception()  # retrieve so a failure nobody awaited is not reported as unhandled
+
+
+async def plan_knowledge(query: str, user_id: str, company_id: str) -> dict:
+    """Everything `search_knowledge` does besides embedding and vector search: access check and BM25 ranking.
+
+    `result` is set when there is nothing to search. `vector` holds the
+    `query_collection` arguments, or is None when the lexical fast path serves
+    the query; callers batching many queries run those themselves.
+    """
+    # Company isolation comes from the per-company collection; within it, chunks carry
+    # the access group of their asset, so queries filter on the user's handful of groups
+    with stage("access"):
+        accessible_asset_ids = await run_blocking(get_user_accessible_asset_ids, user_id)
+        access_groups = await run_blocking(get_user_access_groups, user_id)
+    plan = {"result": None, "vector": None}
+    if not accessible_asset_ids:
+        return {**plan, "result": {"chunks": [], "answer": None, "citations": [], "no_results": True}}
+
+    name = collection_name("knowledge", company_id)
+    collection = await run_blocking(vector_store.collection, name)
+    if collection is None:
+        return {**plan, "result": {"chunks": [], "answer": None, "citations": [], "no_results": True}}
+
+    # One wider query: the top K become citations, the tail feeds recommendations
+    n_results = KNOWLEDGE_TOP_K + RECOMMENDATION_POOL_K
+
+    lexical = {"hits": [], "terms": [], "confident": False}
+    if HYBRID_RETRIEVAL:
+        with stage("lexical"):
+            lexical = await run_blocking(lexical_search, query, name, access_groups, n_results)
+    lexical_rows = [hit for hit in lexical["hits"] if hit["metadata"].get("asset_id") in accessible_asset_ids]
+    retrieval = {k: v for k, v in lexical.items() if k != "hits"}
+    retrieval["lexical_hits"] = len(lexical_rows)
+    plan.update(name=name, collection=collection, accessible_asset_ids=accessible_asset_ids,
+                lexical_rows=lexical_rows, retrieval=retrieval, n_results=n_results, access_groups=access_groups)
+    if not (lexical["confident"] and lexical_rows):
+        plan["vector"] = {
+            "asset_ids": accessible_asset_ids, "where": access_group_filter(access_groups),
+            "n_results": n_results, "include": ["documents", "metadatas", "distances"],
+        }
+    return plan
+
+
+async def finish_knowledge(plan: dict, query_embedding: list[float] = None, results: dict = None,
+                           engine: str = None) -> dict:
+    """Fuse the vector `results` (when the plan asked for them) with the BM25 ranking and build the answer context."""
+    lexical_rows, retrieval, n_results = plan["lexical_rows"], plan["retrieval"], plan["n_results"]
+    if plan["vector"] is None:
+        # BM25 scores are relative to the query; the best match is relevance 1
+        best = lexical_rows[0]["score"] or 1.0
+        rows = [(hit["text"], hit["metadata"], 1 - hit["score"] / best) for hit in lexical_rows]
+        retrieval.update(path="lexical", vector_hits=0)
+    else:
+        vector_rows = _vector_rows(results, plan["accessible_asset_ids"])
+        retrieval.update(path="hybrid" if lexical_rows else "vector", vector_hits=len(vector_rows), engine=engine)
+        by_id = {cid: (doc, meta, dist) for cid, doc, meta, dist in vector_rows}
+        if lexical_rows:
+            lexical_only = [hit["id"] for hit in lexical_rows if hit["id"] not in by_id]
+            with stage("vector", upstream="chroma"):
+                distances = await run_blocking(_cosine_distances, plan["collection"], lexical_only, query_embedding)
+            for hit in lexical_rows:
+                if hit["id"] in distances:
+                    by_id[hit["id"]] = (hit["text"], hit["metadata"], distances[hit["id"]])
+            ranked = rrf_fuse([cid for cid, *_ in vector_rows], [hit["id"] for hit in lexical_rows])
+            rows = [by_id[cid] for cid in ranked if cid in by_id][:n_results]
+        else:
+            rows = [(doc, meta, dist) for _, doc, meta, dist in vector_rows]
+
+    if not rows:
+        return {"chunks": [], "answer": None, "citations": [], "no_results": True, "retrieval": retrieval}
+
+    documents = [doc for doc, _, _ in rows[:KNOWLEDGE_TOP_K]]
+    metadatas = [meta for _, meta, _ in rows[:KNOWLEDGE_TOP_K]]
+    distances = [dist for _, _, dist in rows[:KNOWLEDGE_TOP_K]]
+    tail = [(meta, dist) for _, meta, dist in rows[KNOWLEDGE_TOP_K:]]
+
+    async with AsyncSessionLocal() as session:
+        cited_ids = {meta.get("asset_id") for meta in metadatas}
+        assets = {a.id: a for a in (await session.execute(select(Asset).where(Asset.id.in_(cited_ids)))).scalars()}
+
+    items = []
+    for doc, meta, dist in zip(documents, metadatas, distances):
+        asset = assets.get(meta.get("asset_id"))
         source_name = asset.file_name.replace(".json", "") if asset else meta.get("source_file", "Unknown")
         asset_type = asset.type if asset else "unknown"
 
         citation = {
-            "index": i + 1,
             "source_file": meta.get("source_file", ""),
             "source_name": source_name,
             "asset_type": asset_type,
@@ -73,23 +196,33 @@ def search_knowledge(query: str, user_id: str, company_id: str):
         if meta.get("table_title"):
             citation["table_title"] = meta["table_title"]
 
-        citations.append(citation)
-        # Format context block
-        label = f"[Source {i+1}: {source_name}"
-        if meta.get("page"):
-            label += f", Page {meta['page']}"
-        if meta.get("start"):
-            label += f", {meta['start']}-{meta.get('end', '')}"
-        label += "]"
-        context_parts.append(f"{label}\n{doc}")
-
-    session.close()
-
-    context = "\n\n---\n\n".join(context_parts)
-    return {"chunks": documents, "context": context, "citations": citations, "no_results": False}
+        items.append({"text": doc, "meta": meta, "title": source_name, "citation": citation})
+
+    # Repeated chunks are dropped and the rest fit to the token budget; citations are numbered as packed
+    context, citations, context_stats = pack_context(items, "Source")
+    cited_asset_ids = {meta.get("asset_id", "") for meta in metadatas}
+    with stage("recommendations"):
+        try:
+            recommendations = await build_recommendations(tail, exclude_asset_ids=cited_asset_ids)
+            if plan["vector"] is None and len(recommendations) < RECOMMENDATION_LIMIT:
+                # The lexical path's few hits leave little tail; the best hit's stored vector finds its
+                # neighbours, still without embedding the query
+                neighbours = await run_blocking(
+                    _neighbour_candidates, plan["collection"], lexical_rows[0]["id"], plan["accessible_asset_ids"],
+                    access_group_filter(plan["access_groups"]))
+                tail = tail + neighbours
+                recommendations = await build_recommendations(tail, exclude_asset_ids=cited_asset_ids)
+        except Exception:
+            # Recommendations are extra: failing to build them must not fail the search
+            recommendations = []
+    return {
+        "chunks": documents, "context": context, "citations": citations,
+        "recommendations": recommendations, "no_results": False,
+        "retrieval": retrieval, "context_stats": context_stats, "query_embedding": query_embedding,
+    }
 
 
-def generate_knowledge_answer(query: str, context: str, citations: list[dict]):
+async def generate_knowledge_answer(query: str, context: str, citations: list[dict]):
     system = """You are a helpful search assistant for BigSpring, a sales training platform.
 Answer the user's question using ONLY the provided source materials. Be precise and cite specific data points.
 
@@ -103,7 +236,7 @@ Rules:
 
     user_msg = f"Question: {query}\n\nSource Materials:\n{context}"
 
-    stream = client.chat.completions.create(
+    stream = await client.chat.completions.create(
         model=ANSWER_MODEL,
         messages=[
             {"role": "system", "content": system},
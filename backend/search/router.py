@@ -1,7 +1,12 @@
-from openai import OpenAI
-from config import OPENAI_API_KEY, CLASSIFIER_MODEL
+import asyncio
+import json
+from openai import AsyncOpenAI
+from config import OPENAI_API_KEY, OPENAI_BASE_URL, CLASSIFIER_MODEL, FAST_ROUTER, BATCH_CLASSIFY_SIZE
+from services.executor import run_blocking
+from services.vector_store import vector_store
+from search.fast_router import FastRouter, seed_examples
 
-client = OpenAI(api_key=OPENAI_API_KEY)
+client = AsyncOpenAI(api_key=OPENAI_API_KEY, base_url=OPENAI_BASE_URL)
 
 SYSTEM_PROMPT = """You are an intent classifier for a sales training search engine called BigSpring.
 Users are sales representatives searching their assigned training materials and personal practice history.
@@ -37,9 +42,32 @@ IMPORTANT: If the query references another person's submissions/pitches by name
 Respond with ONLY a JSON object:
 {"intent": "<INTENT>", "reasoning": "<brief explanation>"}"""
 
+INTENTS = ("KNOWLEDGE_SEARCH", "HISTORY_SEARCH", "GENERAL_PROFESSIONAL", "OUT_OF_SCOPE")
 
-def classify_intent(query: str) -> dict:
-    response = client.chat.completions.create(
+# The same rules over a numbered list, so one round trip classifies many queries
+BATCH_PROMPT = SYSTEM_PROMPT.rsplit("Respond with ONLY", 1)[0] + """You will receive a JSON object {"queries": [{"index": <n>, "query": "<text>"}, ...]}.
+Classify every query independently and respond with ONLY a JSON object:
+{"results": [{"index": <n>, "intent": "<INTENT>", "reasoning": "<brief explanation>"}, ...]}"""
+
+
+# Confident cases are answered in-process; only ambiguous queries pay for the LLM round trip
+fast_router = FastRouter(seed_examples(SYSTEM_PROMPT))
+
+
+async def refresh_fast_router():
+    """Reload the fast router's product names, off the event loop, once a new index generation is published."""
+    if await run_blocking(vector_store.current_generation) != fast_router.generation:
+        await run_blocking(fast_router.load_products)
+
+
+async def classify_intent(query: str) -> dict:
+    if FAST_ROUTER:
+        await refresh_fast_router()
+        result = fast_router.classify(query)
+        if result:
+            return {**result, "classifier": "fast"}
+
+    response = await client.chat.completions.create(
         model=CLASSIFIER_MODEL,
         messages=[
             {"role": "system", "content": SYSTEM_PROMPT},
@@ -48,9 +76,56 @@ def classify_intent(query: str) -> dict:
         temperature=0,
         response_format={"type": "json_object"},
     )
-    import json
     result = json.loads(response.choices[0].message.content)
     return {
         "intent": result.get("intent", "KNOWLEDGE_SEARCH"),
         "reasoning": result.get("reasoning", ""),
+        "classifier": "llm",
     }
+
+
+async def classify_intents(queries: list[str], batch_size: int = BATCH_CLASSIFY_SIZE) -> list[dict | Exception]:
+    """`classify_intent` for many queries: the fast router first, then one LLM call per `batch_size` of the rest.
+
+    A query the batched reply leaves out (or mislabels), or whose batch call
+    fails, is classified on its own; if that fails too, its slot holds the
+    exception.
+    """
+    results: list[dict | Exception | None] = [None] * len(queries)
+    pending = []
+    if FAST_ROUTER:
+        await refresh_fast_router()
+    for i, query in enumerate(queries):
+        result = fast_router.classify(query) if FAST_ROUTER else None
+        if result:
+            results[i] = {**result, "classifier": "fast"}
+        else:
+            pending.append(i)
+
+    async def classify_batch(indices: list[int]):
+        try:
+            response = await client.chat.completions.create(
+                model=CLASSIFIER_MODEL,
+                messages=[
+                    {"role": "system", "content": BATCH_PROMPT},
+                    {"role": "user", "content": json.dumps({"queries": [{"index": i, "query": queries[i]} for i in indices]})},
+                ],
+                temperature=0,
+                response_format={"type": "json_object"},
+            )
+            reply = json.loads(response.choices[0].message.content)
+        except Exception:
+            return  # left unclassified: each query is retried on its own below
+        items = reply.get("results") if isinstance(reply, dict) else None
+        for item in items if isinstance(items, list) else []:
+            if isinstance(item, dict) and item.get("index") in indices and item.get("intent") in INTENTS:
+                results[item["index"]] = {
+                    "intent": item["intent"], "reasoning": item.get("reasoning", ""), "classifier": "llm_batch",
+                }
+
+    await asyncio.gather(*(classify_batch(pending[i:i + batch_size]) for i in range(0, len(pending), batch_size)))
+    missing = [i for i in pending if results[i] is None]
+    retried = await asyncio.gather(*(classify_intent(queries[i]) for i in missing), return_exceptions=True)
+    for i, result in zip(missing, retried):
+        results[i] = result
+    return results
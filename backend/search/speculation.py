@@ -0,0 +1,72 @@
+import asyncio
+import time
+from services.embeddings import aembed_query
+from search.knowledge import search_knowledge
+from search.history import search_history
+
+
+def _elapsed_ms(since: float) -> float:
+    return round((time.perf_counter() - since) * 1000, 1)
+
+
+class SpeculativeRetrieval:
+    """Knowledge and history retrieval started while intent classification is in flight.
+
+    Both branches share one query-embedding task, started by whichever branch
+    asks first (knowledge asks as it starts, alongside its BM25 lookup); its
+    vector lands in the request memo, so nothing embeds the query again. Once
+    the intent is known, `take` returns the matching branch's result and `discard`
+    cancels whatever is still running. `report` records how long each branch ran
+    and whether its work was used, wasted (finished but not needed) or cancelled.
+    """
+
+    def __init__(self, query: str, user_id: str, company_id: str):
+        self.started = time.perf_counter()
+        self.query = query
+        self.embedding = None
+        self.branches = {
+            name: asyncio.create_task(self._run(name, search_fn, query, user_id, company_id, embed=self.query_embedding))
+            for name, search_fn in (("knowledge", search_knowledge), ("history", search_history))
+        }
+        self.finished_ms: dict[str, float] = {}
+        self.outcome: dict[str, dict] = {}
+
+    async def _run(self, name: str, search_fn, *args, **kwargs):
+        result = await search_fn(*args, **kwargs)
+        self.finished_ms[name] = _elapsed_ms(self.started)
+        return result
+
+    async def query_embedding(self, query: str = None) -> list[float]:
+        """The searches' `embed(query)` hook; always embeds this request's query, once."""
+        if self.embedding is None:
+            self.embedding = asyncio.create_task(aembed_query(self.query))
+        # Shielded: cancelling one branch must not cancel the embedding the other is waiting on
+        return await asyncio.shield(self.embedding)
+
+    async def take(self, name: str) -> dict:
+        # Stop the other branch first so it cannot start an embedding call this one may not need
+        self.discard(keep=name)
+        try:
+            result = await self.branches[name]
+        finally:
+            self.outcome[name] = {"status": "used", "ms": self.finished_ms.get(name, _elapsed_ms(self.started))}
+            self.discard()
+        return result
+
+    def discard(self, keep: str = None):
+        """Cancel every branch that was not taken (other than `keep`); safe to call more than once."""
+        for name, task in self.branches.items():
+            if name in self.outcome or name == keep:
+                continue
+            if task.done():
+                if not task.cancelled():
+                    task.exception()  # retrieve so a failed loser is not reported as unhandled
+                self.outcome[name] = {"status": "wasted", "ms": self.finished_ms.get(name, _elapsed_ms(self.started))}
+            else:
+                task.cancel()
+                self.outcome[name] = {"status": "cancelled", "ms": _elapsed_ms(self.started)}
+        if keep is None and self.embedding is not None and not self.embedding.done():
+            self.embedding.cancel()
+
+    def report(self, classify_ms: float) -> dict:
+        return {"classify_ms": classify_ms, "branches": self.outcome}
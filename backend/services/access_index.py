@@ -0,0 +1,154 @@
+import sqlite3
+import threading
+import time
+from config import SQLITE_DB_PATH, ACCESS_INDEX_RECHECK_SECONDS
+from services.vector_store import access_group_id
+
+
+def iter_bits(bits: int):
+    while bits:
+        low = bits & -bits
+        yield low.bit_length() - 1
+        bits ^= low
+
+
+class AccessIndex:
+    """Materialized user -> accessible knowledge asset index.
+
+    Assets get dense ordinals; each play is a bitmap of its Watch Rep assets and
+    each user's bitmap is the OR of their assigned plays. Each asset also falls
+    in one access group (the set of plays containing it), which is what
+    knowledge chunks are tagged with in the vector index. Lookups are a dict
+    hit. The index watches SQLite's `data_version` (at most every
+    `recheck_seconds`) and, when another connection has committed, reloads the
+    assignment/rep pairs and recomputes only the users whose plays changed.
+    """
+
+    def __init__(self, db_path: str = SQLITE_DB_PATH, recheck_seconds: float = ACCESS_INDEX_RECHECK_SECONDS):
+        self.db_path = db_path
+        self.recheck_seconds = recheck_seconds
+        self.lock = threading.Lock()
+        self.conn = None
+        self.data_version = None
+        self.checked_at = 0.0
+        self.version = 0
+        self.asset_ordinals: dict[str, int] = {}
+        self.assets: list[str] = []
+        self.play_bits: dict[str, int] = {}
+        self.play_groups: dict[str, frozenset[str]] = {}
+        self.user_plays: dict[str, frozenset[str]] = {}
+        self.user_bits: dict[str, int] = {}
+        self.user_assets: dict[str, frozenset[str]] = {}
+        self.user_groups: dict[str, frozenset[str]] = {}
+        self.user_versions: dict[str, int] = {}
+
+    def _ordinal(self, asset_id: str) -> int:
+        ordinal = self.asset_ordinals.get(asset_id)
+        if ordinal is None:
+            ordinal = len(self.assets)
+            self.asset_ordinals[asset_id] = ordinal
+            self.assets.append(asset_id)
+        return ordinal
+
+    def refresh(self, force: bool = False):
+        now = time.monotonic()
+        if not force and self.conn is not None and now - self.checked_at < self.recheck_seconds:
+            return
+        with self.lock:
+            self.checked_at = now
+            if self.conn is None:
+                self.conn = sqlite3.connect(self.db_path, check_same_thread=False)
+            data_version = self.conn.execute("PRAGMA data_version").fetchone()[0]
+            if not force and data_version == self.data_version:
+                return
+            self.data_version = data_version
+            self._rebuild()
+
+    def _rebuild(self):
+        try:
+            assignments = self.conn.execute("SELECT user_id, play_id FROM play_assignments").fetchall()
+            reps = self.conn.execute(
+                "SELECT play_id, asset_id FROM reps WHERE prompt_type = 'watch' AND asset_id IS NOT NULL"
+            ).fetchall()
+        except sqlite3.OperationalError:
+            # Tables not created yet
+            assignments, reps = [], []
+
+        play_bits: dict[str, int] = {}
+        asset_plays: dict[str, set[str]] = {}
+        for play_id, asset_id in reps:
+            play_bits[play_id] = play_bits.get(play_id, 0) | (1 << self._ordinal(asset_id))
+            asset_plays.setdefault(asset_id, set()).add(play_id)
+        play_groups: dict[str, set[str]] = {}
+        for plays in asset_plays.values():
+            group = access_group_id(plays)
+            for play_id in plays:
+                play_groups.setdefault(play_id, set()).add(group)
+        play_groups = {p: frozenset(g) for p, g in play_groups.items()}
+        user_plays: dict[str, set[str]] = {}
+        for user_id, play_id in assignments:
+            user_plays.setdefault(user_id, set()).add(play_id)
+        user_plays = {u: frozenset(p) for u, p in user_plays.items()}
+
+        changed_plays = {p for p in play_bits.keys() | self.play_bits.keys()
+                         if play_bits.get(p) != self.play_bits.get(p)
+                         or play_groups.get(p) != self.play_groups.get(p)}
+        stale_users = {u for u in user_plays.keys() | self.user_plays.keys()
+                       if user_plays.get(u) != self.user_plays.get(u)
+                       or user_plays.get(u, frozenset()) & changed_plays}
+        if not stale_users:
+            self.play_bits = play_bits
+            self.play_groups = play_groups
+            return
+
+        self.version += 1
+        user_bits = dict(self.user_bits)
+        user_assets = dict(self.user_assets)
+        user_groups = dict(self.user_groups)
+        user_versions = dict(self.user_versions)
+        for user_id in stale_users:
+            bits, groups = 0, set()
+            for play_id in user_plays.get(user_id, ()):
+                bits |= play_bits.get(play_id, 0)
+                groups |= play_groups.get(play_id, frozenset())
+            if user_id in user_plays:
+                user_bits[user_id] = bits
+                user_assets[user_id] = frozenset(self.assets[i] for i in iter_bits(bits))
+                user_groups[user_id] = frozenset(groups)
+                user_versions[user_id] = self.version
+            else:
+                user_bits.pop(user_id, None)
+                user_assets.pop(user_id, None)
+                user_groups.pop(user_id, None)
+                user_versions.pop(user_id, None)
+
+        # Swap whole maps so concurrent readers never see a half-applied update
+        self.play_bits = play_bits
+        self.play_groups = play_groups
+        self.user_plays = user_plays
+        self.user_bits = user_bits
+        self.user_assets = user_assets
+        self.user_groups = user_groups
+        self.user_versions = user_versions
+
+    def assets_for(self, user_id: str) -> frozenset[str]:
+        self.refresh()
+        return self.user_assets.get(user_id, frozenset())
+
+    def groups_for(self, user_id: str) -> frozenset[str]:
+        """Access groups (see `vector_store.access_group_id`) the user can read."""
+        self.refresh()
+        return self.user_groups.get(user_id, frozenset())
+
+    def bits_for(self, user_id: str) -> int:
+        """Bitmap of accessible asset ordinals (see `asset_ordinals`)."""
+        self.refresh()
+        return self.user_bits.get(user_id, 0)
+
+    def version_for(self, user_id: str) -> int:
+        """Index version at which this user's accessible set last changed."""
+        self.refresh()
+        return self.user_versions.get(user_id, 0)
+
+
+access_index = AccessIndex()
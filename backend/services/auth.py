@@ -1,66 +1,79 @@
-from database.models import SessionLocal, User, PlayAssignment, Rep, Submission, Feedback
+from sqlalchemy import select
+from database.models import AsyncSessionLocal, User, Rep, Submission, Feedback
+from services.access_index import access_index
 
 
-def get_user(user_id: str) -> dict | None:
-    session = SessionLocal()
-    user = session.query(User).filter(User.id == user_id).first()
-    if not user:
-        session.close()
-        return None
-    result = {
+def _user_dict(user: User) -> dict:
+    return {
         "id": user.id, "username": user.username,
         "display_name": user.display_name, "company_id": user.company_id,
         "role": user.role, "segment": user.segment,
     }
-    session.close()
-    return result
 
 
-def get_user_accessible_asset_ids(user_id: str) -> set[str]:
-    """Get all asset_ids from Watch Reps in the user's assigned plays."""
-    session = SessionLocal()
-    # Get assigned play_ids
-    assignments = session.query(PlayAssignment).filter(PlayAssignment.user_id == user_id).all()
-    play_ids = {a.play_id for a in assignments}
+async def get_user(user_id: str) -> dict | None:
+    async with AsyncSessionLocal() as session:
+        user = (await session.execute(select(User).where(User.id == user_id))).scalars().first()
+    return _user_dict(user) if user else None
 
-    # Get watch rep asset_ids from those plays
-    reps = session.query(Rep).filter(
-        Rep.play_id.in_(play_ids),
-        Rep.prompt_type == "watch",
-        Rep.asset_id.isnot(None),
-    ).all()
-    asset_ids = {r.asset_id for r in reps if r.asset_id}
 
-    session.close()
-    return asset_ids
+async def get_users(user_ids) -> dict[str, dict]:
+    """`get_user` for many ids in one query, keyed by id; unknown ids are left out."""
+    async with AsyncSessionLocal() as session:
+        users = (await session.execute(select(User).where(User.id.in_(set(user_ids))))).scalars().all()
+    return {user.id: _user_dict(user) for user in users}
 
 
-def get_user_submission_asset_ids(user_id: str) -> set[str]:
+def get_user_accessible_asset_ids(user_id: str) -> frozenset[str]:
+    """Get all asset_ids from Watch Reps in the user's assigned plays.
+
+    Served from the materialized access index rather than querying
+    PlayAssignment/Rep on every call.
+    """
+    return access_index.assets_for(user_id)
+
+
+def get_user_access_groups(user_id: str) -> frozenset[str]:
+    """Get the access groups knowledge chunks are tagged with that the user can read."""
+    return access_index.groups_for(user_id)
+
+
+async def get_user_submission_asset_ids(user_id: str) -> set[str]:
     """Get asset_ids for the user's own submissions only."""
-    session = SessionLocal()
-    submissions = session.query(Submission).filter(Submission.user_id == user_id).all()
-    asset_ids = {s.asset_id for s in submissions}
-    session.close()
-    return asset_ids
-
-
-def get_user_submissions_with_feedback(user_id: str) -> list[dict]:
-    """Get the user's submissions with their feedback for history context."""
-    session = SessionLocal()
-    submissions = session.query(Submission).filter(Submission.user_id == user_id).all()
-    results = []
-    for sub in submissions:
-        fb = session.query(Feedback).filter(Feedback.submission_id == sub.id).first()
-        rep = session.query(Rep).filter(Rep.id == sub.rep_id).first()
-        results.append({
-            "submission_id": sub.id,
-            "rep_title": rep.prompt_title if rep else "",
-            "rep_prompt": rep.prompt_text if rep else "",
-            "submitted_at": sub.submitted_at,
-            "submission_type": sub.submission_type,
-            "asset_id": sub.asset_id,
-            "feedback_score": fb.score if fb else None,
-            "feedback_text": fb.text if fb else "",
-        })
-    session.close()
-    return results
+    async with AsyncSessionLocal() as session:
+        rows = await session.execute(select(Submission.asset_id).where(Submission.user_id == user_id))
+        return set(rows.scalars().all())
+
+
+async def get_user_submissions_with_feedback(user_id: str) -> list[dict]:
+    """Get the user's submissions with their rep and feedback for history context.
+
+    One joined query; a submission with several feedback rows keeps the first.
+    """
+    async with AsyncSessionLocal() as session:
+        rows = (await session.execute(
+            select(
+                Submission.id, Submission.asset_id, Submission.submitted_at, Submission.submission_type,
+                Rep.prompt_title, Rep.prompt_text, Feedback.score, Feedback.text,
+            )
+            .outerjoin(Rep, Rep.id == Submission.rep_id)
+            .outerjoin(Feedback, Feedback.submission_id == Submission.id)
+            .where(Submission.user_id == user_id)
+            .order_by(Submission.id, Feedback.id)
+        )).all()
+
+    results = {}
+    for sub_id, asset_id, submitted_at, submission_type, rep_title, rep_prompt, score, text in rows:
+        if sub_id in results:
+            continue
+        results[sub_id] = {
+            "submission_id": sub_id,
+            "rep_title": rep_title or "",
+            "rep_prompt": rep_prompt or "",
+            "submitted_at": submitted_at,
+            "submission_type": submission_type,
+            "asset_id": asset_id,
+            "feedback_score": score,
+            "feedback_text": text or "",
+        }
+    return list(results.values())
@@ -0,0 +1,113 @@
+import hashlib
+import re
+import sqlite3
+import time
+import unicodedata
+from array import array
+from config import EMBEDDING_CACHE_PATH, EMBEDDING_CACHE_MAX_ENTRIES
+
+WHITESPACE_RE = re.compile(r"\s+")
+
+
+def normalize_text(text: str) -> str:
+    return WHITESPACE_RE.sub(" ", unicodedata.normalize("NFC", text)).strip()
+
+
+def text_hash(text: str) -> str:
+    return hashlib.sha256(normalize_text(text).encode("utf-8")).hexdigest()
+
+
+class EmbeddingCache:
+    """Content-addressed SQLite store of embeddings keyed by (model, normalized text hash).
+
+    Vectors are stored as packed float32 blobs. When the store grows past
+    `max_entries`, the least recently used rows are evicted.
+    """
+
+    def __init__(self, path: str = EMBEDDING_CACHE_PATH, max_entries: int = EMBEDDING_CACHE_MAX_ENTRIES):
+        self.path = path
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.conn = sqlite3.connect(path, check_same_thread=False)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("""
+            CREATE TABLE IF NOT EXISTS embeddings (
+                model TEXT NOT NULL,
+                text_hash TEXT NOT NULL,
+                dim INTEGER NOT NULL,
+                vector BLOB NOT NULL,
+                last_used REAL NOT NULL,
+                PRIMARY KEY (model, text_hash)
+            )
+        """)
+        self.conn.execute("CREATE INDEX IF NOT EXISTS ix_embeddings_last_used ON embeddings (last_used)")
+        self.conn.commit()
+
+    def get_many(self, model: str, texts: list[str]) -> list[list[float] | None]:
+        """Return cached vectors in input order, with None for misses."""
+        hashes = [text_hash(t) for t in texts]
+        found = {}
+        unique = list(set(hashes))
+        # Stay well under SQLite's bound-parameter limit
+        for start in range(0, len(unique), 500):
+            part = unique[start:start + 500]
+            placeholders = ",".join("?" * len(part))
+            rows = self.conn.execute(
+                f"SELECT text_hash, vector FROM embeddings WHERE model = ? AND text_hash IN ({placeholders})",
+                [model, *part],
+            ).fetchall()
+            for h, blob in rows:
+                found[h] = array("f", blob).tolist()
+
+        if found:
+            now = time.time()
+            self.conn.executemany(
+                "UPDATE embeddings SET last_used = ? WHERE model = ? AND text_hash = ?",
+                [(now, model, h) for h in found],
+            )
+            self.conn.commit()
+
+        results = [found.get(h) for h in hashes]
+        hit_count = sum(1 for r in results if r is not None)
+        self.hits += hit_count
+        self.misses += len(results) - hit_count
+        return results
+
+    def put_many(self, model: str, texts: list[str], vectors: list[list[float]]):
+        now = time.time()
+        self.conn.executemany(
+            "INSERT OR REPLACE INTO embeddings (model, text_hash, dim, vector, last_used) VALUES (?, ?, ?, ?, ?)",
+            [(model, text_hash(t), len(v), array("f", v).tobytes(), now) for t, v in zip(texts, vectors)],
+        )
+        self.conn.commit()
+        self.evict()
+
+    def evict(self):
+        if not self.max_entries:
+            return
+        count = self.conn.execute("SELECT COUNT(*) FROM embeddings").fetchone()[0]
+        overflow = count - self.max_entries
+        if overflow <= 0:
+            return
+        self.conn.execute(
+            "DELETE FROM embeddings WHERE rowid IN "
+            "(SELECT rowid FROM embeddings ORDER BY last_used LIMIT ?)",
+            (overflow,),
+        )
+        self.conn.commit()
+        self.evictions += overflow
+
+    def stats(self) -> dict:
+        lookups = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / lookups, 3) if lookups else 0.0,
+            "evictions": self.evictions,
+            "entries": self.conn.execute("SELECT COUNT(*) FROM embeddings").fetchone()[0],
+        }
+
+    def close(self):
+        self.conn.close()
@@ -0,0 +1,173 @@
+import asyncio
+import zlib
+from abc import ABC, abstractmethod
+from functools import lru_cache
+import numpy as np
+from openai import OpenAI, AsyncOpenAI
+from config import (
+    OPENAI_API_KEY, OPENAI_BASE_URL, EMBEDDING_PROVIDER, EMBEDDING_MODEL, LOCAL_EMBEDDING_DIM, EMBEDDING_DIMENSIONS,
+)
+from services.text import tokenize, STOPWORDS
+
+MAX_INPUT_CHARS = 8000
+
+OPENAI_DIMENSIONS = {"text-embedding-3-small": 1536, "text-embedding-3-large": 3072, "text-embedding-ada-002": 1536}
+
+# Collections ingested before providers were recorded were all built with the OpenAI default
+LEGACY_SIGNATURE = {"embedding_provider": "openai", "embedding_model": "text-embedding-3-small", "embedding_dim": 1536}
+
+
+class IndexMismatchError(RuntimeError):
+    """The index was built by a different embedding provider, model or dimension than the one configured."""
+
+
+class EmbeddingProvider(ABC):
+    """Turns texts into vectors; `name`, `model` and `dim` identify the vector space an index was built in."""
+
+    name = ""
+    # Service whose failures are counted as upstream errors (None for in-process providers)
+    upstream = None
+    # Whether vectors are worth keeping in the on-disk embedding cache
+    cacheable = True
+
+    def __init__(self, model: str, dim: int):
+        self.model = model
+        self.dim = dim
+
+    @property
+    def signature(self) -> dict:
+        """Recorded in every collection's metadata at ingestion."""
+        return {"embedding_provider": self.name, "embedding_model": self.model, "embedding_dim": self.dim}
+
+    @property
+    def cache_key(self) -> str:
+        return f"{self.name}:{self.model}:{self.dim}"
+
+    @abstractmethod
+    def embed(self, texts: list[str]) -> list[list[float]]:
+        """One vector of `dim` floats per text, in input order."""
+
+    @abstractmethod
+    async def aembed(self, texts: list[str]) -> list[list[float]]:
+        """`embed` without blocking the event loop."""
+
+
+class OpenAIProvider(EmbeddingProvider):
+    name = "openai"
+    upstream = "openai"
+
+    def __init__(self, model: str = EMBEDDING_MODEL, dimensions: int | None = EMBEDDING_DIMENSIONS):
+        super().__init__(model, dimensions or OPENAI_DIMENSIONS.get(model, 1536))
+        # Only sent when set: older models reject the parameter
+        self.options = {"dimensions": dimensions} if dimensions else {}
+        self.client = OpenAI(api_key=OPENAI_API_KEY, base_url=OPENAI_BASE_URL)
+        self.async_client = AsyncOpenAI(api_key=OPENAI_API_KEY, base_url=OPENAI_BASE_URL)
+
+    @property
+    def cache_key(self) -> str:
+        # The cache was keyed by model name alone before other providers existed; keep those rows valid
+        return f"{self.model}@{self.dim}" if self.options else self.model
+
+    def embed(self, texts: list[str]) -> list[list[float]]:
+        """Several inputs in one API request, returned in input order."""
+        resp = self.client.embeddings.create(input=[t[:MAX_INPUT_CHARS] for t in texts], model=self.model, **self.options)
+        return [d.embedding for d in sorted(resp.data, key=lambda d: d.index)]
+
+    async def aembed(self, texts: list[str]) -> list[list[float]]:
+        resp = await self.async_client.embeddings.create(input=[t[:MAX_INPUT_CHARS] for t in texts], model=self.model,
+                                                         **self.options)
+        return [d.embedding for d in sorted(resp.data, key=lambda d: d.index)]
+
+
+@lru_cache(maxsize=200_000)
+def _hash(feature: str) -> int:
+    return zlib.crc32(feature.encode("utf-8"))
+
+
+class LocalHashingProvider(EmbeddingProvider):
+    """In-process embeddings with no network, from signed feature hashing.
+
+    Content words, word bigrams and character trigrams are hashed into `dim`
+    buckets with sublinear weights and the rows L2-normalized. Lexical rather
+    than semantic (synonyms do not meet), but deterministic, free and fast
+    enough to embed a query inline; a batch is one scatter into a dense matrix.
+    """
+
+    name = "local"
+    cacheable = False
+    # Inline below this many inputs; larger batches go to a thread
+    INLINE_BATCH = 16
+    WORD_WEIGHT, BIGRAM_WEIGHT, TRIGRAM_WEIGHT = 1.0, 0.5, 0.25
+
+    def __init__(self, model: str = EMBEDDING_MODEL, dim: int = LOCAL_EMBEDDING_DIM):
+        super().__init__(model, dim)
+
+    def _features(self, text: str) -> tuple[list[int], list[float]]:
+        words = [t for t in tokenize(text[:MAX_INPUT_CHARS]) if t not in STOPWORDS]
+        hashes, weights = [], []
+        for word in words:
+            hashes.append(_hash(word))
+            weights.append(self.WORD_WEIGHT)
+            padded = f"#{word}#"
+            for i in range(len(padded) - 2):
+                hashes.append(_hash(padded[i:i + 3]))
+                weights.append(self.TRIGRAM_WEIGHT)
+        for a, b in zip(words, words[1:]):
+            hashes.append(_hash(f"{a} {b}"))
+            weights.append(self.BIGRAM_WEIGHT)
+        return hashes, weights
+
+    def embed_matrix(self, texts: list[str]) -> np.ndarray:
+        rows, hashes, weights = [], [], []
+        for row, text in enumerate(texts):
+            h, w = self._features(text)
+            rows += [row] * len(h)
+            hashes += h
+            weights += w
+        hashed = np.asarray(hashes, dtype=np.int64)
+        # Bucket from the hash modulo dim, sign from its top bit, so collisions cancel rather than pile up
+        values = np.asarray(weights, dtype=np.float64) * np.where(hashed & 0x80000000, -1.0, 1.0)
+        flat = np.asarray(rows, dtype=np.int64) * self.dim + hashed % self.dim
+        matrix = np.bincount(flat, weights=values, minlength=len(texts) * self.dim).reshape(len(texts), self.dim)
+        matrix = np.sign(matrix) * np.log1p(np.abs(matrix))
+        norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+        return (matrix / np.where(norms == 0, 1.0, norms)).astype(np.float32)
+
+    def embed(self, texts: list[str]) -> list[list[float]]:
+        return self.embed_matrix(texts).tolist() if texts else []
+
+    async def aembed(self, texts: list[str]) -> list[list[float]]:
+        if len(texts) > self.INLINE_BATCH:
+            return await asyncio.to_thread(self.embed, texts)
+        return self.embed(texts)
+
+
+PROVIDERS = {"openai": OpenAIProvider, "local": LocalHashingProvider}
+
+
+def make_provider(name: str = EMBEDDING_PROVIDER, **kwargs) -> EmbeddingProvider:
+    if name not in PROVIDERS:
+        raise ValueError(f"Unknown EMBEDDING_PROVIDER {name!r}; expected one of {', '.join(PROVIDERS)}")
+    return PROVIDERS[name](**kwargs)
+
+
+def index_signature(metadata: dict | None) -> dict:
+    """The provider signature a collection was built with (legacy collections carry none)."""
+    metadata = metadata or {}
+    if "embedding_provider" not in metadata:
+        return dict(LEGACY_SIGNATURE)
+    return {key: metadata.get(key) for key in LEGACY_SIGNATURE}
+
+
+def check_index(name: str, metadata: dict | None, embedder: EmbeddingProvider):
+    """Refuse to query an index with vectors from a different provider, model or dimension."""
+    built = index_signature(metadata)
+    if built != embedder.signature:
+        raise IndexMismatchError(
+            f"Collection {name!r} was built with {built['embedding_provider']}/{built['embedding_model']} "
+            f"({built['embedding_dim']} dims) but queries would use {embedder.name}/{embedder.model} "
+            f"({embedder.dim} dims); re-run ingestion or change EMBEDDING_PROVIDER / EMBEDDING_MODEL"
+        )
+
+
+provider = make_provider()
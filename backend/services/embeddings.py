@@ -0,0 +1,165 @@
+import asyncio
+import threading
+import time
+from collections import OrderedDict
+from contextlib import contextmanager
+from contextvars import ContextVar
+from config import QUERY_EMBEDDING_CACHE_SIZE, QUERY_EMBEDDING_TTL_SECONDS, QUERY_EMBEDDING_PERSIST
+from services.embedding_cache import EmbeddingCache, normalize_text
+from services.embedding_providers import EmbeddingProvider, provider
+from services.metrics import stage
+
+_request_memo: ContextVar[dict | None] = ContextVar("embedding_request_memo", default=None)
+
+
+def embed_texts(texts: list[str], embedder: EmbeddingProvider = None) -> list[list[float]]:
+    """Embed several inputs in one batch with the configured provider, returning vectors in input order."""
+    return (embedder or provider).embed(texts)
+
+
+async def aembed_texts(texts: list[str], embedder: EmbeddingProvider = None) -> list[list[float]]:
+    return await (embedder or provider).aembed(texts)
+
+
+class EmbeddingService:
+    """Query embeddings shared by the knowledge, history and recommendation paths.
+
+    Lookups go request memo -> in-process LRU (with TTL) -> optional on-disk
+    cache -> embedding provider, so a query is embedded at most once per request
+    and, while it stays cached, once per deployment.
+    """
+
+    def __init__(self, embedder: EmbeddingProvider = provider, max_entries: int = QUERY_EMBEDDING_CACHE_SIZE,
+                 ttl_seconds: float = QUERY_EMBEDDING_TTL_SECONDS, persist: bool = QUERY_EMBEDDING_PERSIST):
+        self.embedder = embedder
+        self.model = embedder.cache_key
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self.lru: OrderedDict[str, tuple[float, list[float]]] = OrderedDict()
+        self.lock = threading.Lock()
+        self.disk = EmbeddingCache() if persist and embedder.cacheable else None
+        self.stats = {"memo_hits": 0, "lru_hits": 0, "disk_hits": 0, "api_calls": 0}
+
+    def _lru_get(self, key: str) -> list[float] | None:
+        with self.lock:
+            item = self.lru.get(key)
+            if item is None:
+                return None
+            stored_at, vector = item
+            if self.ttl_seconds and time.monotonic() - stored_at > self.ttl_seconds:
+                del self.lru[key]
+                return None
+            self.lru.move_to_end(key)
+            return vector
+
+    def _lru_put(self, key: str, vector: list[float]):
+        if not self.max_entries:
+            return
+        with self.lock:
+            self.lru[key] = (time.monotonic(), vector)
+            self.lru.move_to_end(key)
+            while len(self.lru) > self.max_entries:
+                self.lru.popitem(last=False)
+
+    def _lookup_memory(self, keys: list[str]) -> tuple[list[list[float] | None], list[int]]:
+        memo = _request_memo.get()
+        results: list[list[float] | None] = [None] * len(keys)
+        missing = []
+        for i, key in enumerate(keys):
+            if memo is not None and key in memo:
+                results[i] = memo[key]
+                self.stats["memo_hits"] += 1
+                continue
+            vector = self._lru_get(key)
+            if vector is not None:
+                results[i] = vector
+                self.stats["lru_hits"] += 1
+                continue
+            missing.append(i)
+        return results, missing
+
+    def _lookup_disk(self, keys: list[str], results: list, missing: list[int]) -> list[int]:
+        with self.lock:
+            found = self.disk.get_many(self.model, [keys[i] for i in missing])
+        still_missing = []
+        for i, vector in zip(missing, found):
+            if vector is None:
+                still_missing.append(i)
+            else:
+                results[i] = vector
+                self._lru_put(keys[i], vector)
+                self.stats["disk_hits"] += 1
+        return still_missing
+
+    def _store(self, vectors: dict[str, list[float]]):
+        self.stats["api_calls"] += 1
+        for key, vector in vectors.items():
+            self._lru_put(key, vector)
+        if self.disk is not None:
+            with self.lock:
+                self.disk.put_many(self.model, list(vectors), list(vectors.values()))
+
+    def _finish(self, keys: list[str], results: list, missing: list[int], vectors: dict) -> list[list[float]]:
+        for i in missing:
+            results[i] = vectors[keys[i]]
+        memo = _request_memo.get()
+        if memo is not None:
+            for key, vector in zip(keys, results):
+                memo[key] = vector
+        return results
+
+    def embed(self, text: str) -> list[float]:
+        return self.embed_many([text])[0]
+
+    def embed_many(self, texts: list[str]) -> list[list[float]]:
+        keys = [normalize_text(t) for t in texts]
+        results, missing = self._lookup_memory(keys)
+        if missing and self.disk is not None:
+            missing = self._lookup_disk(keys, results, missing)
+        vectors = {}
+        if missing:
+            # Deduplicate so repeated texts in one call cost a single input
+            unique = list(dict.fromkeys(keys[i] for i in missing))
+            vectors = dict(zip(unique, embed_texts(unique, self.embedder)))
+            self._store(vectors)
+        return self._finish(keys, results, missing, vectors)
+
+    async def aembed(self, text: str) -> list[float]:
+        return (await self.aembed_many([text]))[0]
+
+    async def aembed_many(self, texts: list[str]) -> list[list[float]]:
+        keys = [normalize_text(t) for t in texts]
+        results, missing = self._lookup_memory(keys)
+        if missing and self.disk is not None:
+            missing = await asyncio.to_thread(self._lookup_disk, keys, results, missing)
+        vectors = {}
+        if missing:
+            unique = list(dict.fromkeys(keys[i] for i in missing))
+            with stage("embed", upstream=self.embedder.upstream):
+                vectors = dict(zip(unique, await aembed_texts(unique, self.embedder)))
+            if self.disk is not None:
+                await asyncio.to_thread(self._store, vectors)
+            else:
+                self._store(vectors)
+        return self._finish(keys, results, missing, vectors)
+
+
+@contextmanager
+def request_scope():
+    """Memoize query embeddings for the duration of one request."""
+    token = _request_memo.set({})
+    try:
+        yield
+    finally:
+        _request_memo.reset(token)
+
+
+embedding_service = EmbeddingService()
+
+
+def embed_query(text: str) -> list[float]:
+    return embedding_service.embed(text)
+
+
+async def aembed_query(text: str) -> list[float]:
+    return await embedding_service.aembed(text)
@@ -0,0 +1,314 @@
+import json
+import os
+import shutil
+import threading
+from pathlib import Path
+import numpy as np
+from config import (
+    EXACT_INDEX_DIR, VECTOR_ENGINE, VECTOR_EXACT_MAX_ROWS, VECTOR_EXACT_MAX_SELECTIVITY,
+    VECTOR_QUANTIZATION, VECTOR_RESCORE_FACTOR,
+)
+from services.embedding_providers import provider, index_signature, check_index
+from services.metrics import vector_queries_total
+from services.vector_store import vector_store
+
+# Rows fetched from Chroma per `get` while exporting
+EXPORT_BATCH = 5000
+# Quantized rows widened to float32 per block when scoring, bounding the temporary copy
+SCORE_BLOCK = 1024
+QUANTIZATIONS = ("none", "float16", "int8")
+
+
+def quantize(vectors: np.ndarray, kind: str) -> tuple[np.ndarray, np.ndarray | None]:
+    """Compact codes for float32 rows: float16, or int8 with a per-row scale (max |component| / 127)."""
+    if kind == "float16":
+        return vectors.astype(np.float16), None
+    if kind == "int8":
+        scales = np.abs(vectors).max(axis=1) / 127
+        scales[scales == 0] = 1.0
+        return np.rint(vectors / scales[:, None]).astype(np.int8), scales.astype(np.float32)
+    raise ValueError(f"Unknown VECTOR_QUANTIZATION {kind!r}; expected one of {', '.join(QUANTIZATIONS)}")
+
+
+def quantized_scores(codes: np.ndarray, scales: np.ndarray | None, query: np.ndarray) -> np.ndarray:
+    """Approximate dot products of quantized rows with a float32 query (or a dim x m matrix of queries)."""
+    scores = np.empty((len(codes),) + query.shape[1:], dtype=np.float32)
+    for start in range(0, len(codes), SCORE_BLOCK):
+        scores[start:start + SCORE_BLOCK] = codes[start:start + SCORE_BLOCK].astype(np.float32) @ query
+    if scales is None:
+        return scores
+    return scores * (scales if query.ndim == 1 else scales[:, None])
+
+
+def _link(src: Path, dst: Path):
+    try:
+        os.link(src, dst)
+    except OSError:
+        shutil.copyfile(src, dst)
+
+
+def _write_codes(target: Path, name: str, vectors: np.ndarray, kind: str):
+    codes, scales = quantize(vectors, kind)
+    np.save(target / f"{name}.{kind}.npy", codes)
+    if scales is not None:
+        np.save(target / f"{name}.{kind}.scale.npy", scales)
+
+
+def _export(collection, target: Path, quantization: str):
+    listed = collection.get(include=["metadatas"])
+    if not listed["ids"]:
+        return
+    # Group rows by asset so each asset is one contiguous row range
+    order = sorted(zip((m.get("asset_id", "") for m in listed["metadatas"]), listed["ids"]))
+    ids = [cid for _, cid in order]
+    dim = index_signature(collection.metadata)["embedding_dim"]
+    matrix = np.lib.format.open_memmap(target / f"{collection.name}.npy", mode="w+", dtype=np.float32,
+                                       shape=(len(ids), dim))
+    for start in range(0, len(ids), EXPORT_BATCH):
+        part = ids[start:start + EXPORT_BATCH]
+        fetched = collection.get(ids=part, include=["embeddings"])
+        by_id = dict(zip(fetched["ids"], fetched["embeddings"]))
+        block = np.asarray([by_id[cid] for cid in part], dtype=np.float32)
+        norms = np.linalg.norm(block, axis=1, keepdims=True)
+        matrix[start:start + len(part)] = block / np.where(norms == 0, 1.0, norms)
+    matrix.flush()
+    if quantization != "none":
+        _write_codes(target, collection.name, matrix, quantization)
+    del matrix
+
+    assets, starts = [], []
+    for row, (asset_id, _) in enumerate(order):
+        if not assets or assets[-1] != asset_id:
+            assets.append(asset_id)
+            starts.append(row)
+    with open(target / f"{collection.name}.json", "w") as f:
+        json.dump({"signature": index_signature(collection.metadata), "ids": ids, "assets": assets, "starts": starts}, f)
+
+
+def export_collections(chroma, generation: int, changed: set[str] = None, root: str = EXACT_INDEX_DIR,
+                       quantization: str = VECTOR_QUANTIZATION) -> int:
+    """Write every collection's vectors for `generation`, before it is published.
+
+    Each collection becomes an L2-normalized float32 `.npy` matrix with rows
+    grouped by asset, plus a JSON sidecar of row ids and asset row offsets, and
+    with `quantization` its compact codes. With `changed` (an incremental run),
+    other collections are hard-linked from the previous generation. Returns the
+    number of collections written.
+    """
+    base = Path(root)
+    target = base / str(generation)
+    shutil.rmtree(target, ignore_errors=True)
+    target.mkdir(parents=True)
+    generations = sorted(int(p.name) for p in base.iterdir() if p.name.isdigit() and int(p.name) < generation)
+    previous = base / str(generations[-1]) if generations else None
+    written = 0
+    for collection in chroma.list_collections():
+        name = collection.name
+        if changed is not None and name not in changed and previous and (previous / f"{name}.json").exists():
+            for path in previous.glob(f"{name}.*"):
+                _link(path, target / path.name)
+            if quantization != "none" and not (target / f"{name}.{quantization}.npy").exists():
+                _write_codes(target, name, np.load(target / f"{name}.npy", mmap_mode="r"), quantization)
+            continue
+        _export(collection, target, quantization)
+        written += 1
+    # Servers still on the previous generation keep reading it until they notice the new one
+    for old in generations[:-1]:
+        shutil.rmtree(base / str(old), ignore_errors=True)
+    return written
+
+
+class _Matrix:
+    def __init__(self, directory: Path, name: str, quantization: str = "none"):
+        with open(directory / f"{name}.json") as f:
+            info = json.load(f)
+        self.vectors = np.load(directory / f"{name}.npy", mmap_mode="r")
+        self.codes = self.scales = None
+        if quantization != "none":
+            path = directory / f"{name}.{quantization}.npy"
+            if path.exists():
+                self.codes = np.load(path, mmap_mode="r")
+                scale_path = directory / f"{name}.{quantization}.scale.npy"
+                self.scales = np.load(scale_path) if scale_path.exists() else None
+            else:
+                # Exported without this quantization: build the codes in memory
+                self.codes, self.scales = quantize(np.asarray(self.vectors), quantization)
+        self.ids: list[str] = info["ids"]
+        self.rows = {cid: row for row, cid in enumerate(self.ids)}
+        ends = info["starts"][1:] + [len(self.ids)]
+        self.ranges = dict(zip(info["assets"], zip(info["starts"], ends)))
+        self.signature = info["signature"]
+
+    def allowed_rows(self, asset_ids) -> int:
+        return sum(end - start for start, end in (self.ranges.get(a, (0, 0)) for a in asset_ids))
+
+    def scores(self, rows: np.ndarray | None, query: np.ndarray) -> np.ndarray:
+        """Scores of `rows` (every row when None); approximate when the matrix is quantized."""
+        if self.codes is None:
+            return (self.vectors if rows is None else self.vectors[rows]) @ query
+        if rows is None:
+            return quantized_scores(self.codes, self.scales, query)
+        return quantized_scores(self.codes[rows], None if self.scales is None else self.scales[rows], query)
+
+    def bitmap(self, asset_ids) -> np.ndarray:
+        mask = np.zeros(len(self.ids), dtype=bool)
+        for asset_id in asset_ids:
+            start, end = self.ranges.get(asset_id, (0, 0))
+            mask[start:end] = True
+        return mask
+
+
+def _normalized(vector) -> np.ndarray:
+    query = np.asarray(vector, dtype=np.float32)
+    return query / (np.linalg.norm(query) or 1.0)
+
+
+def _top(scores: np.ndarray, k: int) -> np.ndarray:
+    """Indices of the `k` highest scores, best first."""
+    top = np.argpartition(-scores, k - 1)[:k]
+    return top[np.argsort(-scores[top], kind="stable")]
+
+
+class ExactIndex:
+    """Exact vector search over the memory-mapped matrices written by ingestion.
+
+    A query marks the row ranges of the assets the user may read in a row
+    bitmap and scores those rows with one matrix-vector product. When most
+    rows are allowed it scores the whole matrix and masks instead of gathering.
+    Results are complete for any filter, which filtered HNSW does not
+    guarantee. With `quantization` the first pass reads the compact codes and
+    the best `rescore_factor` x K rows are rescored from the float32 matrix,
+    which then stays on disk except for those rows. Matrices are reopened
+    when a new index generation is published.
+    """
+
+    def __init__(self, root: str = EXACT_INDEX_DIR, embedder=provider, engine: str = VECTOR_ENGINE,
+                 max_rows: int = VECTOR_EXACT_MAX_ROWS, max_selectivity: float = VECTOR_EXACT_MAX_SELECTIVITY,
+                 quantization: str = VECTOR_QUANTIZATION, rescore_factor: int = VECTOR_RESCORE_FACTOR):
+        if quantization not in QUANTIZATIONS:
+            raise ValueError(f"Unknown VECTOR_QUANTIZATION {quantization!r}; expected one of {', '.join(QUANTIZATIONS)}")
+        self.root = Path(root)
+        self.quantization = quantization
+        self.rescore_factor = rescore_factor
+        self.embedder = embedder
+        self.engine = engine
+        self.max_rows = max_rows
+        self.max_selectivity = max_selectivity
+        self.lock = threading.Lock()
+        self.generation = None
+        self.matrices: dict[str, _Matrix | None] = {}
+
+    def matrix(self, name: str) -> _Matrix | None:
+        """The collection's matrix, or None if the current generation has none (e.g. built before exports)."""
+        generation = vector_store.current_generation()
+        with self.lock:
+            if generation != self.generation:
+                self.matrices = {}
+                self.generation = generation
+            if name not in self.matrices:
+                directory = self.root / str(generation)
+                if not (directory / f"{name}.json").exists():
+                    self.matrices[name] = None
+                else:
+                    matrix = _Matrix(directory, name, self.quantization)
+                    check_index(name, matrix.signature, self.embedder)
+                    self.matrices[name] = matrix
+            return self.matrices[name]
+
+    def choose(self, name: str, asset_ids) -> str:
+        """"exact" or "chroma" for a query over `asset_ids`, by the configured engine and the filter's selectivity."""
+        if self.engine == "chroma":
+            return "chroma"
+        matrix = self.matrix(name)
+        if matrix is None or not len(matrix.ids):
+            return "chroma"
+        if self.engine == "exact":
+            return "exact"
+        allowed = matrix.allowed_rows(asset_ids)
+        return "exact" if allowed <= self.max_rows or allowed / len(matrix.ids) <= self.max_selectivity else "chroma"
+
+    def search(self, name: str, query_embedding, asset_ids, n_results: int) -> list[tuple[str, float]]:
+        """Top `n_results` (chunk id, cosine distance) among rows of `asset_ids`, nearest first."""
+        return self.search_many(name, [query_embedding], asset_ids, n_results)[0]
+
+    def search_many(self, name: str, query_embeddings: list, asset_ids, n_results: int) -> list[list[tuple[str, float]]]:
+        """`search` for several queries over the same assets: one bitmap and one matrix-matrix product."""
+        matrix = self.matrix(name)
+        mask = matrix.bitmap(asset_ids)
+        allowed = np.flatnonzero(mask)
+        if not len(allowed):
+            return [[] for _ in query_embeddings]
+        queries = np.stack([_normalized(q) for q in query_embeddings], axis=1)
+        if len(allowed) * 2 > len(mask):
+            scores = matrix.scores(None, queries)
+            scores[~mask] = -np.inf
+            rows = np.arange(len(mask))
+        else:
+            scores = matrix.scores(allowed, queries)
+            rows = allowed
+        k = min(n_results, len(allowed))
+        found = []
+        for j in range(queries.shape[1]):
+            column, candidates = scores[:, j], rows
+            if matrix.codes is not None and self.rescore_factor:
+                candidates = rows[_top(column, min(len(allowed), k * self.rescore_factor))]
+                column = matrix.vectors[candidates] @ queries[:, j]
+            found.append([(matrix.ids[candidates[i]], 1 - float(column[i])) for i in _top(column, k)])
+        return found
+
+    def distances(self, name: str, ids: list[str], query_embedding) -> dict[str, float] | None:
+        """Cosine distances for specific chunks, or None when there is no matrix to read them from."""
+        matrix = self.matrix(name) if self.engine != "chroma" else None
+        if matrix is None:
+            return None
+        rows = [matrix.rows[cid] for cid in ids if cid in matrix.rows]
+        scores = matrix.vectors[rows] @ _normalized(query_embedding) if rows else []
+        return {matrix.ids[row]: 1 - float(score) for row, score in zip(rows, scores)}
+
+    def warm_up(self) -> dict[str, int]:
+        """Open every exported matrix of the current generation and page in what the first pass reads."""
+        if self.engine == "chroma":
+            return {}
+        directory = self.root / str(vector_store.current_generation())
+        counts = {}
+        for path in sorted(directory.glob("*.json")) if directory.exists() else []:
+            matrix = self.matrix(path.stem)
+            float(np.asarray(matrix.vectors if matrix.codes is None else matrix.codes).sum())
+            counts[path.stem] = len(matrix.ids)
+        return counts
+
+
+exact_index = ExactIndex()
+
+
+def query_collection(collection, name: str, query_embedding, asset_ids, where: dict | None, n_results: int,
+                     include: list[str]) -> tuple[dict, str]:
+    """Chroma-shaped query results from whichever engine suits the filter, and the engine used.
+
+    `asset_ids` (for the exact engine) and `where` (for Chroma) must select the same rows.
+    """
+    return query_collection_many(collection, name, [query_embedding], asset_ids, where, n_results, include)
+
+
+def query_collection_many(collection, name: str, query_embeddings: list, asset_ids, where: dict | None,
+                          n_results: int, include: list[str]) -> tuple[dict, str]:
+    """`query_collection` for several queries under one filter: one result row per query, one engine call."""
+    engine = exact_index.choose(name, asset_ids)
+    vector_queries_total.inc(engine=engine)
+    if engine == "chroma":
+        return collection.query(query_embeddings=list(query_embeddings), where=where, n_results=n_results,
+                                include=include), engine
+
+    found = exact_index.search_many(name, query_embeddings, asset_ids, n_results)
+    fields = [field for field in include if field != "distances"]
+    ids = list(dict.fromkeys(cid for hits in found for cid, _ in hits))
+    fetched = collection.get(ids=ids, include=fields) if ids else {"ids": []}
+    position = {cid: i for i, cid in enumerate(fetched["ids"])}
+    found = [[(cid, dist) for cid, dist in hits if cid in position] for hits in found]
+    results = {"ids": [[cid for cid, _ in hits] for hits in found]}
+    for field in include:
+        if field == "distances":
+            results["distances"] = [[dist for _, dist in hits] for hits in found]
+        else:
+            results[field] = [[fetched[field][position[cid]] for cid, _ in hits] for hits in found]
+    return results, engine
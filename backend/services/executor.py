@@ -0,0 +1,13 @@
+import asyncio
+import functools
+from concurrent.futures import ThreadPoolExecutor
+from config import BLOCKING_IO_WORKERS
+
+# Bounded pool for blocking vector-store calls so they never run on the event loop
+# and a burst of requests cannot spawn unbounded threads
+_executor = ThreadPoolExecutor(max_workers=BLOCKING_IO_WORKERS, thread_name_prefix="blocking-io")
+
+
+async def run_blocking(fn, *args, **kwargs):
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(_executor, functools.partial(fn, *args, **kwargs))
@@ -0,0 +1,210 @@
+import hashlib
+import json
+import sqlite3
+import threading
+from collections import Counter
+from config import LEXICAL_INDEX_PATH
+
+# Bumped whenever the layout below changes; an index from an older layout starts empty and the next ingestion
+# run refills it
+SCHEMA_VERSION = 2
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS chunks (
+    rowid INTEGER PRIMARY KEY,
+    id TEXT NOT NULL UNIQUE,
+    collection TEXT NOT NULL,
+    asset_id TEXT NOT NULL,
+    company_id TEXT NOT NULL,
+    access_group TEXT,
+    scope TEXT NOT NULL,
+    metadata TEXT NOT NULL,
+    text TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS ix_chunks_collection_asset ON chunks (collection, asset_id);
+CREATE VIRTUAL TABLE IF NOT EXISTS chunks_fts USING fts5(
+    text, scope, content='chunks', content_rowid='rowid', tokenize='porter unicode61'
+);
+CREATE TRIGGER IF NOT EXISTS chunks_ai AFTER INSERT ON chunks BEGIN
+    INSERT INTO chunks_fts(rowid, text, scope) VALUES (new.rowid, new.text, new.scope);
+END;
+CREATE TRIGGER IF NOT EXISTS chunks_ad AFTER DELETE ON chunks BEGIN
+    INSERT INTO chunks_fts(chunks_fts, rowid, text, scope) VALUES ('delete', old.rowid, old.text, old.scope);
+END;
+CREATE TABLE IF NOT EXISTS term_df (
+    collection TEXT NOT NULL,
+    term TEXT NOT NULL,
+    df INTEGER NOT NULL,
+    PRIMARY KEY (collection, term)
+) WITHOUT ROWID;
+CREATE TABLE IF NOT EXISTS collection_sizes (collection TEXT PRIMARY KEY, chunks INTEGER NOT NULL);
+CREATE VIRTUAL TABLE IF NOT EXISTS temp.terms USING fts5(text, tokenize='porter unicode61');
+CREATE VIRTUAL TABLE IF NOT EXISTS temp.terms_rows USING fts5vocab(temp, terms, row);
+CREATE VIRTUAL TABLE IF NOT EXISTS temp.terms_instances USING fts5vocab(temp, terms, instance);
+"""
+
+DROP_SCHEMA = """
+DROP TRIGGER IF EXISTS chunks_ai;
+DROP TRIGGER IF EXISTS chunks_ad;
+DROP TABLE IF EXISTS chunks_fts;
+DROP TABLE IF EXISTS chunks;
+DROP TABLE IF EXISTS term_df;
+DROP TABLE IF EXISTS collection_sizes;
+"""
+
+
+def match_expression(terms: list[str], operator: str = "OR") -> str:
+    """FTS5 query over `terms`, each quoted so user text is never parsed as query syntax."""
+    return f" {operator} ".join('"' + t.replace('"', '""') + '"' for t in terms)
+
+
+def scope_token(kind: str, value: str) -> str:
+    """One FTS5 token standing for a collection ("c") or access group ("g"), digits after the prefix so the porter
+    stemmer leaves it alone."""
+    return kind + str(int.from_bytes(hashlib.blake2b(value.encode(), digest_size=8).digest(), "big"))
+
+
+def chunk_scope(collection: str, access_group: str | None) -> str:
+    return " ".join([scope_token("c", collection), *([scope_token("g", access_group)] if access_group else [])])
+
+
+class LexicalIndex:
+    """SQLite FTS5 (BM25) index of every ingested chunk, next to the Chroma collections.
+
+    Rows carry the same collection, asset_id, company_id and access_group as
+    the vectors, so lexical queries are scoped and filtered exactly like vector
+    queries; both are also tokens of an indexed `scope` column, so the MATCH
+    itself only visits the collection's accessible chunks. Per-collection
+    document frequencies of every indexed term are kept alongside. Ingestion
+    writes it in one transaction before publishing a new index generation;
+    readers use one connection per thread.
+    """
+
+    def __init__(self, path: str = LEXICAL_INDEX_PATH):
+        self.path = path
+        self.local = threading.local()
+
+    def _conn(self) -> sqlite3.Connection:
+        conn = getattr(self.local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path)
+            conn.execute("PRAGMA journal_mode=WAL")
+            if conn.execute("PRAGMA user_version").fetchone()[0] != SCHEMA_VERSION:
+                conn.executescript(DROP_SCHEMA + f"PRAGMA user_version = {SCHEMA_VERSION};")
+            conn.executescript(SCHEMA)
+            self.local.conn = conn
+        return conn
+
+    def reset(self):
+        conn = self._conn()
+        conn.execute("DELETE FROM chunks")
+        conn.execute("INSERT INTO chunks_fts(chunks_fts) VALUES ('rebuild')")
+        conn.execute("DELETE FROM term_df")
+        conn.execute("DELETE FROM collection_sizes")
+        conn.commit()
+
+    def asset_ids(self) -> set[str]:
+        return {row[0] for row in self._conn().execute("SELECT DISTINCT asset_id FROM chunks")}
+
+    def _tokenize(self, texts: list[str]):
+        """Load `texts` into the scratch FTS5 table, which tokenizes (and stems) them exactly like the index."""
+        conn = self._conn()
+        conn.execute("DELETE FROM temp.terms")
+        conn.executemany("INSERT INTO temp.terms (rowid, text) VALUES (?, ?)", enumerate(texts, start=1))
+        return conn
+
+    def _document_frequencies(self, texts: list[str]) -> dict[str, int]:
+        """How many of `texts` contain each term."""
+        return dict(self._tokenize(texts).execute("SELECT term, doc FROM temp.terms_rows"))
+
+    def _terms(self, texts: list[str]) -> list[set[str]]:
+        """The terms of each text."""
+        terms = [set() for _ in texts]
+        for term, doc in self._tokenize(texts).execute("SELECT DISTINCT term, doc FROM temp.terms_instances"):
+            terms[doc - 1].add(term)
+        return terms
+
+    def write(self, records: list[dict], stale_ids: list[str] = ()):
+        """Delete `stale_ids`, then insert or replace `records` (ingestion chunk records), in one transaction."""
+        conn = self._conn()
+        with conn:
+            # Delete-then-insert rather than INSERT OR REPLACE, whose implicit deletes skip the FTS trigger
+            ids = [*stale_ids, *(r["id"] for r in records)]
+            removed = []
+            for start in range(0, len(ids), 500):
+                part = ids[start:start + 500]
+                removed += conn.execute(
+                    f"SELECT collection, text FROM chunks WHERE id IN ({','.join('?' * len(part))})", part).fetchall()
+            conn.executemany("DELETE FROM chunks WHERE id = ?", [(i,) for i in ids])
+            conn.executemany(
+                "INSERT INTO chunks (id, collection, asset_id, company_id, access_group, scope, metadata, text) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                [(r["id"], r["collection"], r["metadata"].get("asset_id", ""), r["metadata"].get("company_id", ""),
+                  r["metadata"].get("access_group"), chunk_scope(r["collection"], r["metadata"].get("access_group")),
+                  json.dumps(r["metadata"]), r["text"]) for r in records],
+            )
+            texts = {}
+            for sign, rows in ((-1, removed), (1, [(r["collection"], r["text"]) for r in records])):
+                for collection, text in rows:
+                    texts.setdefault((sign, collection), []).append(text)
+            sizes, df = Counter(), Counter()
+            for (sign, collection), part in texts.items():
+                sizes[collection] += sign * len(part)
+                for term, n in self._document_frequencies(part).items():
+                    df[collection, term] += sign * n
+            conn.executemany(
+                "INSERT INTO term_df (collection, term, df) VALUES (?, ?, ?) "
+                "ON CONFLICT (collection, term) DO UPDATE SET df = df + excluded.df",
+                [(*key, n) for key, n in df.items() if n])
+            conn.execute("DELETE FROM term_df WHERE df <= 0")
+            conn.executemany(
+                "INSERT INTO collection_sizes (collection, chunks) VALUES (?, ?) "
+                "ON CONFLICT (collection) DO UPDATE SET chunks = chunks + excluded.chunks",
+                [(collection, n) for collection, n in sizes.items() if n])
+
+    def search(self, collection: str, access_groups, terms: list[str], limit: int,
+               operator: str = "OR") -> list[dict]:
+        """Best BM25 matches for `terms` in `collection`, restricted to chunks of `access_groups`."""
+        groups = sorted(access_groups)
+        if not terms or not groups:
+            return []
+        match = (f"scope : {scope_token('c', collection)} "
+                 f"AND scope : ({' OR '.join(scope_token('g', g) for g in groups)}) "
+                 f"AND text : ({match_expression(terms, operator)})")
+        # Rank inside FTS5 (the scope column weighs nothing) and join only the top rows back to their chunks
+        rows = self._conn().execute(
+            "SELECT c.id, c.metadata, c.text, hits.score FROM ("
+            "SELECT rowid, bm25(chunks_fts, 1.0, 0.0) AS score FROM chunks_fts WHERE chunks_fts MATCH ? "
+            "ORDER BY score LIMIT ?) AS hits JOIN chunks c ON c.rowid = hits.rowid ORDER BY hits.score",
+            (match, limit),
+        ).fetchall()
+        # FTS5's bm25() is negated so that ascending order is best-first; report positive scores
+        return [{"id": i, "metadata": json.loads(meta), "text": text, "score": -score}
+                for i, meta, text, score in rows]
+
+    def term_ratios(self, collection: str, terms: list[str]) -> dict[str, float]:
+        """Share of the collection's chunks that contain each term (a document-frequency estimate of rarity).
+
+        Read from the frequencies kept at ingestion; a term the tokenizer splits
+        ("covid-19") counts as its rarest part, an upper bound on the phrase.
+        """
+        conn = self._conn()
+        with conn:
+            row = conn.execute("SELECT chunks FROM collection_sizes WHERE collection = ?", (collection,)).fetchone()
+            if not row or not row[0] or not terms:
+                return {t: 1.0 for t in terms}
+            parts = self._terms(terms)
+            wanted = sorted(set().union(*parts))
+            df = dict(conn.execute(
+                f"SELECT term, df FROM term_df WHERE collection = ? AND term IN ({','.join('?' * len(wanted))})",
+                [collection, *wanted]))
+        return {t: min((df.get(p, 0) for p in part), default=0) / row[0] for t, part in zip(terms, parts)}
+
+    def close(self):
+        conn = getattr(self.local, "conn", None)
+        if conn is not None:
+            conn.close()
+            self.local.conn = None
+
+
+lexical_index = LexicalIndex()
@@ -0,0 +1,180 @@
+import asyncio
+import threading
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+# Seconds; spans in-process stages (sub-millisecond) up to full LLM answers
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+_current_timer: ContextVar["StageTimer | None"] = ContextVar("stage_timer", default=None)
+
+
+def _escape(value) -> str:
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _labels(names: tuple[str, ...], values: tuple, extra: str = "") -> str:
+    pairs = [f'{n}="{_escape(v)}"' for n, v in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+class Counter:
+    def __init__(self, name: str, help: str, labelnames: tuple[str, ...] = ()):
+        self.name, self.help, self.labelnames = name, help, labelnames
+        self.values: dict[tuple, float] = {}
+        self.lock = threading.Lock()
+
+    def inc(self, amount: float = 1, **labels):
+        key = tuple(labels.get(n, "") for n in self.labelnames)
+        with self.lock:
+            self.values[key] = self.values.get(key, 0) + amount
+
+    def render(self) -> list[str]:
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} counter"]
+        with self.lock:
+            for key, value in sorted(self.values.items()):
+                lines.append(f"{self.name}{_labels(self.labelnames, key)} {value:g}")
+        return lines
+
+
+class Histogram:
+    def __init__(self, name: str, help: str, labelnames: tuple[str, ...] = (), buckets: tuple = LATENCY_BUCKETS):
+        self.name, self.help, self.labelnames, self.buckets = name, help, labelnames, buckets
+        # label values -> [per-bucket counts (non-cumulative) + overflow, sum, count]
+        self.series: dict[tuple, list] = {}
+        self.lock = threading.Lock()
+
+    def observe(self, value: float, **labels):
+        key = tuple(labels.get(n, "") for n in self.labelnames)
+        index = next((i for i, bound in enumerate(self.buckets) if value <= bound), len(self.buckets))
+        with self.lock:
+            series = self.series.setdefault(key, [[0] * (len(self.buckets) + 1), 0.0, 0])
+            series[0][index] += 1
+            series[1] += value
+            series[2] += 1
+
+    def render(self) -> list[str]:
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} histogram"]
+        with self.lock:
+            for key, (counts, total, count) in sorted(self.series.items()):
+                cumulative = 0
+                for bound, n in zip((*self.buckets, "+Inf"), counts):
+                    cumulative += n
+                    le = 'le="%s"' % (bound if bound == "+Inf" else f"{bound:g}")
+                    lines.append(f"{self.name}_bucket{_labels(self.labelnames, key, le)} {cumulative}")
+                lines.append(f"{self.name}_sum{_labels(self.labelnames, key)} {total:.6f}")
+                lines.append(f"{self.name}_count{_labels(self.labelnames, key)} {count}")
+        return lines
+
+
+class Registry:
+    """Metrics in the Prometheus text exposition format, without a client library.
+
+    Counters and histograms are registered once at import; collectors are
+    callables returning (name, type, help, [(labels dict, value)]) for values
+    owned elsewhere (cache statistics), read at scrape time.
+    """
+
+    def __init__(self):
+        self.metrics: list = []
+        self.collectors: list = []
+
+    def counter(self, name: str, help: str, labelnames: tuple[str, ...] = ()) -> Counter:
+        metric = Counter(name, help, labelnames)
+        self.metrics.append(metric)
+        return metric
+
+    def histogram(self, name: str, help: str, labelnames: tuple[str, ...] = ()) -> Histogram:
+        metric = Histogram(name, help, labelnames)
+        self.metrics.append(metric)
+        return metric
+
+    def collector(self, fn):
+        self.collectors.append(fn)
+        return fn
+
+    def render(self) -> str:
+        lines = []
+        for metric in self.metrics:
+            lines += metric.render()
+        for fn in self.collectors:
+            for name, kind, help, samples in fn():
+                lines += [f"# HELP {name} {help}", f"# TYPE {name} {kind}"]
+                for labels, value in samples:
+                    lines.append(f"{name}{_labels(tuple(labels), tuple(labels.values()))} {value:g}")
+        return "\n".join(lines) + "\n"
+
+
+metrics = Registry()
+stage_seconds = metrics.histogram("search_stage_seconds", "Duration of each /api/search stage.", ("stage",))
+request_seconds = metrics.histogram("search_request_seconds", "Duration of /api/search streams by intent.", ("intent",))
+intents_total = metrics.counter("search_intents_total", "Classified search queries.", ("intent", "classifier"))
+upstream_errors_total = metrics.counter("upstream_errors_total", "Failed calls to OpenAI or Chroma.", ("service", "stage"))
+vector_queries_total = metrics.counter("vector_queries_total", "Vector queries by engine (exact scan or Chroma HNSW).", ("engine",))
+
+
+class StageTimer:
+    """Wall-clock milliseconds per stage of one search request.
+
+    A stage entered more than once (or by both speculative branches) accumulates.
+    """
+
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.stages: dict[str, float] = {}
+        self.intent = ""
+
+    def add(self, name: str, seconds: float):
+        self.stages[name] = self.stages.get(name, 0.0) + seconds * 1000
+
+    def report(self) -> dict:
+        return {
+            "total_ms": round((time.perf_counter() - self.started) * 1000, 1),
+            "stages": {name: round(ms, 1) for name, ms in self.stages.items()},
+        }
+
+    def server_timing(self) -> str:
+        """The stages as a `Server-Timing` header value."""
+        return ", ".join(f"{name};dur={ms:.1f}" for name, ms in self.stages.items())
+
+
+def current_timer() -> StageTimer | None:
+    return _current_timer.get()
+
+
+@contextmanager
+def timing_scope(timer: StageTimer = None):
+    """Collect stage timings for the duration of one request (tasks started inside share the timer)."""
+    timer = timer or StageTimer()
+    token = _current_timer.set(timer)
+    try:
+        yield timer
+    finally:
+        _current_timer.reset(token)
+
+
+def record_stage(name: str, seconds: float):
+    stage_seconds.observe(seconds, stage=name)
+    timer = _current_timer.get()
+    if timer is not None:
+        timer.add(name, seconds)
+
+
+@contextmanager
+def stage(name: str, upstream: str = None):
+    """Time a stage into the request's timer and the stage histogram; count failures of `upstream` calls."""
+    started = time.perf_counter()
+    try:
+        yield
+    except asyncio.CancelledError:
+        # A cancelled speculative branch did not finish the stage; leave it out of the latency data
+        raise
+    except Exception:
+        if upstream:
+            upstream_errors_total.inc(service=upstream, stage=name)
+        record_stage(name, time.perf_counter() - started)
+        raise
+    record_stage(name, time.perf_counter() - started)
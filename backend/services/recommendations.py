@@ -1,68 +1,49 @@
-import chromadb
-from openai import OpenAI
-from config import CHROMA_PERSIST_DIR, OPENAI_API_KEY, EMBEDDING_MODEL
-from services.auth import get_user_accessible_asset_ids
-from database.models import SessionLocal, Asset, Rep, Play
-
-client = OpenAI(api_key=OPENAI_API_KEY)
-
-
-def get_recommendations(query: str, user_id: str, company_id: str, exclude_asset_ids: set[str] = None) -> list[dict]:
-    accessible_asset_ids = get_user_accessible_asset_ids(user_id)
-    if not accessible_asset_ids:
-        return []
-
-    if exclude_asset_ids:
-        search_ids = accessible_asset_ids - exclude_asset_ids
-    else:
-        search_ids = accessible_asset_ids
-
-    if not search_ids:
-        return []
-
-    chroma = chromadb.PersistentClient(path=CHROMA_PERSIST_DIR)
-    collection = chroma.get_collection("knowledge")
-
-    resp = client.embeddings.create(input=[query[:8000]], model=EMBEDDING_MODEL)
-    query_embedding = resp.data[0].embedding
-
-    where_filter = {
-        "$and": [
-            {"company_id": {"$eq": company_id}},
-            {"asset_id": {"$in": list(search_ids)}},
-        ]
-    }
-
-    results = collection.query(
-        query_embeddings=[query_embedding],
-        where=where_filter,
-        n_results=5,
-        include=["metadatas", "distances"],
-    )
-
-    if not results["metadatas"] or not results["metadatas"][0]:
-        return []
-
-    # Deduplicate by asset_id and map to reps/plays
+from config import RECOMMENDATION_LIMIT
+from services.auth import get_user_accessible_asset_ids, get_user_access_groups
+from services.embeddings import aembed_query
+from services.executor import run_blocking
+from services.vector_store import vector_store, collection_name, access_group_filter
+from services.exact_index import query_collection
+from sqlalchemy import select
+from database.models import AsyncSessionLocal, Asset, Rep, Play
+
+
+async def build_recommendations(candidates: list[tuple[dict, float]], exclude_asset_ids: set[str] = None,
+                                limit: int = RECOMMENDATION_LIMIT) -> list[dict]:
+    """Map ranked (chunk metadata, distance) pairs to distinct Rep/Play recommendations.
+
+    Candidates are usually the tail of the knowledge retrieval that produced the
+    citations, so no further embedding or index work is needed.
+    """
+    exclude_asset_ids = exclude_asset_ids or set()
+    ranked = []
     seen_assets = set()
-    recommendations = []
-    session = SessionLocal()
-
-    for meta, dist in zip(results["metadatas"][0], results["distances"][0]):
+    for meta, dist in candidates:
         asset_id = meta.get("asset_id", "")
-        if asset_id in seen_assets:
+        if not asset_id or asset_id in seen_assets or asset_id in exclude_asset_ids:
             continue
         seen_assets.add(asset_id)
+        ranked.append((asset_id, dist))
 
-        asset = session.query(Asset).filter(Asset.id == asset_id).first()
-        if not asset:
-            continue
+    if not ranked:
+        return []
 
-        rep = session.query(Rep).filter(Rep.asset_id == asset_id).first()
-        if not rep:
-            continue
+    async with AsyncSessionLocal() as session:
+        asset_ids = [a for a, _ in ranked]
+        assets = {a.id: a for a in (await session.execute(select(Asset).where(Asset.id.in_(asset_ids)))).scalars()}
+        reps = {}
+        for rep in (await session.execute(select(Rep).where(Rep.asset_id.in_(asset_ids)).order_by(Rep.id))).scalars():
+            reps.setdefault(rep.asset_id, rep)
+        play_ids = {rep.play_id for rep in reps.values()}
+        plays = {p.id: p for p in (await session.execute(select(Play).where(Play.id.in_(play_ids)))).scalars()}
 
-        play = session.query(Play).filter(Play.id == rep.play_id).first()
+    recommendations = []
+    for asset_id, dist in ranked:
+        asset = assets.get(asset_id)
+        rep = reps.get(asset_id)
+        if not asset or not rep:
+            continue
+        play = plays.get(rep.play_id)
 
         recommendations.append({
             "asset_id": asset_id,
@@ -73,8 +54,44 @@ def get_recommendations(query: str, user_id: str, company_id: str, exclude_asset
             "relevance": round(1 - dist, 3),
         })
 
-        if len(recommendations) >= 3:
+        if len(recommendations) >= limit:
             break
 
-    session.close()
     return recommendations
+
+
+async def get_recommendations(query: str, user_id: str, company_id: str, exclude_asset_ids: set[str] = None) -> list[dict]:
+    """Standalone recommendation lookup for paths that did not already query `knowledge` (e.g. history)."""
+    accessible_asset_ids = await run_blocking(get_user_accessible_asset_ids, user_id)
+    if not accessible_asset_ids:
+        return []
+
+    exclude_asset_ids = exclude_asset_ids or set()
+    if not accessible_asset_ids - exclude_asset_ids:
+        return []
+
+    name = collection_name("knowledge", company_id)
+    collection = await run_blocking(vector_store.collection, name)
+    if collection is None:
+        return []
+
+    query_embedding = await aembed_query(query)
+
+    where_filter = access_group_filter(await run_blocking(get_user_access_groups, user_id))
+    if exclude_asset_ids:
+        where_filter = {"$and": [where_filter, {"asset_id": {"$nin": list(exclude_asset_ids)}}]}
+
+    results, _ = await run_blocking(
+        query_collection, collection, name, query_embedding,
+        asset_ids=accessible_asset_ids - exclude_asset_ids,
+        where=where_filter,
+        n_results=5,
+        include=["metadatas", "distances"],
+    )
+
+    if not results["metadatas"] or not results["metadatas"][0]:
+        return []
+
+    candidates = [(meta, dist) for meta, dist in zip(results["metadatas"][0], results["distances"][0])
+                  if meta.get("asset_id") in accessible_asset_ids]
+    return await build_recommendations(candidates, exclude_asset_ids)
@@ -0,0 +1,15 @@
+import re
+
+TOKEN_RE = re.compile(r"[a-z0-9]+(?:['-][a-z0-9]+)*")
+
+# Function words carry no intent or topic on their own (matching on them alone made the router's centroids
+# overconfident)
+STOPWORDS = frozenset(
+    "a an the is are was were be been am do does did i me my you your it its of for to in on at by with about "
+    "and or what which who whom how when where why can could should would will shall this that these those "
+    "there any some get got show tell give".split()
+)
+
+
+def tokenize(text: str) -> list[str]:
+    return TOKEN_RE.findall(text.lower().replace("’", "'"))
@@ -0,0 +1,133 @@
+import hashlib
+import os
+import threading
+import time
+from pathlib import Path
+import chromadb
+from config import CHROMA_PERSIST_DIR, INDEX_GENERATION_PATH, VECTOR_STORE_RECHECK_SECONDS
+from services.embedding_providers import provider, check_index
+
+
+def collection_name(kind: str, company_id: str) -> str:
+    """Collections are partitioned per company: `knowledge_<company_id>`, `submissions_<company_id>`."""
+    return f"{kind}_{company_id}"
+
+
+def access_group_id(play_ids) -> str:
+    """Chunks are tagged with one access group: a stable id for the set of plays granting access to their asset."""
+    return hashlib.sha1("|".join(sorted(play_ids)).encode()).hexdigest()[:16]
+
+
+def access_group_filter(group_ids) -> dict | None:
+    """Where-clause matching chunks in any of `group_ids` (one `$in` over a handful of ids)."""
+    group_ids = sorted(group_ids)
+    if not group_ids:
+        return None
+    return {"access_group": {"$in": group_ids}} if len(group_ids) > 1 else {"access_group": {"$eq": group_ids[0]}}
+
+
+def read_generation(path: str = INDEX_GENERATION_PATH) -> int:
+    try:
+        return int(Path(path).read_text().strip() or 0)
+    except (FileNotFoundError, ValueError):
+        return 0
+
+
+def chroma_dir(generation: int, root: str = CHROMA_PERSIST_DIR) -> Path:
+    """The Chroma store of `generation`: its own directory under `root`, so ingestion never writes to a store a
+    server has open (a store from before per-generation directories sits in `root` itself)."""
+    path = Path(root) / str(generation)
+    return path if path.is_dir() else Path(root)
+
+
+def publish_generation(path: str = INDEX_GENERATION_PATH) -> int:
+    """Bump the index generation so running servers reopen the Chroma store (now that generation's directory)."""
+    generation = read_generation(path) + 1
+    tmp = f"{path}.tmp"
+    Path(tmp).write_text(str(generation))
+    os.replace(tmp, path)
+    return generation
+
+
+class VectorStore:
+    """Process-wide Chroma client and collection handles.
+
+    Opened once (at startup via `warm_up`) and reused by every request. When
+    ingestion publishes a new generation the handles are dropped and reopened
+    on next use. A collection built by a different embedding provider, model
+    or dimension than `embedder` is refused with `IndexMismatchError`.
+    """
+
+    def __init__(self, path: str = CHROMA_PERSIST_DIR, recheck_seconds: float = VECTOR_STORE_RECHECK_SECONDS,
+                 embedder=provider):
+        self.path = path
+        self.embedder = embedder
+        self.recheck_seconds = recheck_seconds
+        self.lock = threading.Lock()
+        self.client = None
+        self.collections = {}
+        self.generation = read_generation()
+        self.checked_at = time.monotonic()
+
+    def _check_generation(self):
+        now = time.monotonic()
+        if now - self.checked_at < self.recheck_seconds:
+            return
+        self.checked_at = now
+        generation = read_generation()
+        if generation != self.generation:
+            with self.lock:
+                if self.client is not None:
+                    # PersistentClient caches systems per path; drop it so the new index is read
+                    self.client.clear_system_cache()
+                self.client = None
+                self.collections = {}
+                self.generation = generation
+
+    def current_generation(self) -> int:
+        self._check_generation()
+        return self.generation
+
+    def _client(self):
+        if self.client is None:
+            self.client = chromadb.PersistentClient(path=str(chroma_dir(self.generation, self.path)))
+        return self.client
+
+    def collection(self, name: str):
+        """Return the named collection, or None if it has not been ingested (e.g. a company with no content)."""
+        self._check_generation()
+        # A local reference: a new generation swaps in a fresh dict rather than emptying this one
+        collections = self.collections
+        if name in collections:
+            return collections[name]
+        with self.lock:
+            if name not in self.collections:
+                try:
+                    collection = self._client().get_collection(name)
+                except ValueError:
+                    # Cached as missing until the next generation
+                    self.collections[name] = None
+                    return None
+                # Not cached on mismatch: every query is refused until the index or the config changes
+                check_index(name, collection.metadata, self.embedder)
+                self.collections[name] = collection
+            return self.collections[name]
+
+    def warm_up(self) -> dict[str, int]:
+        """Open every collection and run one query each so HNSW segments are loaded into memory."""
+        self._check_generation()
+        with self.lock:
+            names = [c.name for c in self._client().list_collections()]
+        counts = {}
+        for name in names:
+            col = self.collection(name)
+            if col is None:
+                continue
+            counts[name] = col.count()
+            sample = col.get(limit=1, include=["embeddings"])
+            if sample["embeddings"]:
+                col.query(query_embeddings=[sample["embeddings"][0]], n_results=1, include=[])
+        return counts
+
+
+vector_store = VectorStore()
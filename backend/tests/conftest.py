@@ -0,0 +1,27 @@
+import os
+import tempfile
+
+import pytest
+
+# Config is read at import time: every data path points at a scratch directory before any app module loads
+SCRATCH = tempfile.mkdtemp(prefix="bigspring_tests_")
+for name, file_name in {
+    "SQLITE_DB_PATH": "bigspring.db", "CHROMA_PERSIST_DIR": "chroma_db", "INDEX_GENERATION_PATH": "index_generation",
+    "LEXICAL_INDEX_PATH": "lexical_index.db", "EMBEDDING_CACHE_PATH": "embedding_cache.db",
+    "EXACT_INDEX_DIR": "exact_index", "ASSETS_DIR": "assets",
+}.items():
+    os.environ[name] = os.path.join(SCRATCH, file_name)
+os.environ.setdefault("OPENAI_API_KEY", "unused")
+# Anything a test ingests is embedded in-process, never by the API
+os.environ["EMBEDDING_PROVIDER"] = "local"
+os.environ["ANONYMIZED_TELEMETRY"] = "False"
+
+
+@pytest.fixture(scope="session")
+def db():
+    """The app's engines, bound to an empty scratch database with the current schema."""
+    from database.models import init_tables, engine, async_engine
+    init_tables()
+    yield engine
+    engine.dispose()
+    async_engine.sync_engine.dispose()
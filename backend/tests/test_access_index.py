@@ -0,0 +1,104 @@
+import itertools
+
+import pytest
+
+RUNS = itertools.count()
+
+
+@pytest.fixture
+def seeded(db):
+    """Two plays (p1: assets a1, a2; p2: asset a3) and three users: ana on p1, ben on p2, cy on both.
+
+    Returns (session, ids): `ids` maps the short names to this test's row ids.
+    """
+    from database.models import SessionLocal, Company, User, Play, PlayAssignment, Rep, Asset
+    run = next(RUNS)
+    ids = {name: f"ai{run}-{name}" for name in ("p1", "p2", "a1", "a2", "a3", "a4", "ana", "ben", "cy")}
+    company_id = f"comp-ai{run}"
+    session = SessionLocal()
+    session.add(Company(id=company_id, name="Access index"))
+    for asset in ("a1", "a2", "a3", "a4"):
+        session.add(Asset(id=ids[asset], type="pdf", file_name=f"{ids[asset]}.json", company_id=company_id))
+    for play, assets in (("p1", ("a1", "a2")), ("p2", ("a3",))):
+        session.add(Play(id=ids[play], company_id=company_id, title=ids[play]))
+        for asset in assets:
+            session.add(Rep(id=f"rep-{ids[asset]}", play_id=ids[play], company_id=company_id, prompt_type="watch",
+                            prompt_title=ids[asset], asset_id=ids[asset]))
+    # A practice rep never grants access to its asset
+    session.add(Rep(id=f"rep-{ids['a4']}", play_id=ids["p1"], company_id=company_id, prompt_type="practice",
+                    prompt_title=ids["a4"], asset_id=ids["a4"]))
+    for user, plays in (("ana", ("p1",)), ("ben", ("p2",)), ("cy", ("p1", "p2"))):
+        session.add(User(id=ids[user], username=ids[user], company_id=company_id, is_active=True))
+        for play in plays:
+            session.add(PlayAssignment(id=f"pa-{ids[user]}-{play}", user_id=ids[user], play_id=ids[play],
+                                       status="assigned"))
+    session.commit()
+    yield session, ids
+    session.close()
+
+
+@pytest.fixture
+def index(db):
+    """A fresh index over the scratch database that checks `data_version` on every lookup."""
+    from config import SQLITE_DB_PATH
+    from services.access_index import AccessIndex
+    return AccessIndex(SQLITE_DB_PATH, recheck_seconds=0)
+
+
+def assets(index, ids, user):
+    return {name for name in ("a1", "a2", "a3", "a4") if ids[name] in index.assets_for(ids[user])}
+
+
+def test_assignment_added_and_removed(seeded, index):
+    from database.models import PlayAssignment
+    session, ids = seeded
+    assert assets(index, ids, "ana") == {"a1", "a2"}
+    ben, cy = index.assets_for(ids["ben"]), index.assets_for(ids["cy"])
+    ben_groups = index.groups_for(ids["ben"])
+
+    session.add(PlayAssignment(id=f"pa-{ids['ana']}-p2", user_id=ids["ana"], play_id=ids["p2"], status="assigned"))
+    session.commit()
+    assert assets(index, ids, "ana") == {"a1", "a2", "a3"}
+    assert index.groups_for(ids["ana"]) == index.groups_for(ids["cy"])
+    # Users whose plays did not change keep the very same sets
+    assert index.assets_for(ids["ben"]) is ben and index.assets_for(ids["cy"]) is cy
+    assert index.groups_for(ids["ben"]) is ben_groups
+
+    session.delete(session.get(PlayAssignment, f"pa-{ids['ana']}-p1"))
+    session.commit()
+    assert assets(index, ids, "ana") == {"a3"}
+    assert index.assets_for(ids["ben"]) is ben and index.assets_for(ids["cy"]) is cy
+
+    session.delete(session.get(PlayAssignment, f"pa-{ids['ana']}-p2"))
+    session.commit()
+    assert index.assets_for(ids["ana"]) == frozenset()
+    assert index.groups_for(ids["ana"]) == frozenset()
+
+
+def test_rep_asset_changed(seeded, index):
+    from database.models import Rep
+    session, ids = seeded
+    ana, ana_groups = index.assets_for(ids["ana"]), index.groups_for(ids["ana"])
+    ana_version = index.version_for(ids["ana"])
+    assert assets(index, ids, "cy") == {"a1", "a2", "a3"}
+
+    session.get(Rep, f"rep-{ids['a3']}").asset_id = ids["a4"]
+    session.commit()
+    assert assets(index, ids, "ben") == {"a4"}
+    assert assets(index, ids, "cy") == {"a1", "a2", "a4"}
+    # p1 did not change, so neither did anything of ana's
+    assert index.assets_for(ids["ana"]) is ana and index.groups_for(ids["ana"]) is ana_groups
+    assert index.version_for(ids["ana"]) == ana_version
+
+
+def test_unrelated_write_keeps_every_set(seeded, index):
+    from database.models import Company
+    session, ids = seeded
+    before = {user: index.assets_for(ids[user]) for user in ("ana", "ben", "cy")}
+    data_version = index.data_version
+
+    session.add(Company(id=f"{ids['ana']}-other", name="Unrelated"))
+    session.commit()
+    after = {user: index.assets_for(ids[user]) for user in ("ana", "ben", "cy")}
+    assert index.data_version != data_version
+    assert all(after[user] is before[user] for user in before)
@@ -0,0 +1,63 @@
+import time
+from types import SimpleNamespace
+
+import anyio
+import pytest
+
+LATENCY_S, TOKENS, TOKEN_DELAY_S = 0.2, 10, 0.02
+STREAMS = 8
+
+
+class SlowCompletions:
+    """Chat completions with upstream latency: a JSON intent, or an answer streamed token by token."""
+
+    async def create(self, stream: bool = False, **_):
+        await anyio.sleep(LATENCY_S)
+        if not stream:
+            content = '{"intent": "GENERAL_PROFESSIONAL", "reasoning": "stub"}'
+            return SimpleNamespace(choices=[SimpleNamespace(message=SimpleNamespace(content=content))])
+        return self._tokens()
+
+    async def _tokens(self):
+        for i in range(TOKENS):
+            await anyio.sleep(TOKEN_DELAY_S)
+            yield SimpleNamespace(choices=[SimpleNamespace(delta=SimpleNamespace(content=f"token{i} "))])
+
+
+@pytest.fixture
+def slow_openai(monkeypatch, db):
+    """Every query goes through the LLM classifier and a streamed general answer, without retrieval."""
+    import main
+    from search import router, fallback
+    client = SimpleNamespace(chat=SimpleNamespace(completions=SlowCompletions()))
+    monkeypatch.setattr(router, "client", client)
+    monkeypatch.setattr(fallback, "client", client)
+    monkeypatch.setattr(router, "FAST_ROUTER", False)
+    monkeypatch.setattr(main, "SPECULATIVE_RETRIEVAL", False)
+
+
+async def run_streams(n: int) -> tuple[float, list[list]]:
+    from main import search_events
+    streams = [[] for _ in range(n)]
+
+    async def consume(events: list):
+        async for event in search_events("How do I open a discovery call?", {"id": "user-x", "company_id": "comp-x"}):
+            events.append(event)
+
+    started = time.perf_counter()
+    async with anyio.create_task_group() as tg:
+        for events in streams:
+            tg.start_soon(consume, events)
+    return time.perf_counter() - started, streams
+
+
+@pytest.mark.anyio
+async def test_streams_run_concurrently(slow_openai):
+    alone, (single,) = await run_streams(1)
+    together, streams = await run_streams(STREAMS)
+
+    answer_chunks = sum(event["event"] == "answer_chunk" for event in single)
+    assert answer_chunks == TOKENS + 1  # the general-knowledge disclaimer, then the tokens
+    assert all(len(events) == len(single) and events[-1]["event"] == "done" for events in streams)
+    # Serialized streams would take STREAMS x as long as one
+    assert together < alone * 2, (alone, together)
@@ -0,0 +1,50 @@
+import asyncio
+
+import pytest
+
+from benchmarks.query_counts import SIZES, seed, counting
+
+
+@pytest.fixture(scope="module")
+def users(db):
+    """Users with 1, 10 and 100 submissions and assignments, by count."""
+    from database.models import SessionLocal, Company
+    session = SessionLocal()
+    session.add(Company(id="comp-qc", name="Query counts"))
+    users = {n: seed(session, "comp-qc", n) for n in SIZES}
+    session.commit()
+    session.close()
+    return users
+
+
+def test_history_submissions_statements_constant(users):
+    from database.models import async_engine
+    from services.auth import get_user_submissions_with_feedback
+
+    async def run():
+        counts = {}
+        for n, user_id in users.items():
+            with counting([async_engine.sync_engine]) as c:
+                rows = await get_user_submissions_with_feedback(user_id)
+            assert len(rows) == n
+            counts[n] = c["statements"]
+        # Pooled async connections are bound to this event loop
+        await async_engine.dispose()
+        return counts
+
+    # One joined query, whatever the number of submissions
+    counts = asyncio.run(run())
+    assert set(counts.values()) == {1}, counts
+
+
+def test_user_detail_statements_constant(users):
+    from database.models import engine
+    from main import get_user_detail
+    counts = {}
+    for n, user_id in users.items():
+        with counting([engine]) as c:
+            detail = get_user_detail(user_id)
+        assert len(detail["assigned_plays"]) == n
+        counts[n] = c["statements"]
+    # The user, then their assignments joined to plays
+    assert set(counts.values()) == {2}, counts
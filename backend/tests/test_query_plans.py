@@ -0,0 +1,39 @@
+import pytest
+from sqlalchemy import create_engine
+from sqlalchemy.schema import CreateTable
+
+from benchmarks.query_plans import hot_queries
+
+
+def plan_steps(engine, stmt) -> list[str]:
+    sql = str(stmt.compile(engine, compile_kwargs={"literal_binds": True}))
+    with engine.connect() as conn:
+        return [row[-1] for row in conn.exec_driver_sql(f"EXPLAIN QUERY PLAN {sql}")]
+
+
+@pytest.fixture
+def legacy_engine(tmp_path):
+    """A database as loaded before schema versioning: the tables, none of the secondary indexes."""
+    from database.models import Base
+    engine = create_engine(f"sqlite:///{tmp_path / 'bigspring.db'}")
+    with engine.begin() as conn:
+        for table in Base.metadata.sorted_tables:
+            conn.execute(CreateTable(table))
+    yield engine
+    engine.dispose()
+
+
+def test_migrate_removes_table_scans(legacy_engine):
+    from database.migrations import migrate, SCHEMA_VERSION
+    assert any(step.startswith("SCAN ") for stmt in hot_queries().values() for step in plan_steps(legacy_engine, stmt))
+
+    assert migrate(legacy_engine) == SCHEMA_VERSION
+    plans = {name: plan_steps(legacy_engine, stmt) for name, stmt in hot_queries().items()}
+    scans = {name: steps for name, steps in plans.items() if any(step.startswith("SCAN ") for step in steps)}
+    assert not scans, scans
+
+
+def test_fresh_schema_has_no_table_scans(db):
+    plans = {name: plan_steps(db, stmt) for name, stmt in hot_queries().items()}
+    scans = {name: steps for name, steps in plans.items() if any(step.startswith("SCAN ") for step in steps)}
+    assert not scans, scans
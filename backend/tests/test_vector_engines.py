@@ -0,0 +1,113 @@
+import asyncio
+import json
+import random
+
+import pytest
+
+WORDS = ("amproxin dosage efficacy trial pneumoniae cooling rack airflow latency throughput pricing objection "
+         "renewal contract sensor calibration torque battery warranty onboarding pipeline forecast quota "
+         "compliance audit storage replication failover budget discount margin").split()
+QUERIES = ["amproxin dosage for pneumoniae", "rack cooling airflow", "contract renewal pricing objection",
+           "sensor calibration torque", "quota forecast pipeline", "storage replication failover"]
+# play -> assets of its Watch Reps (v6 is in two plays, so it gets its own access group)
+PLAYS = {"p1": ("v1", "v2", "v6"), "p2": ("v3", "v4", "v6"), "p3": ("v5",)}
+# user -> assigned plays; u4 has none
+USERS = {"u1": ("p1",), "u2": ("p2",), "u3": ("p1", "p3"), "u4": ()}
+COMPANY = "comp-ve"
+TOP_K = 5
+
+
+def transcript(rng: random.Random) -> dict:
+    segments = [{"text": " ".join(rng.choice(WORDS) for _ in range(90)) + ".", "start": f"0:{i * 20:02d}",
+                 "end": f"0:{i * 20 + 19:02d}", "speaker": "Coach"} for i in range(3)]
+    return {"segments": segments, "full_transcript": " ".join(s["text"] for s in segments)}
+
+
+@pytest.fixture(scope="module")
+def corpus(db):
+    """The plays, users and video assets above, ingested into the scratch index by `run_ingestion`."""
+    from config import ASSETS_DIR
+    from database.models import SessionLocal, Company, User, Play, PlayAssignment, Rep, Asset
+    from ingestion.ingest import run_ingestion
+    from services.vector_store import vector_store
+    rng = random.Random(7)
+    ASSETS_DIR.mkdir(parents=True, exist_ok=True)
+    session = SessionLocal()
+    session.add(Company(id=COMPANY, name="Vector engines"))
+    for asset in sorted({a for assets in PLAYS.values() for a in assets}):
+        (ASSETS_DIR / f"ve-{asset}.json").write_text(json.dumps(transcript(rng)))
+        session.add(Asset(id=f"ve-{asset}", type="video", file_name=f"ve-{asset}.json", company_id=COMPANY))
+    for play, assets in PLAYS.items():
+        session.add(Play(id=f"ve-{play}", company_id=COMPANY, title=f"Play {play}"))
+        for asset in assets:
+            session.add(Rep(id=f"ve-{play}-{asset}", play_id=f"ve-{play}", company_id=COMPANY,
+                            prompt_type="watch", prompt_title=asset, asset_id=f"ve-{asset}"))
+    for user, plays in USERS.items():
+        session.add(User(id=f"ve-{user}", username=user, company_id=COMPANY, is_active=True))
+        for play in plays:
+            session.add(PlayAssignment(id=f"ve-{user}-{play}", user_id=f"ve-{user}", play_id=f"ve-{play}",
+                                       status="assigned"))
+    session.commit()
+    session.close()
+    run_ingestion()
+    # Notice the generation just published without waiting out the recheck interval
+    recheck, vector_store.recheck_seconds = vector_store.recheck_seconds, 0
+    yield
+    vector_store.recheck_seconds = recheck
+
+
+def search(engine: str, user: str, query: str) -> dict:
+    from services.auth import get_user_accessible_asset_ids, get_user_access_groups
+    from services.embedding_providers import provider
+    from services.exact_index import exact_index, query_collection
+    from services.vector_store import vector_store, collection_name, access_group_filter
+    name = collection_name("knowledge", COMPANY)
+    assets = get_user_accessible_asset_ids(f"ve-{user}")
+    where = access_group_filter(get_user_access_groups(f"ve-{user}"))
+    previous, exact_index.engine = exact_index.engine, engine
+    try:
+        results, used = query_collection(vector_store.collection(name), name, provider.embed([query])[0], assets,
+                                         where, TOP_K, ["metadatas", "distances"])
+    finally:
+        exact_index.engine = previous
+    assert used == engine
+    return {"ids": results["ids"][0], "metadatas": results["metadatas"][0], "distances": results["distances"][0]}
+
+
+@pytest.mark.parametrize("user", [u for u, plays in USERS.items() if plays])
+def test_exact_matches_chroma(corpus, user):
+    from services.auth import get_user_accessible_asset_ids, get_user_access_groups
+    assets = get_user_accessible_asset_ids(f"ve-{user}")
+    groups = get_user_access_groups(f"ve-{user}")
+    expected = {f"ve-{a}" for play in USERS[user] for a in PLAYS[play]}
+    assert assets == expected
+    for query in QUERIES:
+        exact, chroma = search("exact", user, query), search("chroma", user, query)
+        # Only rows Chroma's access-group filter allows, and the same top K
+        assert all(m["access_group"] in groups and m["asset_id"] in assets for m in exact["metadatas"])
+        assert len(exact["ids"]) == TOP_K
+        assert exact["ids"] == chroma["ids"], query
+        assert exact["distances"] == pytest.approx(chroma["distances"], abs=1e-4)
+
+
+def test_user_without_access(corpus):
+    from services.auth import get_user_accessible_asset_ids, get_user_access_groups
+    from services.exact_index import exact_index
+    from services.embedding_providers import provider
+    from services.vector_store import access_group_filter, collection_name
+    from search.knowledge import search_knowledge
+    from database.models import async_engine
+    assert get_user_accessible_asset_ids("ve-u4") == frozenset()
+    # No groups means no filter at all for Chroma, so the search stops before any vector query
+    assert access_group_filter(get_user_access_groups("ve-u4")) is None
+    assert exact_index.search(collection_name("knowledge", COMPANY), provider.embed([QUERIES[0]])[0],
+                              frozenset(), TOP_K) == []
+
+    async def run():
+        try:
+            return await search_knowledge(QUERIES[0], "ve-u4", COMPANY)
+        finally:
+            await async_engine.dispose()
+
+    result = asyncio.run(run())
+    assert result["no_results"] and result["citations"] == []